@@ -6,8 +6,10 @@ from flask import Flask
 from flask_cors import CORS
 import os
 from backend.config import Config
+from backend.models import database
+from backend.services import pv_jobs, image_spool, rag_service
 from backend.routes.auth import auth_bp
-from backend.routes.volunteer import volunteer_bp
+from backend.routes.volunteer import volunteer_bp, run_pv_ai_pipeline
 from backend.routes.admin import admin_bp
 from backend.routes.superadmin import superadmin_bp
 from backend.routes.vi_volunteer import vi_volunteer_bp
@@ -34,6 +36,9 @@ CORS(app,
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
 )
 
+# Request-scoped database connections (released in teardown)
+database.init_app(app)
+
 # Ensure upload folder exists
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 
@@ -76,6 +81,17 @@ app.register_blueprint(vi_schedule_bp)
 # Register analytics page route (special case)
 register_analytics_page(app)
 
+# =====================================================
+# BACKGROUND WORKERS
+# =====================================================
+
+# RAG store, PV AI pipeline job workers and the image spool janitor. Skip the Flask reloader's parent
+# process so they only run in the process that actually serves requests.
+if __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    rag_service.initialize_rag()
+    pv_jobs.start_workers(run_pv_ai_pipeline)
+    image_spool.start_janitor()
+
 # =====================================================
 # ERROR HANDLERS
 # =====================================================
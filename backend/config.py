@@ -23,22 +23,107 @@ class Config:
     DB_PASSWORD = os.environ.get('DB_PASSWORD')
     DB_NAME = os.environ.get('DB_NAME')
     
+    # Database connection pool
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+    DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', '10'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # seconds
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))  # seconds to wait for a free connection
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    
     # AWS S3 configuration
     AWS_BUCKET = "my-app-house-images-2025"
     AWS_REGION = "eu-north-1"
+    S3_UPLOAD_WORKERS = int(os.environ.get('S3_UPLOAD_WORKERS', '8'))  # parallel uploads on finalize
     
     # AI API Keys
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     GROQ_API_KEY = os.environ.get('GROQ_API_KEY', '')
+    GROQ_POOL_SIZE = int(os.environ.get('GROQ_POOL_SIZE', '10'))  # keep-alive connections to api.groq.com
+    GROQ_CONNECT_RETRIES = int(os.environ.get('GROQ_CONNECT_RETRIES', '2'))
+    GEMINI_INLINE_MAX_MB = float(os.environ.get('GEMINI_INLINE_MAX_MB', '15'))  # send images inline below this total
+    GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', '4'))  # in-flight Gemini calls per process
+    # Shared rate limits per (provider, model, API key) and circuit breaker
+    GEMINI_RPM = int(os.environ.get('GEMINI_RPM', '60'))
+    GEMINI_BURST = int(os.environ.get('GEMINI_BURST', '5'))
+    GROQ_RPM = int(os.environ.get('GROQ_RPM', '30'))
+    GROQ_BURST = int(os.environ.get('GROQ_BURST', '5'))
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()  # memory | sqlite (cross-process)
+    RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH', './cache/rate_limits.sqlite3')
+    RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '60'))  # seconds a caller may queue
+    RATE_LIMIT_BACKOFF_BASE = float(os.environ.get('RATE_LIMIT_BACKOFF_BASE', '2'))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_SECONDS = float(os.environ.get('CIRCUIT_RESET_SECONDS', '30'))
+    
+    # AI response cache (Groq/Gemini, keyed by content hash)
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH', './cache/ai_cache.sqlite3')
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', str(7 * 24 * 3600)))  # seconds
+    AI_CACHE_MAX_MB = int(os.environ.get('AI_CACHE_MAX_MB', '100'))
     
     # RAG Configuration
     CHROMA_DB_PATH = os.environ.get('CHROMA_DB_PATH', './chroma_db')
     RAG_COLLECTION_NAME = os.environ.get('RAG_COLLECTION_NAME', 'student_cases')
     RAG_TOP_K = int(os.environ.get('RAG_TOP_K', '5'))
     RAG_ENABLED = os.environ.get('RAG_ENABLED', 'true').lower() == 'true'
+    RAG_BACKEND = os.environ.get('RAG_BACKEND', 'chroma').lower()  # chroma | numpy
+    NUMPY_INDEX_PATH = os.environ.get('NUMPY_INDEX_PATH', './vector_index')
+    RAG_EMBEDDER = os.environ.get('RAG_EMBEDDER', 'gemini').lower()  # gemini | local
+    RAG_LOCAL_FALLBACK = os.environ.get('RAG_LOCAL_FALLBACK', 'true').lower() == 'true'
+    RAG_FETCH_K = int(os.environ.get('RAG_FETCH_K', '20'))
+    RAG_MMR_LAMBDA = float(os.environ.get('RAG_MMR_LAMBDA', '0.7'))
+    RAG_CONTEXT_TOKEN_BUDGET = int(os.environ.get('RAG_CONTEXT_TOKEN_BUDGET', '400'))
+    
+    RAG_BACKFILL_CHECKPOINT = os.environ.get('RAG_BACKFILL_CHECKPOINT', './cache/rag_backfill.json')
+    
+    # Embedding cache (RAG)
+    EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_CACHE_PATH = os.environ.get('EMBEDDING_CACHE_PATH', './cache/embeddings.sqlite3')
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', '100000'))
+    EMBEDDING_CACHE_MEMORY_ITEMS = int(os.environ.get('EMBEDDING_CACHE_MEMORY_ITEMS', '2000'))
+    
+    # PV AI pipeline job queue (PVJobs table)
+    PV_JOB_WORKERS = int(os.environ.get('PV_JOB_WORKERS', '2'))  # per process; 0 disables
+    PV_JOB_MAX_ATTEMPTS = int(os.environ.get('PV_JOB_MAX_ATTEMPTS', '3'))
+    PV_JOB_RETRY_BASE_DELAY = int(os.environ.get('PV_JOB_RETRY_BASE_DELAY', '30'))  # seconds
+    PV_JOB_VISIBILITY_TIMEOUT = int(os.environ.get('PV_JOB_VISIBILITY_TIMEOUT', '900'))  # seconds
+    PV_JOB_POLL_INTERVAL = float(os.environ.get('PV_JOB_POLL_INTERVAL', '5'))  # seconds
+    PV_JOB_SWEEP_INTERVAL = int(os.environ.get('PV_JOB_SWEEP_INTERVAL', '60'))  # seconds between expired-lease sweeps
+
+    # Bulk PV re-analysis CLI (pv_reanalysis → PVReanalysis table)
+    REANALYSIS_CONCURRENCY = int(os.environ.get('REANALYSIS_CONCURRENCY', '4'))
+    REANALYSIS_PV_PER_MIN = float(os.environ.get('REANALYSIS_PV_PER_MIN', '20'))  # PV runs started per minute
+    LLM_USD_PER_1K_TOKENS = float(os.environ.get('LLM_USD_PER_1K_TOKENS', '0'))  # blended price for cost estimates
+    
+    # Local image quality pre-screen (OpenCV) - only borderline images go to Gemini
+    IMAGE_QC_LOCAL_ENABLED = os.environ.get('IMAGE_QC_LOCAL_ENABLED', 'true').lower() == 'true'
+    IMAGE_QC_BLUR_BAD = float(os.environ.get('IMAGE_QC_BLUR_BAD', '40'))  # Laplacian variance below → blurry
+    IMAGE_QC_BLUR_GOOD = float(os.environ.get('IMAGE_QC_BLUR_GOOD', '150'))  # above (and well exposed) → sharp
+    IMAGE_QC_DARK_MEAN = float(os.environ.get('IMAGE_QC_DARK_MEAN', '35'))  # mean intensity 0-255
+    IMAGE_QC_BRIGHT_MEAN = float(os.environ.get('IMAGE_QC_BRIGHT_MEAN', '225'))
+    IMAGE_QC_CLIP_FRACTION = float(os.environ.get('IMAGE_QC_CLIP_FRACTION', '0.5'))  # share of clipped pixels
+    IMAGE_QC_BLANK_STD = float(os.environ.get('IMAGE_QC_BLANK_STD', '6'))  # intensity std dev below → blank
+    
+    # Voice note preprocessing before S3/Gemini (needs the ffmpeg binary; falls back to the raw upload)
+    AUDIO_PREPROCESS_ENABLED = os.environ.get('AUDIO_PREPROCESS_ENABLED', 'true').lower() == 'true'
+    AUDIO_FFMPEG_PATH = os.environ.get('AUDIO_FFMPEG_PATH', 'ffmpeg')
+    AUDIO_CODEC = os.environ.get('AUDIO_CODEC', 'opus').lower()  # opus | flac
+    AUDIO_BITRATE = os.environ.get('AUDIO_BITRATE', '24k')  # Opus only
+    AUDIO_SAMPLE_RATE = int(os.environ.get('AUDIO_SAMPLE_RATE', '16000'))
+    AUDIO_SILENCE_THRESHOLD_DB = float(os.environ.get('AUDIO_SILENCE_THRESHOLD_DB', '-45'))
+    AUDIO_SILENCE_MIN_SECONDS = float(os.environ.get('AUDIO_SILENCE_MIN_SECONDS', '1.0'))  # longer pauses are cut
+    AUDIO_PREPROCESS_TIMEOUT = int(os.environ.get('AUDIO_PREPROCESS_TIMEOUT', '120'))  # seconds
+    
+    # Batch quality check worker threads (Gemini calls still capped by GEMINI_MAX_CONCURRENCY)
+    QUALITY_CHECK_WORKERS = int(os.environ.get('QUALITY_CHECK_WORKERS', '6'))
     
     # Upload settings
     UPLOAD_FOLDER = 'uploads'
+    IMAGE_STORE_DIR = os.environ.get('IMAGE_STORE_DIR', './cache/images')  # warm copies of S3 images for the AI pipeline
+    IMAGE_STORE_MAX_MB = int(os.environ.get('IMAGE_STORE_MAX_MB', '1024'))
+    IMAGE_STORE_TTL = int(os.environ.get('IMAGE_STORE_TTL', str(7 * 24 * 3600)))  # seconds
+    IMAGE_SPOOL_DIR = os.environ.get('IMAGE_SPOOL_DIR', './spool/images')  # staged images before final upload
+    IMAGE_SPOOL_TTL = int(os.environ.get('IMAGE_SPOOL_TTL', str(48 * 3600)))  # seconds before abandoned images expire
+    IMAGE_SPOOL_JANITOR_INTERVAL = int(os.environ.get('IMAGE_SPOOL_JANITOR_INTERVAL', '3600'))  # seconds
     MIN_IMAGES_REQUIRED = 1
     
     @staticmethod
@@ -1,101 +1,443 @@
 """
 Database utilities module
 Handles MySQL connections and query helpers
+
+All connections are drawn from a process-wide pool (see ConnectionPool).
+Callers keep using get_db_connection() / conn.close() as before - closing
+a pooled connection returns it to the pool instead of dropping the socket.
+
+Inside a Flask request every call to get_db_connection() shares one pooled
+connection, acquired lazily and released in teardown (see init_app). That
+also means one transaction per request: a commit() anywhere in the request
+(including execute_query) commits every write made so far, and a rollback()
+discards them all. Uncommitted work is rolled back in teardown only if the
+request raised.
 """
+import threading
+import time
+from collections import deque
+
 import mysql.connector
+from flask import g, has_app_context
 from mysql.connector import Error
 from backend.config import Config
 
 
+class PoolTimeoutError(Error):
+    """Raised when no pooled connection becomes free within DB_POOL_TIMEOUT"""
+
+
+class PooledConnection:
+    """
+    Thin proxy around a raw MySQL connection checked out from the pool.
+    Behaves like the raw connection except that close() hands it back.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._closed = False
+
+    def close(self):
+        """Return the connection to the pool (idempotent)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._release(self._raw, self._created_at)
+        self._raw = None
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise Error("Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+
+class RequestConnection:
+    """
+    Request-scoped view of a pooled connection.
+    close() is a no-op so route code that closes "its" connection does not
+    hand it back mid-request; the real release happens in teardown.
+    All users within the request share its transaction (see module docstring).
+    """
+
+    def __init__(self, pooled):
+        self._pooled = pooled
+
+    def close(self):
+        pass
+
+    def release(self, error=None):
+        """Roll back uncommitted work and return the connection to the pool"""
+        try:
+            if error is not None:
+                self._pooled.rollback()
+        except Exception:
+            pass
+        self._pooled.close()
+
+    def __getattr__(self, name):
+        return getattr(self._pooled, name)
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool
+
+    - size: connections kept open between requests
+    - max_overflow: extra connections opened under burst load, closed on return
+    - recycle: seconds after which a connection is replaced on checkout
+    - timeout: seconds to wait for a free connection before giving up
+    - pre_ping: verify the connection is alive before handing it out
+    """
+
+    def __init__(self, db_config, size=5, max_overflow=10, recycle=1800,
+                 timeout=10, pre_ping=True):
+        self._db_config = db_config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+
+        self._idle = deque()          # (raw_connection, created_at)
+        self._cond = threading.Condition()
+        self._total = 0               # open connections (idle + checked out)
+        self._in_use = 0
+
+        self._stats = {
+            "checkouts": 0,
+            "connects": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+        }
+
+    # ---------------- internal helpers ----------------
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self._db_config)
+        with self._cond:
+            self._stats["connects"] += 1
+        return raw, time.monotonic()
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, raw, created_at):
+        """Apply recycle and pre-ping checks to an idle connection"""
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            with self._cond:
+                self._stats["recycled"] += 1
+            return False
+        if self.pre_ping:
+            try:
+                if not raw.is_connected():
+                    raise Error("ping failed")
+            except Exception:
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                return False
+        return True
+
+    def _forget(self):
+        """Drop one slot from the open-connection count"""
+        with self._cond:
+            self._total -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    # ---------------- public API ----------------
+
+    def acquire(self):
+        """
+        Check out a connection, waiting up to `timeout` seconds
+
+        Returns:
+            PooledConnection
+
+        Raises:
+            PoolTimeoutError: pool exhausted for longer than `timeout`
+            mysql.connector.Error: a new connection could not be opened
+        """
+        started = time.monotonic()
+        waited = False
+        candidate = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    candidate = self._idle.pop()
+                    break
+                if self._total < self.size + self.max_overflow:
+                    self._total += 1
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection free after {self.timeout}s "
+                        f"(pool size={self.size}, overflow={self.max_overflow})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += wait_time
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+
+        # Network work happens outside the lock
+        if candidate is not None:
+            raw, created_at = candidate
+            if self._is_usable(raw, created_at):
+                return PooledConnection(self, raw, created_at)
+            self._discard(raw)
+
+        try:
+            raw, created_at = self._connect()
+        except Exception:
+            self._forget()
+            raise
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at):
+        """Reset a connection and put it back (or close it if surplus)"""
+        try:
+            # End any open transaction so the next borrower starts clean
+            # and does not see a stale REPEATABLE READ snapshot.
+            if raw.unread_result:
+                raw.consume_results()
+            raw.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            keep = healthy and len(self._idle) < self.size
+            if keep:
+                self._idle.append((raw, created_at))
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+        if not keep:
+            self._discard(raw)
+
+    def dispose(self):
+        """Close all idle connections (checked-out ones close on return)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        """Snapshot of pool usage for monitoring"""
+        with self._cond:
+            waits = self._stats["waits"]
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._total,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "overflow_in_use": max(0, self._total - self.size),
+                "checkouts": self._stats["checkouts"],
+                "connects": self._stats["connects"],
+                "waits": waits,
+                "wait_time_total_ms": round(self._stats["wait_time_total"] * 1000, 2),
+                "wait_time_avg_ms": round(self._stats["wait_time_total"] * 1000 / waits, 2) if waits else 0.0,
+                "wait_time_max_ms": round(self._stats["wait_time_max"] * 1000, 2),
+                "timeouts": self._stats["timeouts"],
+                "recycled": self._stats["recycled"],
+                "health_check_failures": self._stats["health_check_failures"],
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # consume_results lets several cursors share one connection
+                # without "Unread result found" when a caller stops early
+                _pool = ConnectionPool(
+                    dict(Config.get_db_config(), consume_results=True),
+                    size=Config.DB_POOL_SIZE,
+                    max_overflow=Config.DB_POOL_MAX_OVERFLOW,
+                    recycle=Config.DB_POOL_RECYCLE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    pre_ping=Config.DB_POOL_PRE_PING,
+                )
+    return _pool
+
+
+def get_pool_stats():
+    """
+    Get connection pool statistics
+
+    Returns:
+        dict: in-use/idle counts, waits and wait times
+    """
+    return get_pool().stats()
+
+
 def get_db_connection():
     """
-    Create and return a MySQL database connection
-    
+    Check out a MySQL connection from the pool
+
+    Inside a Flask app context the same connection is returned for the whole
+    request and released in teardown; elsewhere (scripts, background threads)
+    call conn.close() when done to return it to the pool.
+
     Returns:
-        mysql.connector.connection.MySQLConnection or None
+        RequestConnection, PooledConnection or None
     """
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is not None:
+            return conn
+
     try:
-        conn = mysql.connector.connect(**Config.get_db_config())
-        return conn
+        pooled = get_pool().acquire()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
 
+    if has_app_context():
+        g._db_conn = RequestConnection(pooled)
+        return g._db_conn
+    return pooled
+
+
+def release_db_connection(error=None):
+    """
+    Teardown handler: return the request's connection to the pool
+
+    Args:
+        error (Exception or None): Exception that ended the request, if any
+    """
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.release(error)
+
+
+def init_app(app):
+    """Bind request-scoped connection release to the Flask app"""
+    app.teardown_appcontext(release_db_connection)
+
 
 def fetchone_dict(query, params=()):
     """
     Execute query and fetch one row as dictionary
-    
+
     Args:
         query (str): SQL query
         params (tuple): Query parameters
-        
+
     Returns:
         dict or None: Single row as dictionary
     """
     conn = get_db_connection()
     if not conn:
         return None
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(query, params)
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return row
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        cursor.close()
+        return row
+    finally:
+        conn.close()
 
 
 def fetchall_dict(query, params=()):
     """
     Execute query and fetch all rows as list of dictionaries
-    
+
     Args:
         query (str): SQL query
         params (tuple): Query parameters
-        
+
     Returns:
         list: List of dictionaries
     """
     conn = get_db_connection()
     if not conn:
         return []
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return rows
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
 
 
 def execute_query(query, params=(), commit=True):
     """
     Execute a query (INSERT, UPDATE, DELETE)
-    
+
+    Inside a request the connection is shared, so commit=True also commits the
+    route's pending writes. A failed query only undoes itself: it runs under a
+    savepoint instead of rolling back the whole request transaction.
+
     Args:
         query (str): SQL query
         params (tuple): Query parameters
         commit (bool): Whether to commit the transaction
-        
+
     Returns:
         int or None: Last inserted ID or affected rows
     """
     conn = get_db_connection()
     if not conn:
         return None
-    
+
+    shared = isinstance(conn, RequestConnection)
+    cursor = None
     try:
         cursor = conn.cursor()
+        if shared:
+            cursor.execute("SAVEPOINT execute_query")
         cursor.execute(query, params)
-        
+        last_id = cursor.lastrowid
+        if shared:
+            cursor.execute("RELEASE SAVEPOINT execute_query")
+
         if commit:
             conn.commit()
-        
-        last_id = cursor.lastrowid
-        cursor.close()
-        conn.close()
         return last_id
     except Error as e:
         print(f"Error executing query: {e}")
-        if conn:
+        try:
+            if shared and cursor is not None:
+                cursor.execute("ROLLBACK TO SAVEPOINT execute_query")
+            else:
+                conn.rollback()
+        except Error:
             conn.rollback()
-            conn.close()
         return None
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
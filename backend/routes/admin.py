@@ -2,10 +2,18 @@
 Admin Routes
 Handles admin operations including student review, decisions, and approvals
 """
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from backend.models.database import get_db_connection, fetchone_dict, fetchall_dict
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
+from backend.models.database import get_db_connection, fetchone_dict, fetchall_dict, get_pool_stats
 from backend.services.s3_service import get_s3_client, generate_presigned_url
-from backend.services.rag_service import add_student_case
+from backend.services.rag_service import add_student_case, get_collection_stats
+from backend.services.ai_cache import get_cache_stats
+from backend.services.groq_client import get_groq_stats
+from backend.services.rate_limiter import get_limiter_stats
+from backend.services import pv_events
+from backend.services.pv_tracing import get_node_timings
+from backend.services.pv_graph import CHECKPOINTED_NODES
+from backend.services.pv_jobs import enqueue_pv_job
+from backend.services import pv_checkpoints
 from backend.config import Config
 import json
 import datetime
@@ -1094,3 +1102,127 @@ def api_completed_pv_students():
     except Exception as e:
         print(f'Error in api_completed_pv_students: {e}')
         return jsonify({'error': str(e)}), 500
+
+
+# =====================================================
+# MONITORING ENDPOINTS
+# =====================================================
+
+@admin_bp.route("/api/db-pool-stats")
+def api_db_pool_stats():
+    """Database connection pool statistics (in-use, waits, wait time)"""
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return jsonify({'pool': get_pool_stats()})
+
+
+@admin_bp.route("/api/ai-cache-stats")
+def api_ai_cache_stats():
+    """AI response cache statistics (hits, misses, size)"""
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return jsonify({'cache': get_cache_stats()})
+
+
+@admin_bp.route("/api/groq-stats")
+def api_groq_stats():
+    """Groq HTTP session statistics (connection reuse, connect/TTFB/total latency)"""
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return jsonify({'groq': get_groq_stats()})
+
+
+@admin_bp.route("/api/rate-limits")
+def api_rate_limits():
+    """Gemini/Groq rate limiter and circuit breaker state"""
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return jsonify({'rate_limits': get_limiter_stats()})
+
+
+@admin_bp.route("/api/pv-events")
+def api_pv_events():
+    """SSE stream of pipeline progress for all PVs (replaces polling on the review pages)"""
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return Response(
+        stream_with_context(pv_events.stream("all")),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@admin_bp.route("/api/pv-rerun/<student_id>", methods=["POST"])
+def api_pv_rerun(student_id):
+    """
+    Re-run one pv_graph node (and everything downstream of it) for a student,
+    e.g. MasterAnalysis after a prompt change; other nodes reuse their checkpoints
+    """
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    node = (request.get_json(silent=True) or {}).get('node')
+    if node not in CHECKPOINTED_NODES:
+        return jsonify({'success': False, 'error': f"node must be one of {', '.join(CHECKPOINTED_NODES)}"}), 400
+
+    try:
+        pv = fetchone_dict("""
+            SELECT volunteerId, original_comment, status, audio_s3_key
+            FROM PhysicalVerification
+            WHERE studentId = %s
+            ORDER BY verificationDate DESC LIMIT 1
+        """, (student_id,))
+        if not pv:
+            return jsonify({'success': False, 'error': 'No PV found for this student'}), 404
+        if pv['status'] in (None, 'ASSIGNED', 'DRAFT', 'PROCESSING'):
+            return jsonify({'success': False, 'error': f"PV is {pv['status'] or 'not submitted'}"}), 409
+
+        data = {
+            "comments": pv['original_comment'] or "",
+            "rerunNode": node,
+            "audioS3Key": pv['audio_s3_key'],
+        }
+        # The volunteer's recommendation is kept as the PV status
+        job_id = enqueue_pv_job(data, student_id, pv['volunteerId'], pv['status'])
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'node': node,
+            'checkpointed_nodes': sorted(pv_checkpoints.load(student_id)),
+        })
+    except Exception as e:
+        print("❌ Error queuing PV re-run:", e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@admin_bp.route("/api/pv-node-timings")
+def api_pv_node_timings():
+    """p50/p95 duration per pv_graph node over the last ?hours= (default 24)"""
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        hours = max(1, min(int(request.args.get('hours', 24)), 24 * 90))
+    except ValueError:
+        return jsonify({'error': 'hours must be an integer'}), 400
+
+    try:
+        return jsonify(get_node_timings(hours))
+    except Exception as e:
+        print("❌ Error loading PV node timings:", e)
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route("/api/rag-health")
+def api_rag_health():
+    """RAG store initialization state and cached document count"""
+    if 'role' not in session or session.get('role') not in ['admin', 'superadmin']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    return jsonify({'rag': get_collection_stats()})
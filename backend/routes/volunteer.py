@@ -2,15 +2,18 @@
 Volunteer Routes
 Handles PV volunteer operations including student assignments, image uploads, and PV submissions
 """
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
 from backend.models.database import get_db_connection, fetchone_dict, fetchall_dict
 from backend.services.ai_service import ai_quality_check
-from backend.services.s3_service import get_s3_client, upload_image_batch, generate_presigned_url
+from backend.services.s3_service import get_s3_client, upload_image_batch, upload_stream_batch, generate_presigned_url
 from backend.services.pv_process import pv_process
+from backend.services.pv_graph import nodes_to_rerun
+from backend.services.pv_jobs import enqueue_pv_job
+from backend.services.image_spool import stage_image, open_staged, remove_staged
+from backend.services import audio_preprocess, image_store, pv_checkpoints, pv_events
 from backend.config import Config
 import os
 import base64
-import threading
 import traceback
 import time
 import json
@@ -176,15 +179,21 @@ def temp_upload():
             "reason": quality["reason"]
         }), 400
 
+    # Bytes go to the local spool; MySQL only keeps metadata
+    spool_path, size_bytes = stage_image(studentId, image_bytes)
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute("""
-        INSERT INTO StudentImages (studentId, tempImage, uploadedAt)
-        VALUES (%s, %s, NOW())
-    """, (studentId, image_bytes))
-
-    conn.commit()
+    try:
+        cursor.execute("""
+            INSERT INTO StudentImages (studentId, spoolPath, sizeBytes, uploadedAt)
+            VALUES (%s, %s, %s, NOW())
+        """, (studentId, spool_path, size_bytes))
+        conn.commit()
+    except Exception:
+        remove_staged(spool_path)
+        raise
 
     cursor.execute(
         "SELECT COUNT(*) FROM StudentImages WHERE studentId=%s",
@@ -210,29 +219,39 @@ def batch_quality_check():
     if not studentId or not files:
         return jsonify({"error": "studentId and images required"}), 400
 
-    results = []
-    
-    for file in files:
+    # Read uploads up front; FileStorage streams are not shared across threads
+    images = [(file.filename, file.read()) for file in files]
+
+    def check_single(item):
+        filename, image_bytes = item
+        started = time.perf_counter()
         try:
-            image_bytes = file.read()
-            
-            # Quality check
             quality = ai_quality_check(image_bytes)
-            
-            results.append({
-                "filename": file.filename,
+            result = {
+                "filename": filename,
                 "status": quality["status"],
-                "reason": quality.get("reason", "")
-            })
-            
+                "reason": quality.get("reason", ""),
+                "source": quality.get("source", "gemini")
+            }
         except Exception as e:
-            results.append({
-                "filename": file.filename,
+            result = {
+                "filename": filename,
                 "status": "BAD",
                 "reason": f"Error: {str(e)}"
-            })
+            }
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
 
-    return jsonify({"results": results})
+    batch_started = time.perf_counter()
+    workers = max(1, min(Config.QUALITY_CHECK_WORKERS, len(images)))
+    # map() keeps results in upload order
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(check_single, images))
+
+    return jsonify({
+        "results": results,
+        "elapsed_ms": round((time.perf_counter() - batch_started) * 1000, 1)
+    })
 
 
 
@@ -248,7 +267,7 @@ def final_upload():
     cursor = conn.cursor()
 
     cursor.execute(
-        "SELECT imageId, tempImage FROM StudentImages WHERE studentId=%s",
+        "SELECT imageId, spoolPath FROM StudentImages WHERE studentId=%s",
         (studentId,)
     )
     images = cursor.fetchall()
@@ -258,32 +277,50 @@ def final_upload():
             "error": f"Minimum {MIN_IMAGES_REQUIRED} images required"
         }), 400
 
-    results = []
+    def legacy_blob_opener(image_id):
+        # Rows staged before the spool: pull one blob at a time on the
+        # worker's own pooled connection instead of loading them all
+        def _open():
+            blob_conn = get_db_connection()
+            if not blob_conn:
+                raise Exception("Database connection failed")
+            try:
+                blob_cursor = blob_conn.cursor()
+                blob_cursor.execute(
+                    "SELECT tempImage FROM StudentImages WHERE imageId=%s",
+                    (image_id,)
+                )
+                (img_bytes,) = blob_cursor.fetchone()
+                blob_cursor.close()
+            finally:
+                blob_conn.close()
+            return BytesIO(img_bytes)
+        return _open
+
+    jobs = []
+    for imageId, spool_path in images:
+        key = f"uploads/{studentId}/{imageId}.jpg"
+        opener = (lambda p=spool_path: open_staged(p)) if spool_path else legacy_blob_opener(imageId)
+        jobs.append({"key": key, "open": opener, "imageId": imageId, "spoolPath": spool_path})
+
+    # Upload concurrently, streaming from the spool files
+    print(f"▶ Uploading {len(jobs)} images for {studentId}")
+    uploads = upload_stream_batch(jobs)
+    failed = [u for u in uploads if not u["success"]]
 
     try:
-        for imageId, img_bytes in images:
-            print("▶ Processing imageId:", imageId)
+        if failed:
+            # Keep staged images so the volunteer can retry
+            raise Exception(f"{len(failed)} of {len(jobs)} uploads failed: {failed[0]['error']}")
 
-            # Upload to S3
-            key = f"uploads/{studentId}/{imageId}.jpg"
-            s3.upload_fileobj(BytesIO(img_bytes), BUCKET, key)
-
-            # Insert final image
-            cursor.execute("""
-                INSERT INTO FinalImages (
-                    studentId,
-                    imageUrl
-                )
-                VALUES (%s, %s)
-            """, (
+        # One multi-row INSERT for all final images
+        cursor.executemany("""
+            INSERT INTO FinalImages (
                 studentId,
-                key
-            ))
-
-            results.append({
-                "imageId": imageId,
-                "s3_key": key
-            })
+                imageUrl
+            )
+            VALUES (%s, %s)
+        """, [(studentId, job["key"]) for job in jobs])
 
         cursor.execute(
             "DELETE FROM StudentImages WHERE studentId=%s",
@@ -299,6 +336,19 @@ def final_upload():
         cursor.close()
         conn.close()
 
+    # Keep the staged copies warm for the AI pipeline (a rename on the same
+    # filesystem) instead of deleting them and downloading from S3 later
+    for job in jobs:
+        if not job["spoolPath"]:
+            continue
+        try:
+            image_store.put_file(job["key"], job["spoolPath"], move=True)
+        except Exception as e:
+            print(f"⚠️ Could not keep {job['key']} warm: {e}")
+        remove_staged(job["spoolPath"])
+
+    results = [{"imageId": job["imageId"], "s3_key": job["key"]} for job in jobs]
+
     return jsonify({
         "success": True,
         "results": results
@@ -364,14 +414,26 @@ def get_images(studentId):
 # PV SUBMISSION
 # =====================================================
 
+def _needs_audio(student_id, rerun_node):
+    """Whether a re-run will execute the Audio node (i.e. it is not resumed from a checkpoint)"""
+    try:
+        stored = pv_checkpoints.stored_nodes(student_id)
+    except Exception as e:
+        print(f"⚠️ Could not read PV checkpoints for student {student_id}: {e}")
+        return True
+    return "Audio" in nodes_to_rerun(rerun_node) or "Audio" not in stored
+
+
 def run_pv_ai_pipeline(data, student_id, volunteer_id, recommendation):
-    """Run AI pipeline in background thread"""
+    """Run AI pipeline for a queued PV job (raises so the job queue can retry)"""
     try:
         from backend.services.rag_service import add_student_case
 
         text_comment = data.get("comments", "")
         is_tanglish = data.get("isTanglish", False)
         audio_base64 = data.get("voiceAudio", "")
+        # Admin re-run of one node: inputs come from the stored PV, not a new submission
+        rerun_node = data.get("rerunNode")
 
         # Handle audio file - upload to S3
         audio_s3_key = None
@@ -382,24 +444,41 @@ def run_pv_ai_pipeline(data, student_id, volunteer_id, recommendation):
                 header, encoded = audio_base64.split(",", 1)
                 encoded += "=" * ((4 - len(encoded) % 4) % 4)
                 audio_bytes = base64.b64decode(encoded)
+
+                # 16 kHz mono, silence trimmed, Opus/FLAC: this is what S3 and Gemini get
+                source_ext = audio_preprocess.extension_for(header[len("data:"):].split(";base64", 1)[0])
+                audio = audio_preprocess.preprocess(audio_bytes, source_ext)
+                
+                # Unprocessed recordings keep the previous .wav naming
+                audio_ext = audio["ext"] if audio["processed"] else ".wav"
+                content_type = audio["content_type"] if audio["processed"] else "audio/wav"
                 
                 # Upload to S3
-                audio_s3_key = f"audio/{student_id}.wav"
-                s3.upload_fileobj(BytesIO(audio_bytes), BUCKET, audio_s3_key)
+                audio_s3_key = f"audio/{student_id}{audio_ext}"
+                s3.upload_fileobj(BytesIO(audio["bytes"]), BUCKET, audio_s3_key,
+                                  ExtraArgs={"ContentType": content_type})
                 print(f"✅ Audio uploaded to S3: {audio_s3_key}")
                 
                 # Save temporary file for processing
-                audio_path = os.path.join(UPLOAD_FOLDER, f"{student_id}_temp.wav")
+                audio_path = os.path.join(UPLOAD_FOLDER, f"{student_id}_temp{audio_ext}")
                 with open(audio_path, "wb") as f:
-                    f.write(audio_bytes)
+                    f.write(audio["bytes"])
                 print(f"📁 Temp audio file created: {audio_path}")
                 
             except Exception as e:
                 print(f"❌ Error uploading audio: {e}")
                 audio_s3_key = None
                 audio_path = None
-
-        # Fetch & download images
+        elif rerun_node:
+            audio_s3_key = data.get("audioS3Key")
+            if audio_s3_key and _needs_audio(student_id, rerun_node):
+                audio_ext = os.path.splitext(audio_s3_key)[1] or ".wav"
+                audio_path = os.path.join(UPLOAD_FOLDER, f"{student_id}_temp{audio_ext}")
+                s3.download_file(BUCKET, audio_s3_key, audio_path)
+                print(f"📁 Audio fetched from S3 for re-run: {audio_s3_key}")
+
+        # Resolve images from the local image store (warm from upload);
+        # only misses are downloaded from S3, concurrently
         image_paths = []
         try:
             conn = get_db_connection()
@@ -411,30 +490,20 @@ def run_pv_ai_pipeline(data, student_id, volunteer_id, recommendation):
             cursor.close()
             conn.close()
 
-            for (s3_key,) in rows:
-                local_filename = f"{student_id}_{os.path.basename(s3_key)}"
-                local_path = os.path.join(UPLOAD_FOLDER, local_filename)
-                
-                # Download from S3
-                s3.download_file(BUCKET, s3_key, local_path)
-                image_paths.append(local_path)
+            image_paths = image_store.fetch_many([s3_key for (s3_key,) in rows if s3_key])
                 
         except Exception as img_err:
             print("⚠️ Failed to fetch/download images:", img_err)
 
         # Run AI pipeline
-        result = pv_process(text_comment, audio_path, image_paths, is_tanglish)
+        result = pv_process(text_comment, audio_path, image_paths, is_tanglish,
+                            student_id=student_id, rerun_node=rerun_node)
         
-        # Cleanup temporary files
+        # Cleanup temporary files (images stay in the image store, which evicts them)
         try:
             if audio_path and os.path.exists(audio_path):
                 os.remove(audio_path)
                 print(f"🗑️ Deleted temp audio: {audio_path}")
-            
-            for img_path in image_paths:
-                if os.path.exists(img_path):
-                    os.remove(img_path)
-                    print(f"🗑️ Deleted temp image: {img_path}")
         except Exception as cleanup_err:
             print(f"⚠️ Cleanup error: {cleanup_err}")
 
@@ -472,15 +541,18 @@ def run_pv_ai_pipeline(data, student_id, volunteer_id, recommendation):
         cursor = conn.cursor()
 
         # Fetch student district for RAG
-        cursor.execute("SELECT district FROM Student WHERE studentId=%s", (student_id,))
+        cursor.execute("SELECT district, status FROM Student WHERE studentId=%s", (student_id,))
         student_row = cursor.fetchone()
         student_district = student_row[0] if student_row else "Unknown"
+        student_status = student_row[1] if student_row else None
 
         # Combine summaries
         final_summary_text = "TEXT/AUDIO SUMMARY:\n" + "; ".join(summary_list)
 
-        # Insert house analysis
-        if house_points:
+        # Insert house analysis (a re-run that resumed HouseAnalysis already has its row;
+        # a failed first run committed nothing, so its retry always inserts)
+        house_executed = "HouseAnalysis" not in result.get("resumed_nodes", [])
+        if house_points and (not rerun_node or house_executed):
             try:
                 house_analysis_json = json.dumps(house_points)
                 cursor.execute("""
@@ -531,17 +603,28 @@ def run_pv_ai_pipeline(data, student_id, volunteer_id, recommendation):
         ))
         
         # Update Student status to PV_COMPLETED so they appear in admin review queue
-        cursor.execute("""
-            UPDATE Student
-            SET status = 'PV_COMPLETED'
-            WHERE studentId = %s
-        """, (student_id,))
+        # (a re-run only refreshes the AI output and keeps any admin decision)
+        if not rerun_node:
+            cursor.execute("""
+                UPDATE Student
+                SET status = 'PV_COMPLETED'
+                WHERE studentId = %s
+            """, (student_id,))
 
         conn.commit()
         cursor.close()
         conn.close()
 
-        # Update RAG knowledge base
+        pv_events.publish(student_id, "completed", {
+            "status": student_status if rerun_node else "PV_COMPLETED",
+            "decision": decision, "score": score, "rerun_node": rerun_node,
+        })
+
+        # Update RAG knowledge base (once an admin has decided, the case is kept under that decision)
+        if rerun_node and student_status != "PV_COMPLETED":
+            print(f"ℹ️ Re-run of {rerun_node}: RAG case left under the admin decision ({student_status})")
+            return
+
         try:
             add_student_case(
                 student_id=student_id,
@@ -567,6 +650,7 @@ def run_pv_ai_pipeline(data, student_id, volunteer_id, recommendation):
     except Exception as e:
         print("❌ ASYNC AI PIPELINE ERROR:", e)
         traceback.print_exc()
+        raise
 
 
 # =====================================================
@@ -610,6 +694,13 @@ def final_upload_batch():
                     ExtraArgs={'ContentType': image_file.content_type}
                 )
                 
+                # Keep a local copy warm for the AI pipeline
+                try:
+                    image_file.seek(0)
+                    image_store.put_bytes(filename, image_file.read())
+                except Exception as e:
+                    print(f"⚠️ Could not keep {filename} warm: {e}")
+                
                 return {"success": True, "key": filename}
             except Exception as e:
                 print(f"❌ S3 Upload Error: {e}")
@@ -727,12 +818,11 @@ def submit_pv():
         cursor.close()
         conn.close()
 
-        # Start AI in background
-        threading.Thread(
-            target=run_pv_ai_pipeline, 
-            args=(data, student_id, volunteer_id, recommendation),
-            daemon=True
-        ).start()
+        # A new submission starts from scratch; retries of its job resume from checkpoints
+        pv_checkpoints.clear(student_id)
+
+        # Queue AI pipeline (durable; picked up by the PV job workers)
+        enqueue_pv_job(data, student_id, volunteer_id, recommendation)
 
         return jsonify({"success": True, "message": "PV Updated. AI running."})
 
@@ -827,6 +917,30 @@ def api_pv_status(student_id):
     return jsonify({'exists': True, 'pv': row})
 
 
+def _event_stream(topic, replay=()):
+    return Response(
+        stream_with_context(pv_events.stream(topic, replay)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@volunteer_bp.route("/api/pv-events")
+def api_pv_events():
+    """SSE stream of pipeline progress for every PV this volunteer submitted"""
+    if 'volunteerId' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return _event_stream(f"volunteer:{session['volunteerId']}")
+
+
+@volunteer_bp.route("/api/pv-events/<student_id>")
+def api_pv_events_student(student_id):
+    """SSE stream of one student's pipeline progress (replays the current run first)"""
+    if 'volunteerId' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return _event_stream(f"student:{student_id}", pv_events.recent_events(student_id))
+
+
 # =====================================================
 # NEW AGENT ENDPOINTS
 # =====================================================
@@ -0,0 +1,200 @@
+"""
+AI Response Cache
+Persistent (SQLite) cache for Groq/Gemini responses keyed by content hash
+
+Key = SHA-256 over (namespace, model, prompt template version, temperature,
+SHA-256 of every input). Entries expire after AI_CACHE_TTL seconds and the
+least recently used ones are evicted once the file exceeds AI_CACHE_MAX_MB.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from backend.config import Config
+from backend.services.pv_tracing import record_cache
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+_writes_since_evict = 0
+
+# Run the (relatively expensive) size check once every N writes
+EVICT_EVERY = 20
+
+
+def _bump(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _get_conn():
+    """One SQLite connection per thread (WAL so gunicorn workers can share the file)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(Config.AI_CACHE_PATH)), exist_ok=True)
+        conn = sqlite3.connect(Config.AI_CACHE_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def hash_bytes(data):
+    """SHA-256 hex digest of bytes or str"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data or b"").hexdigest()
+
+
+def make_key(namespace, model, version, temperature, inputs):
+    """
+    Build the cache key
+
+    Args:
+        namespace (str): Logical call site, e.g. "tanglish"
+        model (str): Model name
+        version (str): Prompt template version
+        temperature (float): Sampling temperature
+        inputs (list): str/bytes inputs; each is hashed individually
+    """
+    parts = {
+        "ns": namespace,
+        "model": model,
+        "version": version,
+        "temperature": temperature,
+        "inputs": [hash_bytes(i) for i in inputs],
+    }
+    return hash_bytes(json.dumps(parts, sort_keys=True))
+
+
+def cache_get(key):
+    """Return the cached value or None (expired entries count as misses)"""
+    if not Config.AI_CACHE_ENABLED:
+        return None
+    try:
+        conn = _get_conn()
+        row = conn.execute(
+            "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > Config.AI_CACHE_TTL:
+            _bump("misses")
+            return None
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        _bump("hits")
+        return json.loads(row[0])
+    except Exception as e:
+        print(f"⚠️ AI cache read failed: {e}")
+        _bump("errors")
+        return None
+
+
+def cache_set(key, namespace, value):
+    """Store a JSON-serialisable value"""
+    global _writes_since_evict
+    if not Config.AI_CACHE_ENABLED:
+        return
+    try:
+        payload = json.dumps(value)
+        now = time.time()
+        conn = _get_conn()
+        conn.execute("""
+            INSERT OR REPLACE INTO responses (key, namespace, value, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (key, namespace, payload, len(payload), now, now))
+        conn.commit()
+        _bump("writes")
+
+        with _stats_lock:
+            _writes_since_evict += 1
+            run_evict = _writes_since_evict >= EVICT_EVERY
+            if run_evict:
+                _writes_since_evict = 0
+        if run_evict:
+            evict()
+    except Exception as e:
+        print(f"⚠️ AI cache write failed: {e}")
+        _bump("errors")
+
+
+def evict():
+    """Drop expired entries, then LRU entries until under AI_CACHE_MAX_MB"""
+    conn = _get_conn()
+    removed = conn.execute(
+        "DELETE FROM responses WHERE created_at < ?", (time.time() - Config.AI_CACHE_TTL,)
+    ).rowcount
+
+    max_bytes = Config.AI_CACHE_MAX_MB * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total > max_bytes:
+        # Trim to 90% so we don't evict on every subsequent write
+        target = total - int(max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        removed += len(victims)
+    conn.commit()
+    if removed:
+        _bump("evictions", removed)
+    return removed
+
+
+def cached_call(namespace, model, version, temperature, inputs, compute, cacheable=None):
+    """
+    Return a cached response or compute and store it
+
+    Args:
+        compute (callable): Produces the value on a miss
+        cacheable (callable): Optional predicate; failed/fallback results
+            should return False so they are retried next time
+    """
+    key = make_key(namespace, model, version, temperature, inputs)
+    value = cache_get(key)
+    record_cache(value is not None)
+    if value is not None:
+        print(f"⚡ AI cache hit ({namespace})")
+        return value
+
+    value = compute()
+    if cacheable is None or cacheable(value):
+        cache_set(key, namespace, value)
+    return value
+
+
+def get_cache_stats():
+    """Hit/miss counters for this process plus on-disk size"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["enabled"] = Config.AI_CACHE_ENABLED
+    if Config.AI_CACHE_ENABLED:
+        try:
+            entries, size = _get_conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            stats["entries"] = entries
+            stats["size_mb"] = round(size / (1024 * 1024), 2)
+        except Exception as e:
+            stats["error"] = str(e)
+    return stats
@@ -1,9 +1,17 @@
 import google.generativeai as genai
-import requests
 import re
 import json
+import mimetypes
 import os
-import time
+import threading
+import cv2
+import numpy as np
+from backend.config import Config
+from backend.services.ai_cache import cached_call
+from backend.services.groq_client import post_chat_completion
+from backend.services.rate_limiter import call_with_limits
+from backend.services.pv_tracing import record_tokens
+from backend.services.audio_preprocess import mime_type_for
 
 # Agent 1: Translation (Groq) - uses default 0.3
 # Agent 3: Master Analysis (Groq) - uses 0.1
@@ -20,7 +28,7 @@ except ImportError:
 # Gemini: For Audio & Images (Multimodal)
 genai.configure(api_key=os.environ["GEMINI_API_KEY"])
 model_gemini = genai.GenerativeModel(
-    "gemini-2.5-flash",
+    "gemini-2.5-flash",  # keep in sync with GEMINI_MODEL
     generation_config={
         "temperature": 0.3,  # Low temperature for consistent, fair analysis
         "top_p": 0.95,       # Nucleus sampling for quality
@@ -31,43 +39,60 @@ model_gemini = genai.GenerativeModel(
 
 # Groq: For Text Logic (Speed & Text-only)
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_MODEL = "llama-3.3-70b-versatile"  # Fast, smart, free tier available
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Prompt template versions - bump when a prompt changes so cached
+# responses produced by the old prompt are no longer served
+PROMPT_VERSIONS = {
+    "tanglish": "1",
+    "combined_analysis": "1",
+    "quality_check": "1",
+    "house_analysis": "1",
+}
+
+# Process-wide cap on in-flight Gemini requests, shared by every caller
+# (PV pipeline, temp-upload, batch quality check, OCR)
+_gemini_slots = threading.BoundedSemaphore(Config.GEMINI_MAX_CONCURRENCY)
 
 # ==========================================
 # 2. HELPER FUNCTIONS
 # ==========================================
 
 def retry_gemini_call(func, *args, **kwargs):
-    """Retries Gemini API calls with exponential backoff."""
-    max_retries = 3
-    delay = 2
-    for attempt in range(max_retries):
-        try:
+    """
+    Calls Gemini under the shared token bucket and circuit breaker, with
+    jittered exponential backoff on quota/transient errors.
+    """
+    def guarded():
+        with _gemini_slots:
             return func(*args, **kwargs)
-        except Exception as e:
-            msg = str(e).lower()
-            if "exhausted" in msg or "429" in msg or "quota" in msg:
-                print(f"⚠️ Gemini Quota Hit. Retrying in {delay}s...")
-                time.sleep(delay)
-                delay *= 2
-            else:
-                print(f"❌ Gemini Error: {e}")
-                raise e
-    raise Exception("Max retries exceeded for Gemini API")
-
-def call_groq_api(system_prompt, user_prompt, temperature=0.3):
-    """Calls Groq API for fast text processing."""
+
+    try:
+        response = call_with_limits("gemini", GEMINI_MODEL, os.environ["GEMINI_API_KEY"], guarded)
+    except Exception as e:
+        print(f"❌ Gemini Error: {e}")
+        raise
+    usage = getattr(response, "usage_metadata", None)
+    record_tokens(getattr(usage, "total_token_count", 0))
+    return response
+
+def call_groq_api(system_prompt, user_prompt, temperature=0.3, return_provider=False):
+    """
+    Calls Groq API for fast text processing (Gemini when Groq is unavailable).
+
+    With return_provider=True returns (text, "groq" | "gemini") so callers
+    can tell a fallback answer apart, e.g. to keep it out of the AI cache.
+    """
+    def answer(text, provider):
+        return (text, provider) if return_provider else text
+
     if not GROQ_API_KEY:
         print("⚠️ GROQ_API_KEY missing. Falling back to Gemini for text task.")
         # Fallback to Gemini if Groq key is missing
         prompt = f"{system_prompt}\n\nTask: {user_prompt}"
-        return retry_gemini_call(model_gemini.generate_content, prompt).text
+        return answer(retry_gemini_call(model_gemini.generate_content, prompt).text, "gemini")
 
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
     payload = {
         "model": GROQ_MODEL,
         "messages": [
@@ -79,14 +104,18 @@ def call_groq_api(system_prompt, user_prompt, temperature=0.3):
     }
 
     try:
-        response = requests.post(GROQ_URL, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
+        # Shared keep-alive session (connection reuse, connect retries, latency stats)
+        response = call_with_limits(
+            "groq", GROQ_MODEL, GROQ_API_KEY,
+            post_chat_completion, GROQ_API_KEY, payload, timeout=30
+        )
+        record_tokens((response.get('usage') or {}).get('total_tokens', 0))
+        return answer(response['choices'][0]['message']['content'], "groq")
     except Exception as e:
         print(f"❌ Groq API Error: {e}. Falling back to Gemini.")
         # Fallback to Gemini on Groq failure
         prompt = f"{system_prompt}\n\nTask: {user_prompt}"
-        return retry_gemini_call(model_gemini.generate_content, prompt).text
+        return answer(retry_gemini_call(model_gemini.generate_content, prompt).text, "gemini")
 
 
 # ==========================================
@@ -99,7 +128,7 @@ def audio_to_english(audio_path):
         raise ValueError("audio_path is missing")
     
     print(f"🎤 Transcribing Audio via Gemini: {audio_path}")
-    uploaded = genai.upload_file(audio_path)
+    uploaded = genai.upload_file(audio_path, mime_type=mime_type_for(audio_path))
     
     response = retry_gemini_call(model_gemini.generate_content, [
         uploaded,
@@ -115,7 +144,18 @@ def tanglish_to_english(text):
     sys = "You are a translator. Convert Tanglish (Tamil+English mix) to professional English."
     user = f"Convert this text:\n{text}"
     
-    return call_groq_api(sys, user).strip()
+    # The key names GROQ_MODEL, so Gemini fallback answers are not cached
+    answered = {}
+
+    def compute():
+        result, answered["provider"] = call_groq_api(sys, user, return_provider=True)
+        return result.strip()
+
+    return cached_call(
+        "tanglish", GROQ_MODEL, PROMPT_VERSIONS["tanglish"], 0.3, [text],
+        compute,
+        cacheable=lambda r: answered.get("provider") == "groq"
+    )
 
 
 # [PYTHON] MERGE TEXTS
@@ -155,24 +195,97 @@ def generate_combined_analysis(combined_text, rag_context=""):
     user_parts.append(f"CURRENT CASE:\n{combined_text}")
     user = "".join(user_parts)
 
-    raw = call_groq_api(sys, user, temperature=0.1)
+    answered = {}
+
+    def compute():
+        raw, answered["provider"] = call_groq_api(sys, user, temperature=0.1, return_provider=True)
+
+        # Clean & Parse JSON
+        try:
+            # Find JSON block if Groq adds extra text
+            match = re.search(r"\{[\s\S]*?\}", raw)
+            json_str = match.group() if match else raw
+            return json.loads(json_str)
+        except Exception as e:
+            print("⚠️ AI JSON Parse Error:", e)
+            return {
+                "summary": ["Error parsing AI analysis."],
+                "decision": "ON HOLD",
+                "score": 0.0,
+                "_error": True
+            }
+
+    result = cached_call(
+        "combined_analysis", GROQ_MODEL, PROMPT_VERSIONS["combined_analysis"], 0.1,
+        [combined_text, rag_context or ""],
+        compute,
+        cacheable=lambda r: not r.get("_error") and answered.get("provider") == "groq"  # no Gemini fallbacks
+    )
+    result.pop("_error", None)
+    return result
+
+# [OPENCV] LOCAL IMAGE QUALITY PRE-SCREEN
+def local_quality_check(image_bytes):
+    """
+    Score blur/exposure/blank frames locally with OpenCV.
+
+    Returns {"status": "GOOD" | "BAD" | "UNSURE", "reason": ..., "metrics": {...}}.
+    Only UNSURE images need to go to Gemini.
+    """
+    nparr = np.frombuffer(image_bytes or b"", np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE) if nparr.size else None
+    if img is None:
+        # OpenCV lacks some codecs (e.g. HEIC from iPhones) that Gemini reads fine
+        return {"status": "UNSURE", "reason": "Image could not be decoded locally", "metrics": {}}
+
+    # Normalise resolution so Laplacian variance is comparable across cameras
+    h, w = img.shape[:2]
+    scale = 1024.0 / max(h, w)
+    if scale < 1.0:
+        img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+    sharpness = float(cv2.Laplacian(img, cv2.CV_64F).var())
+    mean = float(img.mean())
+    std = float(img.std())
+    hist = cv2.calcHist([img], [0], None, [256], [0, 256]).ravel() / img.size
+    clip_dark = float(hist[:6].sum())
+    clip_bright = float(hist[250:].sum())
+
+    metrics = {
+        "sharpness": round(sharpness, 1),
+        "mean_intensity": round(mean, 1),
+        "contrast": round(std, 1),
+        "clipped_dark": round(clip_dark, 3),
+        "clipped_bright": round(clip_bright, 3),
+    }
+
+    if std < Config.IMAGE_QC_BLANK_STD:
+        return {"status": "BAD", "reason": "Blank or uniform frame (nothing visible)", "metrics": metrics}
+    if mean < Config.IMAGE_QC_DARK_MEAN or clip_dark > Config.IMAGE_QC_CLIP_FRACTION:
+        return {"status": "BAD", "reason": "Too dark (underexposed) - details not visible", "metrics": metrics}
+    if mean > Config.IMAGE_QC_BRIGHT_MEAN or clip_bright > Config.IMAGE_QC_CLIP_FRACTION:
+        return {"status": "BAD", "reason": "Too bright (overexposed) - details washed out", "metrics": metrics}
+    if sharpness < Config.IMAGE_QC_BLUR_BAD:
+        return {"status": "BAD", "reason": "Image is blurry or out of focus", "metrics": metrics}
+
+    well_exposed = (clip_dark + clip_bright) <= Config.IMAGE_QC_CLIP_FRACTION / 5
+    if sharpness >= Config.IMAGE_QC_BLUR_GOOD and well_exposed:
+        return {"status": "GOOD", "reason": "Sharp and well exposed", "metrics": metrics}
+
+    return {"status": "UNSURE", "reason": "Borderline quality", "metrics": metrics}
 
-    # Clean & Parse JSON
-    try:
-        # Find JSON block if Groq adds extra text
-        match = re.search(r"\{[\s\S]*?\}", raw)
-        json_str = match.group() if match else raw
-        return json.loads(json_str)
-    except Exception as e:
-        print("⚠️ AI JSON Parse Error:", e)
-        return {
-            "summary": ["Error parsing AI analysis."],
-            "decision": "ON HOLD",
-            "score": 0.0
-        }
 
 # [GEMINI] IMAGE QUALITY CHECK
 def ai_quality_check(image_bytes):
+    # Obvious GOOD/BAD cases are decided locally in milliseconds
+    if Config.IMAGE_QC_LOCAL_ENABLED:
+        try:
+            local = local_quality_check(image_bytes)
+            if local["status"] != "UNSURE":
+                return {"status": local["status"], "reason": local["reason"], "source": "local"}
+        except Exception as e:
+            print(f"⚠️ Local quality check failed, using Gemini: {e}")
+
     prompt = """
     You are an objective image quality analyzer. Analyze this image for TECHNICAL QUALITY ONLY.
     Return JSON ONLY: {"status": "GOOD" | "BAD", "reason": "specific technical issue"}
@@ -218,17 +331,24 @@ def ai_quality_check(image_bytes):
     When in doubt about house condition/type, mark as GOOD (not your job to judge).
     """
     
-    response = retry_gemini_call(model_gemini.generate_content, [
-        prompt,
-        {"mime_type": "image/jpeg", "data": image_bytes}
-    ])
-    
-    try:
-        raw = response.text or "{}"
-        match = re.search(r"\{[\s\S]*?\}", raw)
-        return json.loads(match.group()) if match else {"status":"BAD", "reason":"Parse Error"}
-    except:
-        return {"status": "BAD", "reason": "AI Error"}
+    def compute():
+        response = retry_gemini_call(model_gemini.generate_content, [
+            prompt,
+            {"mime_type": "image/jpeg", "data": image_bytes}
+        ])
+        
+        try:
+            raw = response.text or "{}"
+            match = re.search(r"\{[\s\S]*?\}", raw)
+            return json.loads(match.group()) if match else {"status":"BAD", "reason":"Parse Error"}
+        except:
+            return {"status": "BAD", "reason": "AI Error"}
+
+    return cached_call(
+        "quality_check", GEMINI_MODEL, PROMPT_VERSIONS["quality_check"], 0.3, [image_bytes],
+        compute,
+        cacheable=lambda r: r.get("reason") not in ("Parse Error", "AI Error")
+    )
 
 # [GEMINI] COLLECTIVE HOUSE ANALYSIS
 def ai_house_analysis(image_paths):
@@ -248,26 +368,54 @@ def ai_house_analysis(image_paths):
     - Condition: "POOR" if needy, "GOOD" if wealthy.
     """
     
-    content = [prompt]
+    # Cache on image content, not paths (paths are per-run temp files)
+    image_contents = []
     for p in image_paths:
         try:
-            content.append(genai.upload_file(p))
-        except Exception as e:
-            print(f"⚠️ Skip img {p}: {e}")
-            
-    response = retry_gemini_call(model_gemini.generate_content, content)
-    
-    # Parse JSON
-    try:
-        raw = response.text or "{}"
-        match = re.search(r"\{[\s\S]*?\}", raw)
-        data = json.loads(match.group()) if match else {}
-        return {
-            "points": data.get("points", ["Analysis failed"]),
-            "condition": data.get("condition", "UNKNOWN")
-        }
-    except:
-        return {"points": ["Error parsing house analysis"], "condition": "UNKNOWN"}
+            with open(p, "rb") as f:
+                image_contents.append(f.read())
+        except OSError as e:
+            print(f"⚠️ Could not read img {p} for cache key: {e}")
+            image_contents.append(p)
+
+    # Small batches go inline with the request; only large ones pay for a
+    # separate File API upload per image
+    inline_ok = (
+        all(isinstance(c, bytes) for c in image_contents)
+        and sum(len(c) for c in image_contents) <= Config.GEMINI_INLINE_MAX_MB * 1024 * 1024
+    )
+
+    def compute():
+        content = [prompt]
+        for p, data in zip(image_paths, image_contents):
+            if inline_ok:
+                mime_type = mimetypes.guess_type(p)[0] or "image/jpeg"
+                content.append({"mime_type": mime_type, "data": data})
+                continue
+            try:
+                content.append(genai.upload_file(p))
+            except Exception as e:
+                print(f"⚠️ Skip img {p}: {e}")
+                
+        response = retry_gemini_call(model_gemini.generate_content, content)
+        
+        # Parse JSON
+        try:
+            raw = response.text or "{}"
+            match = re.search(r"\{[\s\S]*?\}", raw)
+            data = json.loads(match.group()) if match else {}
+            return {
+                "points": data.get("points", ["Analysis failed"]),
+                "condition": data.get("condition", "UNKNOWN")
+            }
+        except:
+            return {"points": ["Error parsing house analysis"], "condition": "UNKNOWN"}
+
+    return cached_call(
+        "house_analysis", GEMINI_MODEL, PROMPT_VERSIONS["house_analysis"], 0.3, image_contents,
+        compute,
+        cacheable=lambda r: r.get("condition") != "UNKNOWN"
+    )
 
 
 # ==========================================
@@ -276,9 +424,6 @@ def ai_house_analysis(image_paths):
 # Technology: OpenCV (local) + Gemini (validation)
 # Purpose: Enhance poor-quality images for better analysis
 
-import cv2
-import numpy as np
-
 def agent_image_enhancement(image_bytes):
     """
     Agent 6: Image Enhancement Agent
@@ -0,0 +1,132 @@
+"""
+Audio Preprocessing
+Shrinks volunteer voice notes before S3 storage and Gemini transcription
+
+Recordings (MediaRecorder WebM/Opus from the PV form, or WAV) are decoded
+with ffmpeg, downmixed to 16 kHz mono - all speech recognition needs -
+stripped of leading silence and of pauses longer than
+AUDIO_SILENCE_MIN_SECONDS, then encoded as speech-tuned Ogg/Opus
+(AUDIO_BITRATE) or lossless FLAC. The compressed file is what gets stored
+in S3 and uploaded to Gemini.
+
+ffmpeg is an external binary (AUDIO_FFMPEG_PATH). If it is missing or
+fails, or the result would be larger than the input, the original bytes
+are used so a PV never fails because of preprocessing.
+"""
+import os
+import subprocess
+import tempfile
+import time
+
+from backend.config import Config
+
+# data-URL mime type -> file extension of the original recording
+_SOURCE_EXTENSIONS = {
+    "audio/webm": ".webm",
+    "audio/ogg": ".ogg",
+    "audio/wav": ".wav",
+    "audio/x-wav": ".wav",
+    "audio/wave": ".wav",
+    "audio/mp4": ".m4a",
+    "audio/mpeg": ".mp3",
+}
+
+MIME_TYPES = {
+    ".ogg": "audio/ogg",
+    ".flac": "audio/flac",
+    ".webm": "audio/webm",
+    ".wav": "audio/wav",
+    ".m4a": "audio/mp4",
+    ".mp3": "audio/mpeg",
+}
+
+
+def extension_for(mime_type):
+    """File extension for a recording's mime type (".wav" when unknown)"""
+    base = (mime_type or "").split(";", 1)[0].strip().lower()
+    return _SOURCE_EXTENSIONS.get(base, ".wav")
+
+
+def mime_type_for(path):
+    return MIME_TYPES.get(os.path.splitext(path or "")[1].lower(), "application/octet-stream")
+
+
+def _ffmpeg_command(source_path, codec):
+    threshold = f"{Config.AUDIO_SILENCE_THRESHOLD_DB}dB"
+    min_silence = Config.AUDIO_SILENCE_MIN_SECONDS
+    silence_filter = (
+        f"silenceremove=start_periods=1:start_threshold={threshold}:start_silence=0.2"
+        f":stop_periods=-1:stop_threshold={threshold}:stop_duration={min_silence}:stop_silence=0.3"
+    )
+    command = [
+        Config.AUDIO_FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-nostdin",
+        "-i", source_path,
+        "-ac", "1", "-ar", str(Config.AUDIO_SAMPLE_RATE),
+        "-af", silence_filter,
+        "-map_metadata", "-1",
+    ]
+    if codec == "flac":
+        command += ["-c:a", "flac", "-compression_level", "8", "-f", "flac"]
+    else:
+        command += ["-c:a", "libopus", "-b:a", Config.AUDIO_BITRATE, "-application", "voip", "-f", "ogg"]
+    return command + ["pipe:1"]
+
+
+def preprocess(audio_bytes, source_ext=".wav"):
+    """
+    Resample, trim silence and compress a recording
+
+    Returns:
+        dict: bytes, ext, content_type, original_size, size, processed (False when
+              the original bytes were kept) and elapsed_ms
+    """
+    original = {
+        "bytes": audio_bytes,
+        "ext": source_ext,
+        "content_type": MIME_TYPES.get(source_ext, "application/octet-stream"),
+        "original_size": len(audio_bytes),
+        "size": len(audio_bytes),
+        "processed": False,
+        "elapsed_ms": 0,
+    }
+    if not Config.AUDIO_PREPROCESS_ENABLED or not audio_bytes:
+        return original
+
+    codec = "flac" if Config.AUDIO_CODEC == "flac" else "opus"
+    started = time.perf_counter()
+    # Containers such as MP4 need a seekable input, so feed ffmpeg a file
+    fd, source_path = tempfile.mkstemp(suffix=source_ext)
+    try:
+        with os.fdopen(fd, "wb") as source:
+            source.write(audio_bytes)
+        completed = subprocess.run(
+            _ffmpeg_command(source_path, codec),
+            capture_output=True,
+            timeout=Config.AUDIO_PREPROCESS_TIMEOUT
+        )
+        if completed.returncode != 0 or not completed.stdout:
+            raise RuntimeError(completed.stderr.decode("utf-8", errors="replace").strip()[:500] or "no output")
+    except Exception as e:
+        print(f"⚠️ Audio preprocessing skipped: {e}")
+        return original
+    finally:
+        os.remove(source_path)
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    output = completed.stdout
+    if len(output) >= len(audio_bytes):
+        print(f"ℹ️ Audio preprocessing kept the original ({len(audio_bytes):,} B ≤ {len(output):,} B {codec})")
+        return {**original, "elapsed_ms": elapsed_ms}
+
+    ext = ".flac" if codec == "flac" else ".ogg"
+    print(f"🎚️ Audio: {len(audio_bytes):,} B → {len(output):,} B {codec} "
+          f"({100 * (1 - len(output) / len(audio_bytes)):.0f}% smaller) in {elapsed_ms}ms")
+    return {
+        "bytes": output,
+        "ext": ext,
+        "content_type": MIME_TYPES[ext],
+        "original_size": len(audio_bytes),
+        "size": len(output),
+        "processed": True,
+        "elapsed_ms": elapsed_ms,
+    }
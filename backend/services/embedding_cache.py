@@ -0,0 +1,204 @@
+"""
+Embedding Cache
+Two-level (in-memory LRU + SQLite) cache for text embeddings
+
+Key = (model, task_type, SHA-256 of text). Vectors are stored as float32
+blobs. The least recently used rows are evicted once the file holds more
+than EMBEDDING_CACHE_MAX_ENTRIES vectors.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from backend.config import Config
+
+_local = threading.local()
+_lock = threading.Lock()
+_memory = OrderedDict()
+_stats = {"hits": 0, "memory_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+_writes_since_evict = 0
+
+# Trim the SQLite file once every N writes
+EVICT_EVERY = 200
+
+
+def _get_conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(Config.EMBEDDING_CACHE_PATH)), exist_ok=True)
+        conn = sqlite3.connect(Config.EMBEDDING_CACHE_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings (last_access)")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def make_key(model, task_type, text):
+    digest = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    return f"{model}|{task_type}|{digest}"
+
+
+def _remember(key, vector):
+    """Insert into the in-memory LRU (caller holds _lock)"""
+    _memory[key] = vector
+    _memory.move_to_end(key)
+    while len(_memory) > Config.EMBEDDING_CACHE_MEMORY_ITEMS:
+        _memory.popitem(last=False)
+
+
+def get_many(model, task_type, texts):
+    """
+    Look up many texts at once
+
+    Returns:
+        list: Embedding (list of floats) or None per text, in input order
+    """
+    if not Config.EMBEDDING_CACHE_ENABLED:
+        return [None] * len(texts)
+
+    keys = [make_key(model, task_type, t) for t in texts]
+    found = {}
+    with _lock:
+        for key in keys:
+            if key in _memory:
+                _memory.move_to_end(key)
+                found[key] = _memory[key]
+        _stats["memory_hits"] += len(found)
+
+    missing = [k for k in dict.fromkeys(keys) if k not in found]
+    if missing:
+        try:
+            conn = _get_conn()
+            now = time.time()
+            # SQLite caps bound parameters; query in chunks
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+                if rows:
+                    conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows]
+                    )
+            conn.commit()
+        except Exception as e:
+            print(f"⚠️ Embedding cache read failed: {e}")
+            with _lock:
+                _stats["errors"] += 1
+
+    with _lock:
+        for key in missing:
+            if key in found:
+                _remember(key, found[key])
+        hits = sum(1 for k in keys if k in found)
+        _stats["hits"] += hits
+        _stats["misses"] += len(keys) - hits
+
+    return [found.get(k) for k in keys]
+
+
+def get(model, task_type, text):
+    """Cached embedding for one text, or None"""
+    return get_many(model, task_type, [text])[0]
+
+
+def put_many(model, task_type, texts, vectors):
+    """Store embeddings for many texts"""
+    global _writes_since_evict
+    if not Config.EMBEDDING_CACHE_ENABLED or not texts:
+        return
+
+    now = time.time()
+    rows = []
+    with _lock:
+        for text, vector in zip(texts, vectors):
+            key = make_key(model, task_type, text)
+            vector = list(vector)
+            _remember(key, vector)
+            rows.append((key, model, task_type, array("f", vector).tobytes(), now))
+
+    try:
+        conn = _get_conn()
+        conn.executemany("""
+            INSERT OR REPLACE INTO embeddings (key, model, task_type, vector, last_access)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Embedding cache write failed: {e}")
+        with _lock:
+            _stats["errors"] += 1
+        return
+
+    with _lock:
+        _stats["writes"] += len(rows)
+        _writes_since_evict += len(rows)
+        run_evict = _writes_since_evict >= EVICT_EVERY
+        if run_evict:
+            _writes_since_evict = 0
+    if run_evict:
+        # The vectors are already stored; a failed trim must not fail the embedding call
+        try:
+            evict()
+        except Exception as e:
+            print(f"⚠️ Embedding cache eviction failed: {e}")
+            with _lock:
+                _stats["errors"] += 1
+
+
+def put(model, task_type, text, vector):
+    """Store the embedding for one text"""
+    put_many(model, task_type, [text], [vector])
+
+
+def evict(max_entries=None):
+    """Delete least recently used rows beyond max_entries"""
+    max_entries = Config.EMBEDDING_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    conn = _get_conn()
+    count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    excess = count - max_entries
+    if excess <= 0:
+        return 0
+    conn.execute("""
+        DELETE FROM embeddings WHERE key IN (
+            SELECT key FROM embeddings ORDER BY last_access LIMIT ?
+        )
+    """, (excess,))
+    conn.commit()
+    with _lock:
+        _stats["evictions"] += excess
+    return excess
+
+
+def get_stats():
+    """Hit/miss counters for this process plus on-disk entry count"""
+    with _lock:
+        stats = dict(_stats)
+        stats["memory_entries"] = len(_memory)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["enabled"] = Config.EMBEDDING_CACHE_ENABLED
+    if Config.EMBEDDING_CACHE_ENABLED:
+        try:
+            stats["disk_entries"] = _get_conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        except Exception as e:
+            stats["error"] = str(e)
+    return stats
@@ -0,0 +1,131 @@
+"""
+Groq HTTP Client
+Shared keep-alive session for all Groq chat-completion calls
+
+One pooled requests.Session per process: TLS connections to api.groq.com are
+reused across calls (pool size GROQ_POOL_SIZE) and connection failures are
+retried (GROQ_CONNECT_RETRIES) before anything is sent, so POSTs are never
+replayed. Every call records connect time (0 when a pooled connection was
+reused), time to first byte and total latency.
+"""
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from backend.config import Config
+
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+_timing = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "errors": 0, "new_connections": 0}
+_recent = deque(maxlen=500)  # (connect_ms, ttfb_ms, total_ms) of recent calls
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection that reports how long TCP + TLS setup took"""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        _timing.connect_s = getattr(_timing, "connect_s", 0.0) + time.perf_counter() - started
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def _build_session():
+    retry = Retry(
+        total=Config.GROQ_CONNECT_RETRIES,
+        connect=Config.GROQ_CONNECT_RETRIES,
+        read=0,
+        status=0,
+        redirect=0,
+        backoff_factor=0.3,
+        allowed_methods=None,  # POST is safe to retry: connect errors happen before sending
+    )
+    adapter = _TimedAdapter(pool_connections=1, pool_maxsize=Config.GROQ_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+
+_session = _build_session()
+
+
+def post_chat_completion(api_key, payload, timeout=30):
+    """
+    POST a chat completion through the shared session
+
+    Returns:
+        dict: Decoded JSON response (raises on HTTP/connection errors)
+    """
+    _timing.connect_s = 0.0
+    started = time.perf_counter()
+    try:
+        # stream=True returns once headers arrive, which marks time to first byte
+        response = _session.post(
+            GROQ_URL,
+            headers={"Authorization": f"Bearer {api_key}"},
+            json=payload,
+            timeout=timeout,
+            stream=True,
+        )
+        ttfb = time.perf_counter() - started
+        with response:
+            response.raise_for_status()
+            body = response.json()
+    except Exception:
+        with _stats_lock:
+            _stats["calls"] += 1
+            _stats["errors"] += 1
+        raise
+
+    total = time.perf_counter() - started
+    connect = _timing.connect_s
+    with _stats_lock:
+        _stats["calls"] += 1
+        if connect:
+            _stats["new_connections"] += 1
+        _recent.append((connect * 1000, ttfb * 1000, total * 1000))
+    print(f"⏱️ Groq call: connect {connect * 1000:.0f}ms, ttfb {ttfb * 1000:.0f}ms, total {total * 1000:.0f}ms")
+    return body
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))], 1)
+
+
+def get_groq_stats():
+    """Call counts, connection reuse and latency percentiles over recent calls"""
+    with _stats_lock:
+        stats = dict(_stats)
+        recent = list(_recent)
+    successful = stats["calls"] - stats["errors"]
+    stats["connection_reuse_rate"] = round(1 - stats["new_connections"] / successful, 3) if successful else 0.0
+    stats["pool_size"] = Config.GROQ_POOL_SIZE
+    for i, name in enumerate(("connect_ms", "ttfb_ms", "total_ms")):
+        values = [r[i] for r in recent]
+        stats[name] = {"p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+    stats["sample_size"] = len(recent)
+    return stats
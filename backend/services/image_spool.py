@@ -0,0 +1,139 @@
+"""
+Image Spool Service
+Local staging area for PV images between /api/temp-upload and /api/final-upload
+
+Image bytes live on disk under IMAGE_SPOOL_DIR/<studentId>/; MySQL's
+StudentImages table only keeps metadata (spoolPath, sizeBytes). A janitor
+thread expires staged images that were never finalized.
+"""
+import os
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+from backend.config import Config
+from backend.models.database import get_db_connection
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def _student_dir(student_id):
+    safe_id = secure_filename(str(student_id)) or "unknown"
+    return os.path.join(Config.IMAGE_SPOOL_DIR, safe_id)
+
+
+def stage_image(student_id, image_bytes, ext="jpg"):
+    """
+    Write image bytes to the spool (atomic rename, never half-written)
+
+    Returns:
+        tuple: (spool_path, size_bytes)
+    """
+    folder = _student_dir(student_id)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{uuid.uuid4().hex}.{ext}")
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(image_bytes)
+    os.replace(tmp_path, path)
+    return path, len(image_bytes)
+
+
+def open_staged(spool_path):
+    """Open a staged image for streaming (caller closes)"""
+    return open(spool_path, "rb")
+
+
+def remove_staged(spool_path):
+    """Delete a staged file, ignoring ones already gone"""
+    if not spool_path:
+        return
+    try:
+        os.remove(spool_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ Could not remove staged image {spool_path}: {e}")
+        return
+    # Drop the per-student folder once it is empty
+    try:
+        os.rmdir(os.path.dirname(spool_path))
+    except OSError:
+        pass
+
+
+def expire_staged(max_age=None):
+    """
+    Janitor pass: delete staged images (rows and files) older than max_age
+
+    Args:
+        max_age (int): Seconds (default: Config.IMAGE_SPOOL_TTL)
+
+    Returns:
+        dict: rows and files removed
+    """
+    max_age = Config.IMAGE_SPOOL_TTL if max_age is None else max_age
+    removed_rows = 0
+
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT imageId, spoolPath FROM StudentImages
+                WHERE uploadedAt < NOW() - INTERVAL %s SECOND
+            """, (int(max_age),))
+            stale = cursor.fetchall()
+            if stale:
+                cursor.executemany(
+                    "DELETE FROM StudentImages WHERE imageId = %s",
+                    [(image_id,) for image_id, _ in stale]
+                )
+                conn.commit()
+                removed_rows = len(stale)
+                for _, spool_path in stale:
+                    remove_staged(spool_path)
+        finally:
+            cursor.close()
+            conn.close()
+
+    # Orphaned files (row already gone, crash between write and insert, ...)
+    removed_files = 0
+    cutoff = time.time() - max_age
+    if os.path.isdir(Config.IMAGE_SPOOL_DIR):
+        for root, _, files in os.walk(Config.IMAGE_SPOOL_DIR):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        remove_staged(path)
+                        removed_files += 1
+                except OSError:
+                    pass
+
+    if removed_rows or removed_files:
+        print(f"🧹 Image spool janitor: {removed_rows} rows, {removed_files} orphan files expired")
+    return {"rows": removed_rows, "files": removed_files}
+
+
+def _janitor_loop():
+    while True:
+        try:
+            expire_staged()
+        except Exception as e:
+            print(f"⚠️ Image spool janitor failed: {e}")
+        time.sleep(Config.IMAGE_SPOOL_JANITOR_INTERVAL)
+
+
+def start_janitor():
+    """Start the background janitor thread (idempotent per process)"""
+    global _janitor
+    with _janitor_lock:
+        if _janitor is not None:
+            return
+        os.makedirs(Config.IMAGE_SPOOL_DIR, exist_ok=True)
+        _janitor = threading.Thread(target=_janitor_loop, name="image-spool-janitor", daemon=True)
+        _janitor.start()
@@ -0,0 +1,171 @@
+"""
+Local Image Store
+Warm local-disk copy of recently uploaded S3 images, keyed by S3 key
+
+Finalize/upload paths put images here as they go to S3, so the PV AI
+pipeline reads them from local disk instead of downloading them again.
+Misses are downloaded from S3 concurrently. Least recently used files are
+evicted once the store exceeds IMAGE_STORE_MAX_MB.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.config import Config
+from backend.services.s3_service import download_file_from_s3
+
+_lock = threading.Lock()
+_puts_since_evict = 0
+
+# Run the directory scan for eviction once every N puts
+EVICT_EVERY = 20
+
+
+def local_path_for(s3_key):
+    """Deterministic local path for an S3 key (keeps the extension for MIME detection)"""
+    digest = hashlib.sha256(s3_key.encode("utf-8")).hexdigest()
+    ext = os.path.splitext(s3_key)[1].lower() or ".jpg"
+    return os.path.join(Config.IMAGE_STORE_DIR, digest[:2], digest + ext)
+
+
+def _tmp_path(path):
+    return f"{path}.{uuid.uuid4().hex}.part"
+
+
+def _after_put():
+    global _puts_since_evict
+    with _lock:
+        _puts_since_evict += 1
+        run = _puts_since_evict >= EVICT_EVERY
+        if run:
+            _puts_since_evict = 0
+    if run:
+        evict()
+
+
+def put_bytes(s3_key, data):
+    """Store image bytes under an S3 key; returns the local path"""
+    path = local_path_for(s3_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = _tmp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    _after_put()
+    return path
+
+
+def put_file(s3_key, src_path, move=False):
+    """
+    Store an existing file under an S3 key; returns the local path
+
+    Args:
+        move (bool): Move instead of copy (a rename when on the same filesystem)
+    """
+    path = local_path_for(s3_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = _tmp_path(path)
+    if move:
+        shutil.move(src_path, tmp)
+    else:
+        shutil.copyfile(src_path, tmp)
+    os.replace(tmp, path)
+    _after_put()
+    return path
+
+
+def get_path(s3_key):
+    """Local path if the image is warm, else None (refreshes its LRU position)"""
+    path = local_path_for(s3_key)
+    try:
+        os.utime(path, None)
+        return path
+    except OSError:
+        return None
+
+
+def fetch(s3_key):
+    """Local path for an S3 key, downloading it on a miss (None on failure)"""
+    path = get_path(s3_key)
+    if path:
+        return path
+
+    path = local_path_for(s3_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = _tmp_path(path)
+    if not download_file_from_s3(s3_key, tmp):
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return None
+    os.replace(tmp, path)
+    _after_put()
+    return path
+
+
+def fetch_many(s3_keys, max_workers=None):
+    """
+    Resolve many S3 keys to local paths, downloading misses concurrently
+
+    Returns:
+        list: Local paths in input order (keys that could not be fetched are skipped)
+    """
+    if not s3_keys:
+        return []
+    misses = sum(1 for k in s3_keys if get_path(k) is None)
+    if misses:
+        print(f"⬇️ Image store: {len(s3_keys) - misses} warm, downloading {misses} from S3")
+
+    workers = max(1, min(max_workers or Config.S3_UPLOAD_WORKERS, len(s3_keys)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        paths = list(executor.map(fetch, s3_keys))
+    return [p for p in paths if p]
+
+
+def evict(max_bytes=None, max_age=None):
+    """Drop files older than IMAGE_STORE_TTL, then LRU files until under the size cap"""
+    max_bytes = Config.IMAGE_STORE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    max_age = Config.IMAGE_STORE_TTL if max_age is None else max_age
+    if not os.path.isdir(Config.IMAGE_STORE_DIR):
+        return 0
+
+    now = time.time()
+    entries = []
+    removed = 0
+    for root, _, files in os.walk(Config.IMAGE_STORE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            # .part files are writes in progress unless they are stale
+            if name.endswith(".part") and now - st.st_mtime < 3600:
+                continue
+            if now - st.st_mtime > max_age or name.endswith(".part"):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    if total > max_bytes:
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+                removed += 1
+                total -= size
+            except OSError:
+                pass
+            if total <= max_bytes * 0.9:
+                break
+    return removed
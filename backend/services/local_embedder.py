@@ -0,0 +1,53 @@
+"""
+Local Embedder
+Deterministic CPU-only text embeddings for RAG (no network, no model files)
+
+Signed feature hashing of word unigrams and bigrams with sublinear term
+frequency, L2-normalized. Nothing is fitted, so every process produces the
+same vector for the same text. Any change to tokenization, features or
+dimension must bump VERSION: it names the collection these vectors live in,
+which keeps them from ever mixing with Gemini vectors or an older scheme.
+"""
+import math
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+VERSION = "local-hash-v1"
+DIM = 768
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its "
+    "of on or she that the their them there they this to was were which who will with".split()
+)
+
+
+def _features(text):
+    tokens = [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    for left, right in zip(tokens, tokens[1:]):
+        bigram = f"{left} {right}"
+        counts[bigram] = counts.get(bigram, 0) + 1
+    return counts
+
+
+def embed(texts: List[str]) -> List[List[float]]:
+    """Embed texts; returns unit vectors (all zeros for empty text)"""
+    vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for feature, count in _features(text).items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            vectors[i, h % DIM] += sign * (1.0 + math.log(count))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).tolist()
+
+
+def embed_one(text: str) -> List[float]:
+    return embed([text])[0]
@@ -0,0 +1,126 @@
+"""
+PV Checkpoints
+Per-node outputs of pv_graph runs (PVCheckpoints table)
+
+After each node finishes its output is stored under (studentId, node). When
+the job queue retries a failed run, nodes that already succeeded return
+their stored output instead of calling Gemini/Groq again, so a failure in
+MasterAnalysis or HouseAnalysis no longer re-transcribes the audio.
+
+Checkpoints belong to the latest submission: /api/submit-pv clears them,
+and re-running a node (admin action) drops that node and everything
+downstream of it before the run starts.
+"""
+import json
+import threading
+
+from backend.models.database import get_db_connection
+
+_lock = threading.Lock()
+_active = {}  # run_id -> {node: output} that this run may resume from
+
+
+def _connect():
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("Database connection failed")
+    return conn
+
+
+def load(student_id):
+    """Stored node outputs for a student: {node: output}"""
+    conn = _connect()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT node, output FROM PVCheckpoints WHERE studentId = %s", (student_id,))
+        return {node: json.loads(output) for node, output in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def stored_nodes(student_id):
+    """Names of the nodes a student has checkpoints for"""
+    conn = _connect()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT node FROM PVCheckpoints WHERE studentId = %s", (student_id,))
+        return {node for (node,) in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def clear(student_id, nodes=None):
+    """Drop a student's checkpoints (all, or only `nodes`)"""
+    conn = _connect()
+    cursor = conn.cursor()
+    try:
+        if nodes is None:
+            cursor.execute("DELETE FROM PVCheckpoints WHERE studentId = %s", (student_id,))
+        elif nodes:
+            placeholders = ", ".join(["%s"] * len(nodes))
+            cursor.execute(
+                f"DELETE FROM PVCheckpoints WHERE studentId = %s AND node IN ({placeholders})",
+                (student_id, *nodes)
+            )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def save(student_id, run_id, node, output):
+    """Store a node's output (a failed write only costs the resume, never the run)"""
+    try:
+        payload = json.dumps(output or {}, default=str)
+        conn = _connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO PVCheckpoints (studentId, node, runId, output)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE runId = VALUES(runId), output = VALUES(output)
+            """, (student_id, node, run_id, payload))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Failed to checkpoint {node} for student {student_id}: {e}")
+
+
+# ==========================================
+# RUN SCOPE
+# ==========================================
+def begin(run_id, student_id, invalidate=()):
+    """
+    Make the student's checkpoints available to this run
+
+    Args:
+        invalidate: Nodes to re-run; their checkpoints are deleted first
+
+    Returns:
+        list: Nodes the run will resume instead of executing
+    """
+    try:
+        if invalidate:
+            clear(student_id, list(invalidate))
+        outputs = load(student_id)
+    except Exception as e:
+        print(f"⚠️ Could not load PV checkpoints for student {student_id}: {e}")
+        outputs = {}
+    with _lock:
+        _active[run_id] = outputs
+    return sorted(outputs)
+
+
+def resumed_output(run_id, node):
+    """The stored output for `node` in this run, or None"""
+    with _lock:
+        return (_active.get(run_id) or {}).get(node)
+
+
+def end(run_id):
+    with _lock:
+        _active.pop(run_id, None)
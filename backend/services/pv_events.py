@@ -0,0 +1,133 @@
+"""
+PV Events
+In-process pub/sub for PV pipeline progress, streamed as Server-Sent Events
+
+The queue workers (pv_jobs) run inside the serving process, so every event
+the pipeline publishes can be pushed straight to connected browsers instead
+of them polling MySQL. Each event is delivered to three topics:
+
+- "student:<id>"   progress of one student's PV
+- "volunteer:<id>" every PV submitted by that volunteer
+- "all"            everything (admin pages)
+
+Events: queued, started, node (one per finished pv_graph stage), completed,
+retrying, failed. The last few events per student are kept so a client that
+(re)connects mid-run can catch up; they are dropped REPLAY_TTL_SECONDS after
+the run completes or fails, and at most MAX_TRACKED_STUDENTS are kept.
+
+Limitation: the bus is per process. With several app processes (e.g.
+gunicorn workers), a browser only sees events for jobs run by the process
+serving its stream, so the pages keep a slow fallback poll
+(frontend/src/services/pvEvents.js).
+"""
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+KEEPALIVE_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+REPLAY_EVENTS = 20
+REPLAY_TTL_SECONDS = 300      # replay kept this long after completed/failed
+MAX_TRACKED_STUDENTS = 1000   # bound for runs that never finish (e.g. worker died)
+
+_lock = threading.Lock()
+_subscribers = {}   # topic -> set of Queue
+_recent = OrderedDict()  # student_id -> deque of recent events, least recently active first
+_finished = {}      # student_id -> time of its completed/failed event
+_owners = {}        # student_id -> volunteer_id of the running PV
+
+
+def _prune(now):
+    """Drop replay buffers of finished runs past the TTL, then the least active beyond the cap (holds _lock)"""
+    for student_id, finished_at in list(_finished.items()):
+        if now - finished_at >= REPLAY_TTL_SECONDS:
+            del _finished[student_id]
+            _recent.pop(student_id, None)
+    while len(_recent) > MAX_TRACKED_STUDENTS:
+        student_id, _ = _recent.popitem(last=False)
+        _finished.pop(student_id, None)
+        _owners.pop(student_id, None)
+
+
+def publish(student_id, event, data=None, volunteer_id=None):
+    """Deliver an event to everyone watching the student, its volunteer or all PVs"""
+    student_id = str(student_id)
+    message = {"event": event, "student_id": student_id, "ts": time.time(), **(data or {})}
+
+    with _lock:
+        if volunteer_id is not None:
+            _owners[student_id] = str(volunteer_id)
+        owner = _owners.get(student_id)
+        message["volunteer_id"] = owner
+        _recent.setdefault(student_id, deque(maxlen=REPLAY_EVENTS)).append(message)
+        _recent.move_to_end(student_id)
+        if event in ("completed", "failed"):
+            _owners.pop(student_id, None)
+            _finished[student_id] = message["ts"]
+        else:
+            _finished.pop(student_id, None)
+        _prune(message["ts"])
+
+        topics = [f"student:{student_id}", "all"]
+        if owner:
+            topics.append(f"volunteer:{owner}")
+        targets = set()
+        for topic in topics:
+            targets.update(_subscribers.get(topic, ()))
+
+    for q in targets:
+        try:
+            q.put_nowait(message)
+        except queue.Full:
+            pass  # slow client; it resyncs from the API on reconnect
+
+
+def subscribe(topic):
+    q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _lock:
+        _subscribers.setdefault(topic, set()).add(q)
+    return q
+
+
+def unsubscribe(topic, q):
+    with _lock:
+        subscribers = _subscribers.get(topic)
+        if subscribers:
+            subscribers.discard(q)
+            if not subscribers:
+                del _subscribers[topic]
+
+
+def recent_events(student_id):
+    with _lock:
+        return list(_recent.get(str(student_id), ()))
+
+
+def _format(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message, default=str)}\n\n"
+
+
+def stream(topic, replay=()):
+    """
+    SSE generator for a topic (wrap in a streaming Response)
+
+    Sends `replay` first, then live events, with a comment line every
+    KEEPALIVE_SECONDS so proxies keep the connection open.
+    """
+    q = subscribe(topic)
+    try:
+        yield "retry: 3000\n\n"
+        for message in replay:
+            yield _format(message)
+        while True:
+            try:
+                message = q.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield _format(message)
+    finally:
+        unsubscribe(topic, q)
+
@@ -2,11 +2,15 @@
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Optional
 
+from backend.services import pv_checkpoints, pv_events, pv_tracing
+
 class PVState(TypedDict, total=False):
     text_comment: str
     audio_path: Optional[str]
     is_tanglish: bool
     image_paths: list  # New field for images
+    student_id: str  # Progress events are published for this student (optional)
+    run_id: str  # Groups this run's node traces (pv_tracing)
 
     english_from_tanglish: str
     english_from_audio: str
@@ -16,6 +20,7 @@ class PVState(TypedDict, total=False):
     rag_context: str  # Formatted context from similar cases
     similar_cases: list  # Raw similar cases data
     query_embedding: list  # Reusable embedding for search and storage
+    rag_context_stats: dict  # Token usage of the packed context
 
     summary: list
     decision: str
@@ -26,6 +31,14 @@ class PVState(TypedDict, total=False):
 
 
 # --------------------- NODES ----------------------
+def node_prepare_inputs(state: PVState):
+    """Fan-out point: normalise raw inputs before the parallel branches start."""
+    return {
+        "text_comment": state.get("text_comment") or "",
+        "audio_path": state.get("audio_path") or "",
+        "image_paths": state.get("image_paths") or [],
+    }
+
 def node_house_analysis(state: PVState):
     from backend.services.ai_service import ai_house_analysis
     
@@ -76,7 +89,9 @@ def node_merge(state: PVState):
 def node_rag_retrieval(state: PVState):
     """Retrieve similar cases from RAG knowledge base."""
     try:
-        from backend.services.rag_service import search_similar_cases_with_embedding, format_rag_context, RAG_ENABLED
+        from backend.services.rag_service import (
+            search_similar_cases_with_embedding, build_rag_context, RAG_ENABLED, RAG_FETCH_K
+        )
         
         if not RAG_ENABLED:
             print("⚠️ RAG is disabled")
@@ -84,16 +99,22 @@ def node_rag_retrieval(state: PVState):
         
         merged_text = state.get("merged_text", "")
         
-        # Search for similar cases (generates embedding internally and returns it)
-        similar_cases, query_embedding = search_similar_cases_with_embedding(merged_text, top_k=5)
+        # Search for similar cases (generates embedding internally and returns it);
+        # fetch extra candidates with their vectors for MMR re-ranking
+        candidates, query_embedding = search_similar_cases_with_embedding(
+            merged_text, top_k=max(RAG_FETCH_K, 5), include_embeddings=True
+        )
         
-        # Format context for LLM
-        rag_context = format_rag_context(similar_cases)
+        # Diverse, token-budgeted context for LLM
+        rag_context, similar_cases, stats = build_rag_context(candidates, query_embedding, top_k=5)
+        print(f"🧩 RAG context: {stats['selected']} cases, {stats['tokens']} tokens "
+              f"({stats['tokens_saved']} saved, {stats['duplicates_removed']} duplicates dropped)")
         
         return {
             "rag_context": rag_context,
             "similar_cases": similar_cases,
-            "query_embedding": query_embedding  # Pass embedding for reuse in storage
+            "query_embedding": query_embedding,  # Pass embedding for reuse in storage
+            "rag_context_stats": stats
         }
         
     except Exception as e:
@@ -119,23 +140,84 @@ def node_master_analysis(state: PVState):
 
 # --------------------- BUILD GRAPH ----------------------
 
-builder = StateGraph(PVState)
+# Result fields small enough to include in the progress event
+_EVENT_FIELDS = ("decision", "score")
+
+# Nodes whose output depends on each node; re-running a node also re-runs
+# these (keep in sync with the edges below)
+DOWNSTREAM = {
+    "Tanglish": ["Merge", "RAGRetrieval", "MasterAnalysis"],
+    "Audio": ["Merge", "RAGRetrieval", "MasterAnalysis"],
+    "Merge": ["RAGRetrieval", "MasterAnalysis"],
+    "RAGRetrieval": ["MasterAnalysis"],
+    "MasterAnalysis": [],
+    "HouseAnalysis": [],
+}
+
+# Prepare only normalises inputs, so it is never checkpointed
+CHECKPOINTED_NODES = tuple(DOWNSTREAM)
+
+
+def _tracked(name, node):
+    """
+    Trace the node (pv_tracing), checkpoint its output (pv_checkpoints) and
+    publish a progress event; a checkpointed output is returned as-is.
+    """
+    def run(state: PVState):
+        student_id = state.get("student_id")
+        checkpointed = name in CHECKPOINTED_NODES
+
+        saved = pv_checkpoints.resumed_output(state.get("run_id"), name) if checkpointed else None
+        if saved is not None:
+            print(f"↩️ {name} resumed from checkpoint")
+            if student_id:
+                pv_events.publish(student_id, "node", {"node": name, "elapsed_ms": 0, "resumed": True})
+            return saved
+
+        update, span = pv_tracing.trace_node(name, node, state)
+        if student_id:
+            if checkpointed:
+                pv_checkpoints.save(student_id, state.get("run_id"), name, update)
+            data = {"node": name, "elapsed_ms": span["duration_ms"]}
+            data.update({k: update[k] for k in _EVENT_FIELDS if k in (update or {})})
+            pv_events.publish(student_id, "node", data)
+        return update
+    return run
+
+
+def nodes_to_rerun(node):
+    """The node plus everything downstream of it"""
+    return [node] + DOWNSTREAM[node]
 
-builder.add_node("Tanglish", node_tanglish_to_english)
-builder.add_node("Audio", node_audio_to_english)
-builder.add_node("Merge", node_merge)
-builder.add_node("RAGRetrieval", node_rag_retrieval)  # RAG node
-builder.add_node("MasterAnalysis", node_master_analysis)
-builder.add_node("HouseAnalysis", node_house_analysis)
 
-builder.set_entry_point("Tanglish")
+builder = StateGraph(PVState)
 
-# Sequential flow: Tanglish → Audio → Merge → RAG → MasterAnalysis → HouseAnalysis → END
-builder.add_edge("Tanglish", "Audio")
-builder.add_edge("Audio", "Merge")
+builder.add_node("Prepare", _tracked("Prepare", node_prepare_inputs))
+builder.add_node("Tanglish", _tracked("Tanglish", node_tanglish_to_english))
+builder.add_node("Audio", _tracked("Audio", node_audio_to_english))
+builder.add_node("Merge", _tracked("Merge", node_merge))
+builder.add_node("RAGRetrieval", _tracked("RAGRetrieval", node_rag_retrieval))  # RAG node
+builder.add_node("MasterAnalysis", _tracked("MasterAnalysis", node_master_analysis))
+builder.add_node("HouseAnalysis", _tracked("HouseAnalysis", node_house_analysis))
+
+builder.set_entry_point("Prepare")
+
+# Fan-out: Tanglish (Groq), Audio (Gemini) and HouseAnalysis (Gemini) are
+# independent and run concurrently in the same superstep. LangGraph finishes a
+# superstep before starting the next, so Merge also waits for HouseAnalysis:
+# latency is max(Tanglish, Audio, HouseAnalysis) + Merge + RAG + MasterAnalysis,
+# not HouseAnalysis overlapping the text chain.
+builder.add_edge("Prepare", "Tanglish")
+builder.add_edge("Prepare", "Audio")
+builder.add_edge("Prepare", "HouseAnalysis")
+
+# Fan-in: Merge needs both text branches (and starts after the whole
+# fan-out superstep, see above), then RAG → MasterAnalysis
+builder.add_edge(["Tanglish", "Audio"], "Merge")
 builder.add_edge("Merge", "RAGRetrieval")
 builder.add_edge("RAGRetrieval", "MasterAnalysis")
-builder.add_edge("MasterAnalysis", "HouseAnalysis")
+
+builder.add_edge("MasterAnalysis", END)
 builder.add_edge("HouseAnalysis", END)
 
-pv_graph = builder.compile()
\ No newline at end of file
+pv_graph = builder.compile()
@@ -0,0 +1,354 @@
+"""
+PV Job Queue
+Durable MySQL-backed queue (PVJobs table) for the PV AI pipeline
+
+Jobs survive process restarts: a bounded pool of worker threads claims
+jobs with a lease (visibility timeout), retries failures with jittered
+exponential backoff, and any job whose worker died is picked up again
+once its lease expires. A running job's lease is extended by a heartbeat,
+so long pipelines are not claimed twice. When a job fails for good, its
+PhysicalVerification goes back to ASSIGNED so the volunteer can resubmit.
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+
+from backend.config import Config
+from backend.models.database import get_db_connection
+from backend.services import pv_events
+
+_handler = None
+_workers = []
+_workers_lock = threading.Lock()
+_stop_event = threading.Event()
+_wakeup = threading.Event()
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+# =====================================================
+# PRODUCER
+# =====================================================
+
+def enqueue_pv_job(data, student_id, volunteer_id, recommendation):
+    """
+    Persist a PV pipeline job
+
+    Any older job for the same student that has not started yet is cancelled,
+    so a re-submission only runs once.
+
+    Returns:
+        int or None: jobId of the new job
+    """
+    payload = json.dumps({"data": data, "recommendation": recommendation})
+
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE PVJobs
+            SET status = 'CANCELLED', payload = ''
+            WHERE studentId = %s AND status = 'QUEUED'
+        """, (student_id,))
+        cursor.execute("""
+            INSERT INTO PVJobs (studentId, volunteerId, payload, status, maxAttempts, runAfter)
+            VALUES (%s, %s, %s, 'QUEUED', %s, NOW())
+        """, (student_id, volunteer_id, payload, Config.PV_JOB_MAX_ATTEMPTS))
+        job_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    _wakeup.set()
+    pv_events.publish(student_id, "queued", {"job_id": job_id}, volunteer_id=volunteer_id)
+    print(f"📥 Queued PV job {job_id} for student {student_id}")
+    return job_id
+
+
+# =====================================================
+# CONSUMER
+# =====================================================
+
+def _claim_job():
+    """Atomically lease the next runnable job, or return None"""
+    token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            UPDATE PVJobs
+            SET status = 'RUNNING',
+                lockedBy = %s,
+                lockedUntil = NOW() + INTERVAL %s SECOND,
+                attempts = attempts + 1
+            WHERE (status = 'QUEUED' AND runAfter <= NOW())
+               OR (status = 'RUNNING' AND lockedUntil < NOW() AND attempts < maxAttempts)
+            ORDER BY jobId
+            LIMIT 1
+        """, (token, Config.PV_JOB_VISIBILITY_TIMEOUT))
+        conn.commit()
+        if cursor.rowcount == 0:
+            return None
+
+        cursor.execute("SELECT * FROM PVJobs WHERE lockedBy = %s", (token,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _release_pv(cursor, job):
+    """Return a PV stuck in PROCESSING to ASSIGNED (unless a newer job will still process it)"""
+    cursor.execute("""
+        UPDATE PhysicalVerification
+        SET status = 'ASSIGNED'
+        WHERE studentId = %s AND volunteerId = %s AND status = 'PROCESSING'
+        AND NOT EXISTS (
+            SELECT 1 FROM PVJobs
+            WHERE studentId = %s AND jobId > %s AND status IN ('QUEUED', 'RUNNING')
+        )
+    """, (job['studentId'], job['volunteerId'], job['studentId'], job['jobId']))
+    return cursor.rowcount
+
+
+def _heartbeat(job, stop):
+    """Keep extending the job's lease while its handler runs"""
+    interval = max(1, Config.PV_JOB_VISIBILITY_TIMEOUT // 3)
+    while not stop.wait(interval):
+        try:
+            conn = get_db_connection()
+            if not conn:
+                continue
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    UPDATE PVJobs
+                    SET lockedUntil = NOW() + INTERVAL %s SECOND
+                    WHERE jobId = %s AND lockedBy = %s AND status = 'RUNNING'
+                """, (Config.PV_JOB_VISIBILITY_TIMEOUT, job['jobId'], job['lockedBy']))
+                conn.commit()
+                if cursor.rowcount == 0 and not stop.is_set():
+                    print(f"⚠️ PV job {job['jobId']} lost its lease")
+                    return
+            finally:
+                cursor.close()
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ PV job {job['jobId']} heartbeat failed: {e}")
+
+
+def _finish_job(job, error=None):
+    """Mark a leased job DONE, or schedule a retry / mark FAILED"""
+    conn = get_db_connection()
+    if not conn:
+        print(f"❌ Could not record result of PV job {job['jobId']} (DB unavailable)")
+        return
+    cursor = conn.cursor()
+    try:
+        if error is None:
+            cursor.execute("""
+                UPDATE PVJobs
+                SET status = 'DONE', payload = '', lockedBy = NULL, lockedUntil = NULL, lastError = NULL
+                WHERE jobId = %s AND lockedBy = %s
+            """, (job['jobId'], job['lockedBy']))
+        elif job['attempts'] >= job['maxAttempts']:
+            cursor.execute("""
+                UPDATE PVJobs
+                SET status = 'FAILED', lockedBy = NULL, lockedUntil = NULL, lastError = %s
+                WHERE jobId = %s AND lockedBy = %s
+            """, (str(error)[:2000], job['jobId'], job['lockedBy']))
+            if cursor.rowcount:
+                _release_pv(cursor, job)
+            print(f"❌ PV job {job['jobId']} failed permanently after {job['attempts']} attempts")
+            pv_events.publish(job['studentId'], "failed", {"job_id": job['jobId'], "error": str(error)[:200]})
+        else:
+            delay = Config.PV_JOB_RETRY_BASE_DELAY * (2 ** (job['attempts'] - 1))
+            delay = int(delay * random.uniform(0.8, 1.2))
+            cursor.execute("""
+                UPDATE PVJobs
+                SET status = 'QUEUED', lockedBy = NULL, lockedUntil = NULL, lastError = %s,
+                    runAfter = NOW() + INTERVAL %s SECOND
+                WHERE jobId = %s AND lockedBy = %s
+            """, (str(error)[:2000], delay, job['jobId'], job['lockedBy']))
+            print(f"🔁 PV job {job['jobId']} will retry in {delay}s (attempt {job['attempts']}/{job['maxAttempts']})")
+            pv_events.publish(job['studentId'], "retrying", {"job_id": job['jobId'], "attempt": job['attempts'],
+                                                             "retry_in": delay})
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _run_job(job):
+    payload = json.loads(job['payload'] or '{}')
+    print(f"⚙️ Running PV job {job['jobId']} for student {job['studentId']} (attempt {job['attempts']})")
+    pv_events.publish(job['studentId'], "started", {"job_id": job['jobId'], "attempt": job['attempts']},
+                      volunteer_id=job['volunteerId'])
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job, stop), name=f"pv-job-heartbeat-{job['jobId']}",
+                     daemon=True).start()
+    error = None
+    try:
+        _handler(payload.get("data") or {}, job['studentId'], job['volunteerId'], payload.get("recommendation"))
+    except Exception as e:
+        traceback.print_exc()
+        error = e
+    finally:
+        stop.set()
+    _finish_job(job, error=error)
+
+
+def _worker_loop():
+    while not _stop_event.is_set():
+        try:
+            job = _claim_job()
+        except Exception as e:
+            print(f"⚠️ PV job claim failed: {e}")
+            job = None
+
+        if job is None:
+            _maybe_sweep()
+            _wakeup.wait(Config.PV_JOB_POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+
+        _run_job(job)
+
+
+# =====================================================
+# LIFECYCLE
+# =====================================================
+
+def _fail_exhausted_jobs(cursor):
+    """FAIL expired leases that have no attempts left and release their PVs"""
+    cursor.execute("""
+        SELECT jobId, studentId, volunteerId FROM PVJobs
+        WHERE status = 'RUNNING' AND lockedUntil < NOW() AND attempts >= maxAttempts
+    """)
+    failed = 0
+    for job_id, student_id, volunteer_id in cursor.fetchall():
+        cursor.execute("""
+            UPDATE PVJobs
+            SET status = 'FAILED', lockedBy = NULL, lockedUntil = NULL,
+                lastError = COALESCE(lastError, 'Worker lost during final attempt')
+            WHERE jobId = %s AND status = 'RUNNING' AND lockedUntil < NOW()
+        """, (job_id,))
+        if cursor.rowcount:
+            failed += 1
+            _release_pv(cursor, {"jobId": job_id, "studentId": student_id, "volunteerId": volunteer_id})
+            pv_events.publish(student_id, "failed", {"job_id": job_id, "error": "Worker lost during final attempt"})
+    return failed
+
+
+def _maybe_sweep():
+    """Periodic (PV_JOB_SWEEP_INTERVAL) fail of exhausted expired leases; claims never pick those up"""
+    global _last_sweep
+    with _sweep_lock:
+        if time.time() - _last_sweep < Config.PV_JOB_SWEEP_INTERVAL:
+            return
+        _last_sweep = time.time()
+
+    conn = get_db_connection()
+    if not conn:
+        return
+    cursor = conn.cursor()
+    try:
+        failed = _fail_exhausted_jobs(cursor)
+        conn.commit()
+        if failed:
+            print(f"🧹 PV job sweep: {failed} jobs failed after losing their worker on the final attempt")
+    except Exception as e:
+        print(f"⚠️ PV job sweep failed: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def recover_orphaned_jobs():
+    """
+    Startup sweep: requeue jobs whose worker died mid-run (lease expired)
+    and fail those that already used all their attempts.
+    """
+    conn = get_db_connection()
+    if not conn:
+        print("⚠️ PV job recovery skipped (DB unavailable)")
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE PVJobs
+            SET status = 'QUEUED', lockedBy = NULL, lockedUntil = NULL, runAfter = NOW()
+            WHERE status = 'RUNNING' AND lockedUntil < NOW() AND attempts < maxAttempts
+        """)
+        requeued = cursor.rowcount
+
+        failed = _fail_exhausted_jobs(cursor)
+        conn.commit()
+
+        # PV rows left in PROCESSING by the old thread-based runner have no job to resume
+        cursor.execute("""
+            SELECT COUNT(*) FROM PhysicalVerification pv
+            WHERE pv.status = 'PROCESSING'
+            AND NOT EXISTS (
+                SELECT 1 FROM PVJobs j
+                WHERE j.studentId = pv.studentId AND j.status IN ('QUEUED', 'RUNNING')
+            )
+        """)
+        stranded = cursor.fetchone()[0]
+
+        print(f"🧹 PV job recovery: {requeued} requeued, {failed} failed")
+        if stranded:
+            print(f"⚠️ {stranded} PV rows are PROCESSING without a job - volunteer must resubmit")
+    except Exception as e:
+        print(f"⚠️ PV job recovery failed: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def start_workers(handler, num_workers=None):
+    """
+    Start the bounded PV worker pool (idempotent per process)
+
+    Args:
+        handler (callable): handler(data, student_id, volunteer_id, recommendation);
+            must raise on failure so the job is retried
+        num_workers (int): Worker threads (default: Config.PV_JOB_WORKERS)
+    """
+    global _handler
+    num_workers = Config.PV_JOB_WORKERS if num_workers is None else num_workers
+
+    with _workers_lock:
+        if _workers or num_workers <= 0:
+            return
+        _handler = handler
+        _stop_event.clear()
+        recover_orphaned_jobs()
+
+        for i in range(num_workers):
+            t = threading.Thread(target=_worker_loop, name=f"pv-job-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+
+    print(f"🚀 Started {num_workers} PV job workers")
+
+
+def stop_workers(timeout=5):
+    """Signal workers to stop after their current job"""
+    _stop_event.set()
+    _wakeup.set()
+    with _workers_lock:
+        for t in _workers:
+            t.join(timeout)
+        _workers.clear()
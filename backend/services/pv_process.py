@@ -1,14 +1,37 @@
-from backend.services.pv_graph import pv_graph
+from backend.services.pv_graph import pv_graph, nodes_to_rerun
+from backend.services import pv_checkpoints, pv_tracing
 
-def pv_process(text_comment, audio_path, image_paths=None, is_tanglish=False):
+def pv_process(text_comment, audio_path, image_paths=None, is_tanglish=False, student_id=None,
+               rerun_node=None):
+    """
+    Run the PV graph
+
+    With a student_id the run resumes from that student's checkpoints (nodes
+    that already succeeded are not re-run); rerun_node forces that node and
+    everything downstream of it to run again.
+    """
     state = {
         "text_comment": text_comment or "",
         "audio_path": audio_path or "",
         "image_paths": image_paths or [],
         "is_tanglish": is_tanglish,
+        "run_id": pv_tracing.new_run_id(),
     }
+    resumed = []
+    if student_id:
+        state["student_id"] = str(student_id)  # enables progress events and checkpoints
+        resumed = pv_checkpoints.begin(
+            state["run_id"], state["student_id"],
+            invalidate=nodes_to_rerun(rerun_node) if rerun_node else ()
+        )
+        if resumed:
+            print(f"↩️ Resuming PV run for student {student_id}; checkpointed: {', '.join(resumed)}")
 
-    result = pv_graph.invoke(state)
+    try:
+        result = pv_graph.invoke(state)
+    finally:
+        usage = pv_tracing.flush_run(state["run_id"])
+        pv_checkpoints.end(state["run_id"])
 
     # Map graph output → what app.py expect
     return {
@@ -19,5 +42,8 @@ def pv_process(text_comment, audio_path, image_paths=None, is_tanglish=False):
         "summary": result.get("summary", []),
         "decision": result.get("decision", ""),
         "score": result.get("score", 0.0),
-        "house_analysis": result.get("house_analysis_points", [])
+        "house_analysis": result.get("house_analysis_points", []),
+        "run_id": state["run_id"],
+        "resumed_nodes": resumed,  # returned from checkpoints, not executed in this run
+        "usage": usage,  # tokens and AI cache hits/misses of this run
     }
\ No newline at end of file
@@ -0,0 +1,308 @@
+"""
+PV Bulk Re-analysis
+Replays historical PhysicalVerification records through pv_process into a
+shadow table (PVReanalysis), e.g. after a prompt or model change
+
+For each selected PV (latest completed PV per student) the stored
+original_comment, the audio at audio_s3_key and the student's FinalImages
+run through the same graph as a live submission. Live data is never
+touched: no checkpoints, progress events, status or RAG updates. Results
+are written per student under a batch id together with the decision and
+score the PV currently holds, so the batch can be diffed afterwards.
+
+Runs use a thread pool (--concurrency) and start at most --per-minute PVs a
+minute; Gemini/Groq calls additionally go through the shared rate limiter
+(set RATE_LIMIT_BACKEND=sqlite to share its budget with a running server).
+Re-running with the same --batch-id skips students that already succeeded.
+Unchanged inputs are answered by the AI response cache, so bump
+PROMPT_VERSIONS (or change the model) to actually re-score.
+
+Usage:
+    python -m backend.services.pv_reanalysis [--batch-id ID] [--district D] [--since YYYY-MM-DD]
+                                             [--until YYYY-MM-DD] [--decision SELECT ...]
+                                             [--student-ids S1 S2 ...] [--limit N]
+                                             [--concurrency 4] [--per-minute 20] [--no-audio]
+                                             [--no-images] [--usd-per-1k 0.0]
+    python -m backend.services.pv_reanalysis --report BATCH_ID
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from backend.config import Config
+from backend.models.database import fetchall_dict, get_db_connection
+from backend.services import image_store, rag_service
+from backend.services.pv_process import pv_process
+from backend.services.rate_limiter import TokenBucket
+from backend.services.s3_service import get_s3_client
+
+SELECT_QUERY = """
+    SELECT
+        pv.verificationId,
+        pv.studentId,
+        COALESCE(pv.original_comment, pv.comment) AS original_comment,
+        pv.audio_s3_key,
+        pv.sentiment AS current_decision,
+        pv.sentiment_text AS current_score,
+        s.district
+    FROM PhysicalVerification pv
+    JOIN Student s ON s.studentId = pv.studentId
+    WHERE pv.status IS NOT NULL
+      AND pv.status NOT IN ('ASSIGNED', 'PROCESSING', 'DRAFT')
+      AND pv.verificationId = (
+          SELECT MAX(p2.verificationId) FROM PhysicalVerification p2
+          WHERE p2.studentId = pv.studentId
+      )
+"""
+
+
+# ==========================================
+# SELECTION
+# ==========================================
+def select_pvs(district=None, since=None, until=None, decisions=None, student_ids=None, limit=None):
+    """Latest completed PV per student matching the filters, oldest first"""
+    query = SELECT_QUERY
+    params = []
+    if district:
+        query += " AND s.district = %s"
+        params.append(district)
+    if since:
+        query += " AND pv.verificationDate >= %s"
+        params.append(since)
+    if until:
+        query += " AND pv.verificationDate < %s"
+        params.append(until)
+    if decisions:
+        query += f" AND pv.sentiment IN ({', '.join(['%s'] * len(decisions))})"
+        params.extend(decisions)
+    if student_ids:
+        query += f" AND pv.studentId IN ({', '.join(['%s'] * len(student_ids))})"
+        params.extend(student_ids)
+    query += " ORDER BY pv.verificationId"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    return fetchall_dict(query, tuple(params))
+
+
+def _completed_students(batch_id):
+    rows = fetchall_dict(
+        "SELECT studentId FROM PVReanalysis WHERE batchId = %s AND error IS NULL", (batch_id,)
+    )
+    return {r["studentId"] for r in rows}
+
+
+# ==========================================
+# REPLAY
+# ==========================================
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _save(batch_id, row, result, error, duration_ms):
+    result = result or {}
+    usage = result.get("usage") or {}
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO PVReanalysis
+                (batchId, studentId, verificationId, runId, currentDecision, currentScore,
+                 newDecision, newScore, newSummary, textTranslation, audioTranslation, houseAnalysis,
+                 tokens, cacheHits, durationMs, error)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                verificationId = VALUES(verificationId), runId = VALUES(runId),
+                currentDecision = VALUES(currentDecision), currentScore = VALUES(currentScore),
+                newDecision = VALUES(newDecision), newScore = VALUES(newScore),
+                newSummary = VALUES(newSummary), textTranslation = VALUES(textTranslation),
+                audioTranslation = VALUES(audioTranslation), houseAnalysis = VALUES(houseAnalysis),
+                tokens = VALUES(tokens), cacheHits = VALUES(cacheHits),
+                durationMs = VALUES(durationMs), error = VALUES(error), createdAt = CURRENT_TIMESTAMP
+        """, (
+            batch_id, row["studentId"], row["verificationId"], result.get("run_id"),
+            row["current_decision"], _to_float(row["current_score"]),
+            result.get("decision"), _to_float(result.get("score")),
+            "; ".join(result.get("summary") or []) if result else None,
+            result.get("text_translation"), result.get("audio_translation"),
+            json.dumps(result["house_analysis"]) if result.get("house_analysis") else None,
+            usage.get("tokens", 0), usage.get("cache_hits", 0), duration_ms,
+            str(error)[:2000] if error else None,
+        ))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _replay(row, batch_id, bucket, s3, with_audio, with_images):
+    """Run one PV through pv_process and store the outcome"""
+    bucket.acquire(float("inf"))
+    started = time.perf_counter()
+    result, error, audio_path = None, None, None
+    try:
+        if with_audio and row["audio_s3_key"]:
+            suffix = os.path.splitext(row["audio_s3_key"])[1] or ".wav"
+            fd, audio_path = tempfile.mkstemp(prefix=f"reanalysis_{row['studentId']}_", suffix=suffix)
+            os.close(fd)
+            s3.download_file(Config.AWS_BUCKET, row["audio_s3_key"], audio_path)
+
+        image_paths = []
+        if with_images:
+            keys = fetchall_dict(
+                "SELECT COALESCE(imageKey, imageUrl) AS s3_key FROM FinalImages WHERE studentId = %s",
+                (row["studentId"],)
+            )
+            image_paths = image_store.fetch_many([k["s3_key"] for k in keys if k["s3_key"]])
+
+        result = pv_process(row["original_comment"] or "", audio_path, image_paths)
+    except Exception as e:
+        error = e
+        print(f"❌ Re-analysis failed for student {row['studentId']}: {e}")
+    finally:
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+
+    duration_ms = round((time.perf_counter() - started) * 1000)
+    try:
+        _save(batch_id, row, result, error, duration_ms)
+    except Exception as e:
+        print(f"❌ Could not store re-analysis of student {row['studentId']}: {e}")
+        error = error or e
+    return {"ok": error is None, "usage": (result or {}).get("usage") or {}}
+
+
+def reanalyze(batch_id=None, concurrency=None, per_minute=None, with_audio=True, with_images=True,
+              usd_per_1k=None, **filters):
+    """
+    Re-analyze the selected PVs into PVReanalysis
+
+    Args:
+        batch_id: Shadow-table batch; re-using one resumes it
+        concurrency: Parallel pv_process runs (default REANALYSIS_CONCURRENCY)
+        per_minute: Max PV runs started per minute (default REANALYSIS_PV_PER_MIN)
+        usd_per_1k: Blended LLM price for the cost estimate (default LLM_USD_PER_1K_TOKENS)
+        **filters: select_pvs() filters
+
+    Returns:
+        dict: Throughput/cost figures plus the decision diff (see diff_report)
+    """
+    batch_id = batch_id or time.strftime("%Y%m%d-%H%M%S")
+    concurrency = concurrency or Config.REANALYSIS_CONCURRENCY
+    per_minute = per_minute or Config.REANALYSIS_PV_PER_MIN
+    usd_per_1k = Config.LLM_USD_PER_1K_TOKENS if usd_per_1k is None else usd_per_1k
+
+    # RAGRetrieval reads the collection the app opens at startup; without it
+    # every replay would run with an empty context and the diff would be meaningless
+    if rag_service.RAG_ENABLED and (rag_service.get_collection() or rag_service.initialize_rag()) is None:
+        raise RuntimeError("RAG collection unavailable; re-analysis would run without historical cases")
+
+    rows = select_pvs(**filters)
+    done_before = _completed_students(batch_id)
+    todo = [r for r in rows if r["studentId"] not in done_before]
+    print(f"🔁 Re-analysis batch {batch_id}: {len(todo)} PVs to run "
+          f"({len(rows) - len(todo)} already done), {concurrency} workers, ≤{per_minute:g}/min")
+
+    bucket = TokenBucket(f"reanalysis:{batch_id}", per_minute, burst=concurrency)
+    s3 = get_s3_client() if with_audio else None
+    totals = Counter()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(_replay, row, batch_id, bucket, s3, with_audio, with_images) for row in todo]
+        for i, future in enumerate(as_completed(futures), 1):
+            outcome = future.result()
+            totals["ok" if outcome["ok"] else "failed"] += 1
+            totals.update({k: v for k, v in outcome["usage"].items() if k != "node_ms"})
+            elapsed = time.perf_counter() - started
+            rate = i / elapsed * 60 if elapsed else 0.0
+            print(f"   ↳ {i}/{len(todo)} PVs | {rate:,.1f} PV/min | {totals['tokens']:,} tokens")
+
+    elapsed = time.perf_counter() - started
+    lookups = totals["cache_hits"] + totals["cache_misses"]
+    result = {
+        "batch_id": batch_id,
+        "processed": totals["ok"],
+        "failed": totals["failed"],
+        "elapsed_s": round(elapsed, 2),
+        "pv_per_min": round((totals["ok"] + totals["failed"]) / elapsed * 60, 2) if elapsed else 0.0,
+        "tokens": totals["tokens"],
+        "tokens_per_pv": round(totals["tokens"] / totals["ok"]) if totals["ok"] else 0,
+        "ai_cache_hit_rate": round(totals["cache_hits"] / lookups, 3) if lookups else None,
+        "est_cost_usd": round(totals["tokens"] / 1000 * usd_per_1k, 4),
+        "diff": diff_report(batch_id),
+    }
+    print(f"✅ Re-analysis finished: {json.dumps(result)}")
+    return result
+
+
+# ==========================================
+# DIFF
+# ==========================================
+def diff_report(batch_id):
+    """Compare a batch's new decisions/scores with the ones stored at run time"""
+    rows = fetchall_dict("""
+        SELECT currentDecision, currentScore, newDecision, newScore
+        FROM PVReanalysis
+        WHERE batchId = %s AND error IS NULL
+    """, (batch_id,))
+    transitions = Counter()
+    deltas = []
+    for r in rows:
+        if r["currentDecision"] != r["newDecision"]:
+            transitions[f"{r['currentDecision'] or '-'} -> {r['newDecision'] or '-'}"] += 1
+        if r["currentScore"] is not None and r["newScore"] is not None:
+            deltas.append(r["newScore"] - r["currentScore"])
+    changed = sum(transitions.values())
+    return {
+        "compared": len(rows),
+        "decision_changed": changed,
+        "decision_agreement": round(1 - changed / len(rows), 3) if rows else None,
+        "transitions": dict(transitions.most_common()),
+        "mean_score_delta": round(sum(deltas) / len(deltas), 2) if deltas else None,
+        "mean_abs_score_delta": round(sum(abs(d) for d in deltas) / len(deltas), 2) if deltas else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historical PVs through the AI pipeline into PVReanalysis")
+    parser.add_argument("--batch-id", help="shadow-table batch (re-use to resume)")
+    parser.add_argument("--report", metavar="BATCH_ID", help="only print the decision diff of a batch")
+    parser.add_argument("--district")
+    parser.add_argument("--since", help="verificationDate >= (YYYY-MM-DD)")
+    parser.add_argument("--until", help="verificationDate < (YYYY-MM-DD)")
+    parser.add_argument("--decision", nargs="+", help="current AI decision(s), e.g. SELECT 'ON HOLD'")
+    parser.add_argument("--student-ids", nargs="+")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--per-minute", type=float)
+    parser.add_argument("--no-audio", action="store_true", help="skip re-transcribing audio")
+    parser.add_argument("--no-images", action="store_true", help="skip house image analysis")
+    parser.add_argument("--usd-per-1k", type=float, help="blended LLM price per 1K tokens")
+    args = parser.parse_args()
+
+    if args.report:
+        print(json.dumps(diff_report(args.report), indent=2))
+    else:
+        reanalyze(
+            batch_id=args.batch_id,
+            concurrency=args.concurrency,
+            per_minute=args.per_minute,
+            with_audio=not args.no_audio,
+            with_images=not args.no_images,
+            usd_per_1k=args.usd_per_1k,
+            district=args.district,
+            since=args.since,
+            until=args.until,
+            decisions=args.decision,
+            student_ids=args.student_ids,
+            limit=args.limit,
+        )
@@ -0,0 +1,202 @@
+"""
+PV Tracing
+Per-node timing for pv_graph runs (PVNodeTraces table)
+
+Every node execution becomes a span: run id, student id, node, start,
+duration, input/output size, LLM tokens, AI/embedding cache hits and the
+error if the node raised. Tokens and cache lookups are attributed to the
+node through a context variable, so ai_service / ai_cache only call
+record_tokens() / record_cache() and need no knowledge of the graph.
+
+Spans are buffered per run and written in one batch when the run ends
+(flush_run), keeping MySQL off the pipeline's critical path.
+"""
+import contextvars
+import datetime
+import json
+import threading
+import time
+import uuid
+
+from backend.models.database import get_db_connection
+
+_current_span = contextvars.ContextVar("pv_trace_span", default=None)
+_runs_lock = threading.Lock()
+_runs = {}  # run_id -> list of finished spans
+
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+
+def _size(value):
+    """Approximate payload size in bytes (JSON encoding)"""
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, default=str))
+    except Exception:
+        return 0
+
+
+# ==========================================
+# RECORDING (called from inside a node)
+# ==========================================
+def record_tokens(count):
+    span = _current_span.get()
+    if span is not None and count:
+        span["tokens"] += int(count)
+
+
+def record_cache(hit):
+    span = _current_span.get()
+    if span is not None:
+        span["cache_hits" if hit else "cache_misses"] += 1
+
+
+def trace_node(name, node, state):
+    """
+    Run node(state) as a span of the state's run
+
+    Returns:
+        tuple: (node update, span dict)
+    """
+    span = {
+        "run_id": state.get("run_id"),
+        "student_id": state.get("student_id"),
+        "node": name,
+        "started_at": time.time(),
+        "duration_ms": 0,
+        "input_bytes": _size(state),
+        "output_bytes": None,
+        "tokens": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "error": None,
+    }
+    token = _current_span.set(span)
+    started = time.perf_counter()
+    try:
+        update = node(state)
+        span["output_bytes"] = _size(update)
+        return update, span
+    except Exception as e:
+        span["error"] = f"{type(e).__name__}: {e}"[:2000]
+        raise
+    finally:
+        span["duration_ms"] = round((time.perf_counter() - started) * 1000)
+        _current_span.reset(token)
+        if span["run_id"]:
+            with _runs_lock:
+                _runs.setdefault(span["run_id"], []).append(span)
+
+
+# ==========================================
+# PERSISTENCE
+# ==========================================
+def flush_run(run_id):
+    """
+    Write the run's buffered spans (never raises)
+
+    Returns:
+        dict: Run totals (tokens, cache_hits, cache_misses, node_ms)
+    """
+    with _runs_lock:
+        spans = _runs.pop(run_id, [])
+    totals = {
+        "tokens": sum(s["tokens"] for s in spans),
+        "cache_hits": sum(s["cache_hits"] for s in spans),
+        "cache_misses": sum(s["cache_misses"] for s in spans),
+        "node_ms": sum(s["duration_ms"] for s in spans),
+    }
+    if not spans:
+        return totals
+
+    rows = [(
+        s["run_id"], s["student_id"], s["node"],
+        datetime.datetime.fromtimestamp(s["started_at"]), s["duration_ms"],
+        s["input_bytes"], s["output_bytes"], s["tokens"], s["cache_hits"], s["cache_misses"], s["error"],
+    ) for s in spans]
+    try:
+        conn = get_db_connection()
+        if not conn:
+            raise Exception("Database connection failed")
+        cursor = conn.cursor()
+        try:
+            cursor.executemany("""
+                INSERT INTO PVNodeTraces
+                    (runId, studentId, node, startedAt, durationMs, inputBytes, outputBytes,
+                     tokens, cacheHits, cacheMisses, error)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, rows)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Failed to store PV traces for run {run_id}: {e}")
+
+    breakdown = ", ".join(f"{s['node']} {s['duration_ms']}ms" for s in spans)
+    print(f"⏱️ PV run {run_id[:8]}: {breakdown} (node total {totals['node_ms']}ms)")
+    return totals
+
+
+# ==========================================
+# REPORTING
+# ==========================================
+def _percentile(ordered, q):
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def get_node_timings(hours=24):
+    """
+    p50/p95 duration and token/cache/error counts per node over the last `hours`
+
+    Returns:
+        dict: {"window_hours", "runs", "nodes": [...]} sorted by p95, slowest first
+    """
+    since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+    conn = get_db_connection()
+    if not conn:
+        raise Exception("Database connection failed")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT runId, node, durationMs, tokens, cacheHits, cacheMisses, error IS NOT NULL
+            FROM PVNodeTraces
+            WHERE startedAt >= %s
+        """, (since,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    by_node = {}
+    runs = set()
+    for run_id, node, duration, tokens, hits, misses, failed in rows:
+        runs.add(run_id)
+        entry = by_node.setdefault(node, {"durations": [], "tokens": 0, "hits": 0, "misses": 0, "errors": 0})
+        entry["durations"].append(duration)
+        entry["tokens"] += tokens or 0
+        entry["hits"] += hits or 0
+        entry["misses"] += misses or 0
+        entry["errors"] += 1 if failed else 0
+
+    nodes = []
+    for node, entry in by_node.items():
+        durations = sorted(entry["durations"])
+        lookups = entry["hits"] + entry["misses"]
+        nodes.append({
+            "node": node,
+            "count": len(durations),
+            "p50_ms": _percentile(durations, 50),
+            "p95_ms": _percentile(durations, 95),
+            "max_ms": durations[-1],
+            "avg_tokens": round(entry["tokens"] / len(durations), 1),
+            "cache_hit_rate": round(entry["hits"] / lookups, 3) if lookups else None,
+            "errors": entry["errors"],
+        })
+    nodes.sort(key=lambda n: n["p95_ms"], reverse=True)
+    return {"window_hours": hours, "runs": len(runs), "nodes": nodes}
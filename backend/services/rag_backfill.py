@@ -0,0 +1,220 @@
+"""
+RAG Bulk Backfill
+Loads historical PV/admin decisions from MySQL into the RAG vector store
+
+Cases are read in keyset-paginated chunks (by PhysicalVerification.verificationId),
+embedded in batches and written with batched collection.upsert calls. Progress
+is checkpointed to a JSON file after every batch, so an interrupted run resumes
+where it stopped and re-running is idempotent (stable per-stage IDs).
+
+Vectors come from the configured embedder (RAG_EMBEDDER); the local fallback
+collection, when enabled, is filled in the same pass. Run with
+RAG_EMBEDDER=local for a fully offline load.
+
+Usage:
+    python -m backend.services.rag_backfill [--batch-size 200] [--restart] [--limit N]
+"""
+import argparse
+import json
+import os
+import time
+
+from backend.config import Config
+from backend.models.database import fetchall_dict, fetchone_dict
+from backend.services import local_embedder, rag_service
+
+# Latest completed PV per student, with admin decision and house analysis
+CASES_WHERE = """
+    pv.verificationId > %s
+    AND pv.status IS NOT NULL
+    AND pv.status NOT IN ('ASSIGNED', 'PROCESSING', 'DRAFT')
+    AND pv.verificationId = (
+        SELECT MAX(p2.verificationId) FROM PhysicalVerification p2
+        WHERE p2.studentId = pv.studentId
+    )
+"""
+
+CASES_QUERY = f"""
+    SELECT
+        pv.verificationId,
+        s.studentId,
+        s.district,
+        s.status AS student_status,
+        s.admin_remarks,
+        pv.comment,
+        pv.elementsSummary,
+        pv.sentiment,
+        pv.sentiment_text,
+        pv.voice_comments,
+        pv.verificationDate,
+        (
+            SELECT ia.issuesFound FROM ImageAnalysis ia
+            WHERE ia.studentId = s.studentId
+            ORDER BY ia.analysisId DESC LIMIT 1
+        ) AS house_analysis
+    FROM PhysicalVerification pv
+    JOIN Student s ON s.studentId = pv.studentId
+    WHERE {CASES_WHERE}
+    ORDER BY pv.verificationId
+    LIMIT %s
+"""
+
+COUNT_QUERY = f"""
+    SELECT COUNT(*) AS total
+    FROM PhysicalVerification pv
+    JOIN Student s ON s.studentId = pv.studentId
+    WHERE {CASES_WHERE}
+"""
+
+# Student.status values of the workflow up to the admin's PV review
+# (PENDING -> TV -> TV_COMPLETED -> PV -> PV_COMPLETED); they carry no admin
+# decision. Everything after it (VI, RI, SELECTED, APPROVED, REJECTED, ON HOLD...)
+# is, or follows from, that decision.
+UNDECIDED_STATUSES = {None, "", "PENDING", "TV", "TV_COMPLETED", "PV", "PV_COMPLETED"}
+
+
+# ==========================================
+# CHECKPOINT
+# ==========================================
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"last_verification_id": 0, "processed": 0}
+
+
+def save_checkpoint(path, state):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".part"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ==========================================
+# BACKFILL
+# ==========================================
+def row_to_case(row):
+    """Convert a MySQL row into (id, document, metadata) for upsert"""
+    student_status = row.get("student_status")
+    admin_decision = "" if student_status in UNDECIDED_STATUSES else student_status
+    ai_decision = row.get("sentiment") or ""
+    try:
+        score = float(row.get("sentiment_text") or 0)
+    except (TypeError, ValueError):
+        score = 0.0
+    district = row.get("district") or "Unknown"
+    admin_remarks = row.get("admin_remarks") or ""
+    verification_date = str(row.get("verificationDate") or "")
+
+    document = rag_service.build_case_document(
+        district, score,
+        row.get("comment") or "",
+        row.get("elementsSummary") or "",
+        row.get("voice_comments") or "",
+        row.get("house_analysis") or "",
+        ai_decision, admin_decision, admin_remarks
+    )
+    metadata = rag_service.build_case_metadata(
+        row["studentId"], district, admin_decision or ai_decision, score,
+        verification_date, ai_decision, admin_decision, admin_remarks
+    )
+    stage = "admin" if admin_decision else "pv"
+    return rag_service.case_id(row["studentId"], stage), document, metadata
+
+
+def backfill(batch_size=200, resume=True, limit=None, embed_fn=None, checkpoint_path=None):
+    """
+    Ingest completed cases from MySQL into the RAG collection.
+
+    Args:
+        batch_size: Rows per MySQL chunk / embedding batch / upsert call
+        resume: Continue from the checkpoint instead of starting over
+        limit: Stop after this many cases (None = all)
+        embed_fn: texts -> embeddings (default: rag_service.generate_embeddings)
+        checkpoint_path: Progress file (default: Config.RAG_BACKFILL_CHECKPOINT)
+
+    Returns:
+        dict: processed count, elapsed seconds and cases/minute
+    """
+    checkpoint_path = checkpoint_path or Config.RAG_BACKFILL_CHECKPOINT
+    embed_fn = embed_fn or rag_service.generate_embeddings
+
+    collection = rag_service.get_collection() or rag_service.initialize_rag()
+    if collection is None:
+        raise RuntimeError("RAG collection unavailable (is RAG_ENABLED set?)")
+    fallback = rag_service.get_fallback_collection()
+
+    state = load_checkpoint(checkpoint_path) if resume else {"last_verification_id": 0, "processed": 0}
+    after_id = state["last_verification_id"]
+    total_row = fetchone_dict(COUNT_QUERY, (after_id,)) or {}
+    remaining = total_row.get("total") or 0
+    if limit is not None:
+        remaining = min(remaining, limit)
+    print(f"📚 RAG backfill: {remaining} cases to ingest (resuming after verificationId {after_id})")
+
+    started = time.perf_counter()
+    done = 0
+    while limit is None or done < limit:
+        size = batch_size if limit is None else min(batch_size, limit - done)
+        rows = fetchall_dict(CASES_QUERY, (after_id, size))
+        if not rows:
+            break
+
+        ids, documents, metadatas = zip(*(row_to_case(r) for r in rows))
+        # Admin-reviewed cases supersede their PV-stage entries
+        superseded = [rag_service.case_id(m["student_id"], "pv") for m in metadatas if m["admin_decision"]]
+        targets = [(collection, embed_fn, rag_service.embedder_version())]
+        if fallback is not None:
+            targets.insert(0, (fallback, local_embedder.embed, local_embedder.VERSION))
+        for store, embed, version in targets:
+            store.upsert(
+                ids=list(ids),
+                embeddings=embed(list(documents)),
+                documents=list(documents),
+                metadatas=[{**m, "embedder": version} for m in metadatas]
+            )
+            if superseded:
+                store.delete(ids=superseded)
+            # Persist the batch before the checkpoint moves past it
+            store.flush()
+
+        done += len(rows)
+        after_id = rows[-1]["verificationId"]
+        state.update({
+            "last_verification_id": after_id,
+            "processed": state.get("processed", 0) + len(rows),
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        save_checkpoint(checkpoint_path, state)
+
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed * 60 if elapsed else 0.0
+        eta = (remaining - done) / (rate / 60) if rate else 0.0
+        print(f"   ↳ {done}/{remaining} cases | {rate:,.0f} cases/min | ETA {eta:,.0f}s")
+
+    rag_service.refresh_document_count()
+    elapsed = time.perf_counter() - started
+    result = {
+        "processed": done,
+        "elapsed_s": round(elapsed, 2),
+        "cases_per_min": round(done / elapsed * 60, 1) if elapsed else 0.0,
+        "last_verification_id": after_id,
+    }
+    print(f"✅ RAG backfill finished: {json.dumps(result)}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load historical cases into the RAG collection")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the beginning")
+    args = parser.parse_args()
+
+    backfill(
+        batch_size=args.batch_size,
+        resume=not args.restart,
+        limit=args.limit,
+    )
@@ -0,0 +1,298 @@
+"""
+RAG Retrieval Evaluation
+Offline quality + latency benchmark for retrieval changes (no API calls)
+
+Fixture cases are read from a mysqldump (default: database_dump_2025-12-27.sql)
+with the same selection and document/metadata layout as rag_backfill, then
+padded to each collection size with perturbed copies (word dropout and
+shuffled sentences) that keep their source's labels. Everything is embedded
+with the deterministic local embedder.
+
+For every fixture case a labelled query is derived from its comments and
+summary, and each backend/size combination reports:
+
+- recall@k: the source case is among the top-k results
+- decision agreement: majority admin_decision of the top-k neighbours (the
+  source and its copies excluded) matches the source's admin_decision
+- p50/p95/p99 latency of the nearest-neighbour query
+
+Usage:
+    python -m backend.services.rag_eval [--dump database_dump_2025-12-27.sql]
+                                        [--sizes 100 1000 5000] [--backends numpy chroma]
+                                        [--top-k 5] [--output report.json]
+"""
+import argparse
+import json
+import random
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from backend.services import local_embedder, rag_backfill
+from backend.services.vector_store import create_vector_store
+
+DEFAULT_DUMP = "database_dump_2025-12-27.sql"
+
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "0": "\0", "Z": "\x1a", "b": "\b"}
+
+
+# ==========================================
+# FIXTURES (mysqldump parsing)
+# ==========================================
+def _read_dump(path):
+    raw = open(path, "rb").read()
+    if raw[:2] in (b"\xff\xfe", b"\xfe\xff"):  # mysqldump on Windows writes UTF-16
+        text = raw.decode("utf-16")
+    else:
+        text = raw.decode("utf-8", errors="replace")
+    return text.replace("\r\n", "\n")
+
+
+def _table_columns(sql, table):
+    match = re.search(rf"CREATE TABLE `{table}` \((.*?)\n\) ENGINE", sql, re.S)
+    if not match:
+        return []
+    return re.findall(r"^\s*`(\w+)`", match.group(1), re.M)
+
+
+def _parse_values(text):
+    """Yield row tuples from the VALUES part of an extended INSERT"""
+    i, n = 0, len(text)
+    while i < n:
+        if text[i] != "(":
+            i += 1
+            continue
+        i += 1
+        row = []
+        while True:
+            while text[i] in " \n\r\t":
+                i += 1
+            if text[i] == "'":
+                i += 1
+                chunk = []
+                while text[i] != "'":
+                    if text[i] == "\\":
+                        i += 1
+                        chunk.append(_ESCAPES.get(text[i], text[i]))
+                    else:
+                        chunk.append(text[i])
+                    i += 1
+                i += 1
+                row.append("".join(chunk))
+            else:
+                start = i
+                while text[i] not in ",)":
+                    i += 1
+                token = text[start:i].strip()
+                if token == "NULL":
+                    row.append(None)
+                else:
+                    try:
+                        row.append(int(token))
+                    except ValueError:
+                        row.append(float(token))
+            while text[i] in " \n\r\t":
+                i += 1
+            if text[i] == ")":
+                i += 1
+                break
+            i += 1  # comma
+        yield tuple(row)
+
+
+def _table_rows(sql, table):
+    columns = _table_columns(sql, table)
+    rows = []
+    for match in re.finditer(rf"INSERT INTO `{table}` VALUES (.*?);\n", sql, re.S):
+        rows.extend(dict(zip(columns, values)) for values in _parse_values(match.group(1)))
+    return rows
+
+
+def load_fixture_cases(dump_path=DEFAULT_DUMP):
+    """
+    Fixture cases from a dump, selected like rag_backfill.CASES_QUERY
+
+    Returns:
+        list: (case_id, document, metadata) per student
+    """
+    sql = _read_dump(dump_path)
+    students = {s["studentId"]: s for s in _table_rows(sql, "student")}
+    latest_analysis = {}
+    for row in _table_rows(sql, "imageanalysis"):
+        latest_analysis[row["studentId"]] = row  # analysisId ascending, last wins
+
+    latest_pv = {}
+    for pv in _table_rows(sql, "physicalverification"):
+        if pv["studentId"] in students:
+            previous = latest_pv.get(pv["studentId"])
+            if previous is None or pv["verificationId"] > previous["verificationId"]:
+                latest_pv[pv["studentId"]] = pv
+
+    cases = []
+    for student_id, pv in sorted(latest_pv.items()):
+        if pv.get("status") in (None, "ASSIGNED", "PROCESSING", "DRAFT"):
+            continue
+        student = students[student_id]
+        analysis = latest_analysis.get(student_id) or {}
+        cases.append(rag_backfill.row_to_case({
+            "verificationId": pv["verificationId"],
+            "studentId": student_id,
+            "district": student.get("district"),
+            "student_status": student.get("status"),
+            "admin_remarks": student.get("admin_remarks"),
+            "comment": pv.get("comment"),
+            "elementsSummary": pv.get("elementsSummary"),
+            "sentiment": pv.get("sentiment"),
+            "sentiment_text": pv.get("sentiment_text"),
+            "voice_comments": pv.get("voice_comments"),
+            "verificationDate": pv.get("verificationDate"),
+            "house_analysis": analysis.get("issuesFound"),
+        }))
+    return cases
+
+
+def _perturb(text, rng, dropout=0.2):
+    """Shuffle sentences and drop a fraction of words"""
+    sentences = [s for s in re.split(r"(?<=[.!?\n])\s+", text or "") if s.strip()]
+    rng.shuffle(sentences)
+    words = " ".join(sentences).split()
+    kept = [w for w in words if rng.random() > dropout]
+    return " ".join(kept or words)
+
+
+def build_collection(fixtures, size, rng):
+    """
+    Fixture cases plus perturbed copies up to `size` entries
+
+    Returns:
+        tuple: (ids, documents, metadatas); metadata["origin"] names the source case
+    """
+    ids, documents, metadatas = [], [], []
+    for case_id, document, metadata in fixtures:
+        ids.append(case_id)
+        documents.append(document)
+        metadatas.append({**metadata, "origin": case_id})
+    copy = 0
+    while len(ids) < size:
+        case_id, document, metadata = fixtures[copy % len(fixtures)]
+        copy += 1
+        ids.append(f"{case_id}~{copy}")
+        documents.append(_perturb(document, rng))
+        metadatas.append({**metadata, "student_id": f"{metadata['student_id']}~{copy}", "origin": case_id})
+    return ids, documents, metadatas
+
+
+def build_queries(fixtures, rng):
+    """One labelled query per fixture case, from its comments/summary with word dropout"""
+    queries = []
+    for case_id, document, metadata in fixtures:
+        body = document.split("Comments:", 1)[-1].split("House Analysis:", 1)[0]
+        queries.append({
+            "text": _perturb(body, rng, dropout=0.3),
+            "source": case_id,
+            "admin_decision": metadata.get("admin_decision") or "",
+        })
+    return queries
+
+
+# ==========================================
+# EVALUATION
+# ==========================================
+def _percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3) if samples else 0.0
+
+
+def evaluate_backend(backend, collection, queries, embed_fn, top_k=5, batch_size=500):
+    """Load a scratch store, run the labelled queries and score them"""
+    ids, documents, metadatas = collection
+    path = tempfile.mkdtemp(prefix=f"rag_eval_{backend}_")
+    try:
+        store = create_vector_store(backend, path, "rag_eval")
+        for i in range(0, len(ids), batch_size):
+            store.upsert(
+                ids=ids[i:i + batch_size],
+                embeddings=embed_fn(documents[i:i + batch_size]),
+                documents=documents[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size]
+            )
+        store.flush()
+
+        query_vectors = embed_fn([q["text"] for q in queries])
+        latencies, hits, agree, decided = [], 0, 0, 0
+        for query, vector in zip(queries, query_vectors):
+            started = time.perf_counter()
+            # Over-fetch so neighbours remain after dropping the source's copies
+            result = store.query(query_embeddings=[vector], n_results=top_k * 4)
+            latencies.append(time.perf_counter() - started)
+
+            retrieved = list(zip(result["ids"][0], result["metadatas"][0]))
+            if query["source"] in [rid for rid, _ in retrieved[:top_k]]:
+                hits += 1
+
+            if query["admin_decision"]:
+                decided += 1
+                neighbours = [m.get("admin_decision") for _, m in retrieved
+                              if m.get("origin") != query["source"] and m.get("admin_decision")][:top_k]
+                if neighbours and Counter(neighbours).most_common(1)[0][0] == query["admin_decision"]:
+                    agree += 1
+
+        return {
+            "recall_at_k": round(hits / len(queries), 4) if queries else 0.0,
+            "decision_agreement": round(agree / decided, 4) if decided else None,
+            "decided_queries": decided,
+            "p50_ms": _percentile_ms(latencies, 50),
+            "p95_ms": _percentile_ms(latencies, 95),
+            "p99_ms": _percentile_ms(latencies, 99),
+        }
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def run(dump_path=DEFAULT_DUMP, sizes=(100, 1000), backends=("numpy", "chroma"), top_k=5,
+        embed_fn=None, seed=7):
+    """
+    Evaluate every backend at every collection size
+
+    Returns:
+        list: One report row per (size, backend)
+    """
+    embed_fn = embed_fn or local_embedder.embed
+    fixtures = load_fixture_cases(dump_path)
+    if not fixtures:
+        raise RuntimeError(f"No completed PV cases found in {dump_path}")
+    print(f"📚 {len(fixtures)} fixture cases from {dump_path}")
+
+    report = []
+    for size in sizes:
+        rng = random.Random(seed)
+        collection = build_collection(fixtures, max(size, len(fixtures)), rng)
+        queries = build_queries(fixtures, rng)
+        for backend in backends:
+            row = {"backend": backend, "size": len(collection[0]), "queries": len(queries), "top_k": top_k}
+            try:
+                row.update(evaluate_backend(backend, collection, queries, embed_fn, top_k))
+            except Exception as e:
+                row["error"] = str(e)
+            print(json.dumps(row))
+            report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline RAG retrieval evaluation and latency benchmark")
+    parser.add_argument("--dump", default=DEFAULT_DUMP)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    results = run(args.dump, args.sizes, args.backends, args.top_k)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Report written to {args.output}")
@@ -1,15 +1,25 @@
 """
 RAG Service for Sentiment Analysis
-Uses ChromaDB for local vector storage and Gemini for embeddings
+Uses a local vector store (ChromaDB or a NumPy index, see RAG_BACKEND)
+and Gemini or the local hashing embedder for embeddings (RAG_EMBEDDER)
+
+Each embedder has its own collection, so vectors from different embedders
+never share an index. With Gemini as the primary embedder and
+RAG_LOCAL_FALLBACK on, every case is also written to the local-embedder
+collection, which serves searches while the embedding API is down.
 """
 
 import os
 import json
-import chromadb
-from chromadb.config import Settings
+import numpy as np
 import google.generativeai as genai
 from typing import List, Dict, Optional
+import threading
 import time
+from backend.services import embedding_cache, local_embedder
+from backend.services.pv_tracing import record_cache
+from backend.services.rate_limiter import call_with_limits
+from backend.services.vector_store import create_vector_store
 
 try:
     from dotenv import load_dotenv
@@ -24,72 +34,136 @@ CHROMA_DB_PATH = os.environ.get("CHROMA_DB_PATH", "./chroma_db")
 RAG_COLLECTION_NAME = os.environ.get("RAG_COLLECTION_NAME", "student_cases")
 RAG_TOP_K = int(os.environ.get("RAG_TOP_K", "5"))
 RAG_ENABLED = os.environ.get("RAG_ENABLED", "true").lower() == "true"
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "chroma").lower()  # chroma | numpy
+NUMPY_INDEX_PATH = os.environ.get("NUMPY_INDEX_PATH", "./vector_index")
+RAG_EMBEDDER = os.environ.get("RAG_EMBEDDER", "gemini").lower()  # gemini | local
+RAG_LOCAL_FALLBACK = os.environ.get("RAG_LOCAL_FALLBACK", "true").lower() == "true"
+RAG_FETCH_K = int(os.environ.get("RAG_FETCH_K", "20"))  # candidates fetched for MMR re-ranking
+RAG_MMR_LAMBDA = float(os.environ.get("RAG_MMR_LAMBDA", "0.7"))  # 1.0 = pure relevance
+RAG_CONTEXT_TOKEN_BUDGET = int(os.environ.get("RAG_CONTEXT_TOKEN_BUDGET", "400"))
+CASE_DETAIL_TOKENS = 75  # per-case cap, same as the old doc[:300] slice
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBED_BATCH_SIZE = 100  # batchEmbedContents limit
 
 # Configure Gemini for embeddings
 genai.configure(api_key=os.environ["GEMINI_API_KEY"])
 
 # ==========================================
-# CHROMADB CLIENT INITIALIZATION
+# VECTOR STORE INITIALIZATION
 # ==========================================
-_chroma_client = None
-_collection = None
+_collection = None  # vectors from RAG_EMBEDDER
+_fallback = None  # local-embedder shadow collection (Gemini primary + RAG_LOCAL_FALLBACK)
+_doc_count = 0  # cached collection.count(), refreshed on writes
+_fallback_count = 0
+_count_lock = threading.Lock()
+_status = {"state": "uninitialized", "error": None, "initialized_at": None, "init_ms": None}
+
+def _store_path() -> str:
+    return NUMPY_INDEX_PATH if RAG_BACKEND == "numpy" else CHROMA_DB_PATH
+
+def embedder_version(embedder: Optional[str] = None) -> str:
+    """Version tag of the vectors an embedder produces."""
+    return EMBEDDING_MODEL if (embedder or RAG_EMBEDDER) == "gemini" else local_embedder.VERSION
+
+def collection_name_for(embedder: str) -> str:
+    """Collection holding one embedder's vectors (Gemini keeps the original name)."""
+    if embedder == "gemini":
+        return RAG_COLLECTION_NAME
+    return f"{RAG_COLLECTION_NAME}__{local_embedder.VERSION}"
 
 def initialize_rag():
     """
-    Initialize ChromaDB client and collection.
+    Initialize the vector store selected by RAG_BACKEND.
     Creates the collection if it doesn't exist.
+    
+    Called once at app startup (and by the CLI tools); request handlers
+    never initialize lazily, see get_collection().
     """
-    global _chroma_client, _collection
+    global _collection, _fallback
     
     if not RAG_ENABLED:
         print("⚠️ RAG is disabled via RAG_ENABLED=false")
+        _status.update(state="disabled", error=None)
         return None
     
+    started = time.perf_counter()
     try:
-        # Create ChromaDB client with persistent storage
-        _chroma_client = chromadb.PersistentClient(
-            path=CHROMA_DB_PATH,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
+        _collection = create_vector_store(RAG_BACKEND, _store_path(), collection_name_for(RAG_EMBEDDER))
+        if RAG_EMBEDDER == "gemini" and RAG_LOCAL_FALLBACK:
+            _fallback = create_vector_store(RAG_BACKEND, _store_path(), collection_name_for("local"))
+        refresh_document_count()
+        _status.update(
+            state="ready",
+            error=None,
+            initialized_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+            init_ms=round((time.perf_counter() - started) * 1000, 1)
         )
         
-        # Get or create collection
-        _collection = _chroma_client.get_or_create_collection(
-            name=RAG_COLLECTION_NAME,
-            metadata={"description": "Verified student cases for RAG"}
-        )
-        
-        print(f"✅ RAG initialized: {_collection.count()} documents in collection")
+        print(f"✅ RAG initialized ({RAG_BACKEND}, {embedder_version()}): {_doc_count} documents in collection"
+              + (f", {_fallback_count} in local fallback" if _fallback is not None else ""))
         return _collection
         
     except Exception as e:
+        _status.update(state="error", error=str(e))
         print(f"❌ Failed to initialize RAG: {e}")
         return None
 
 def get_collection():
-    """Get the ChromaDB collection, initializing if needed."""
-    global _collection
-    if _collection is None:
-        initialize_rag()
+    """Get the vector store (None until initialize_rag() has run)."""
     return _collection
 
+def get_fallback_collection():
+    """Local-embedder shadow collection, or None when not configured."""
+    return _fallback
+
+def refresh_document_count():
+    """Re-read the document counts after a write."""
+    global _doc_count, _fallback_count
+    with _count_lock:
+        if _collection is not None:
+            _doc_count = _collection.count()
+        if _fallback is not None:
+            _fallback_count = _fallback.count()
+
+def get_document_count() -> int:
+    """Cached number of documents in the collection."""
+    return _doc_count
+
+def get_rag_health() -> Dict:
+    """Initialization state of the RAG store (ready / disabled / error / uninitialized)."""
+    return {
+        **_status,
+        "backend": RAG_BACKEND,
+        "embedder": embedder_version(),
+        "document_count": _doc_count,
+        "fallback_document_count": _fallback_count if _fallback is not None else None,
+    }
+
 # ==========================================
 # EMBEDDING GENERATION
 # ==========================================
-def generate_embedding(text: str) -> List[float]:
+def generate_embedding(text: str, task_type: str = "retrieval_document") -> List[float]:
     """
-    Generate embedding using Gemini's embedding model.
-    Falls back to simple hash if API fails.
+    Generate embedding using the configured embedder (RAG_EMBEDDER).
+    Gemini embeddings are served from the embedding cache when this text
+    was embedded before.
     """
+    if RAG_EMBEDDER == "local":
+        return local_embedder.embed_one(text)
+    
+    cached = embedding_cache.get(EMBEDDING_MODEL, task_type, text)
+    record_cache(cached is not None)
+    if cached is not None:
+        return cached
+
     try:
         # Use Gemini's text embedding model
-        result = genai.embed_content(
-            model="models/text-embedding-004",
+        result = call_with_limits("gemini", EMBEDDING_MODEL, os.environ["GEMINI_API_KEY"], lambda: genai.embed_content(
+            model=EMBEDDING_MODEL,
             content=text,
-            task_type="retrieval_document"
-        )
+            task_type=task_type
+        ))
+        embedding_cache.put(EMBEDDING_MODEL, task_type, text, result['embedding'])
         return result['embedding']
         
     except Exception as e:
@@ -97,9 +171,120 @@ def generate_embedding(text: str) -> List[float]:
         # Fallback: return None to let ChromaDB handle it
         raise e
 
+def generate_embeddings(texts: List[str], task_type: str = "retrieval_document") -> List[List[float]]:
+    """
+    Embed many texts, using the cache first and batched API calls for the rest.
+    
+    Returns:
+        List of embeddings in input order
+    """
+    if RAG_EMBEDDER == "local":
+        return local_embedder.embed(texts)
+    
+    embeddings = embedding_cache.get_many(EMBEDDING_MODEL, task_type, texts)
+    missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+    
+    fresh = {}
+    for i in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = missing[i:i + EMBED_BATCH_SIZE]
+        result = call_with_limits("gemini", EMBEDDING_MODEL, os.environ["GEMINI_API_KEY"], lambda: genai.embed_content(
+            model=EMBEDDING_MODEL,
+            content=batch,
+            task_type=task_type
+        ))
+        fresh.update(zip(batch, result['embedding']))
+        embedding_cache.put_many(EMBEDDING_MODEL, task_type, batch, result['embedding'])
+    
+    return [e if e is not None else fresh[t] for t, e in zip(texts, embeddings)]
+
+def warm_embedding_cache(texts: List[str] = None, task_type: str = "retrieval_document") -> Dict:
+    """
+    Bulk warm-up of the embedding cache.
+    
+    Args:
+        texts: Texts to embed; defaults to every document already in the
+            collection (their stored vectors are cached without API calls)
+    
+    Returns:
+        Counts of cached/embedded texts
+    """
+    if RAG_EMBEDDER == "local":
+        print("ℹ️ Local embedder needs no cache warm-up")
+        return {"texts": 0, "already_cached": 0, "embedded": 0}
+    
+    if texts is not None:
+        before = embedding_cache.get_many(EMBEDDING_MODEL, task_type, texts)
+        generate_embeddings(texts, task_type)
+        already = sum(1 for e in before if e is not None)
+        return {"texts": len(texts), "already_cached": already, "embedded": len(texts) - already}
+    
+    collection = get_collection()
+    if collection is None:
+        return {"texts": 0, "already_cached": 0, "embedded": 0}
+    
+    data = collection.get(include=["documents", "embeddings"])
+    pairs = [(d, e) for d, e in zip(data.get("documents") or [], data.get("embeddings") or []) if d and e is not None]
+    embedding_cache.put_many(
+        EMBEDDING_MODEL, "retrieval_document",
+        [d for d, _ in pairs], [list(e) for _, e in pairs]
+    )
+    print(f"🔥 Embedding cache warmed with {len(pairs)} collection documents")
+    return {"texts": len(pairs), "already_cached": 0, "embedded": 0}
+
 # ==========================================
 # DOCUMENT STORAGE
 # ==========================================
+def case_id(student_id: str, stage: str) -> str:
+    """Stable collection ID for a student's case at a pipeline stage ("pv" or "admin")."""
+    return f"student_{student_id}_{stage}"
+
+def build_case_document(
+    district: str,
+    score: float,
+    comments: str,
+    summary: str,
+    voice_comments: str = "",
+    house_analysis: str = "",
+    ai_decision: str = "",
+    admin_decision: str = "",
+    admin_remarks: str = ""
+) -> str:
+    """Text that is embedded and stored for a student case."""
+    return f"""
+        District: {district}
+        AI Decision: {ai_decision}
+        Admin Decision: {admin_decision}
+        Score: {score}
+        
+        Comments: {comments}
+        Voice: {voice_comments}
+        Summary: {summary}
+        House Analysis: {house_analysis}
+        Admin Remarks: {admin_remarks}
+        """.strip()
+
+def build_case_metadata(
+    student_id: str,
+    district: str,
+    decision: str,
+    score: float,
+    verification_date: str = "",
+    ai_decision: str = "",
+    admin_decision: str = "",
+    admin_remarks: str = ""
+) -> Dict:
+    """Chroma metadata for a student case (separate AI/admin decision fields)."""
+    return {
+        "student_id": student_id,
+        "district": district,
+        "decision": decision,  # Final decision (for backward compatibility)
+        "ai_decision": ai_decision,  # AI/Volunteer recommendation
+        "admin_decision": admin_decision,  # Admin final decision
+        "score": float(score),
+        "verification_date": verification_date or "",
+        "has_admin_remarks": bool(admin_remarks),  # Flag for filtering
+    }
+
 def add_student_case(
     student_id: str,
     district: str,
@@ -142,18 +327,23 @@ def add_student_case(
     
     try:
         # Combine all text for embedding
-        combined_text = f"""
-        District: {district}
-        AI Decision: {ai_decision}
-        Admin Decision: {admin_decision}
-        Score: {score}
+        combined_text = build_case_document(
+            district, score, comments, summary, voice_comments,
+            house_analysis, ai_decision, admin_decision, admin_remarks
+        )
         
-        Comments: {comments}
-        Voice: {voice_comments}
-        Summary: {summary}
-        House Analysis: {house_analysis}
-        Admin Remarks: {admin_remarks}
-        """.strip()
+        # Prepare metadata with separate decision fields
+        metadata = build_case_metadata(
+            student_id, district, decision, score, verification_date,
+            ai_decision, admin_decision, admin_remarks
+        )
+        stage = "admin" if admin_decision else "pv"
+        
+        # Local fallback first: it needs no API call, so the case is kept
+        # even when the Gemini embedding below fails
+        if _fallback is not None:
+            _write_case(_fallback, student_id, stage, local_embedder.embed_one(combined_text),
+                        combined_text, {**metadata, "embedder": local_embedder.VERSION})
         
         # Use provided embedding or generate new one
         if embedding is not None:
@@ -165,38 +355,124 @@ def add_student_case(
             case_embedding = generate_embedding(combined_text)
             print("🔄 Generated new embedding")
         
-        # Prepare metadata with separate decision fields
-        metadata = {
-            "student_id": student_id,
-            "district": district,
-            "decision": decision,  # Final decision (for backward compatibility)
-            "ai_decision": ai_decision,  # AI/Volunteer recommendation
-            "admin_decision": admin_decision,  # Admin final decision
-            "score": float(score),
-            "verification_date": verification_date or "",
-            "has_admin_remarks": bool(admin_remarks),  # Flag for filtering
-        }
-        
-        # Add to ChromaDB
-        collection.add(
-            ids=[f"student_{student_id}_{int(time.time())}"],
-            embeddings=[case_embedding],  # Use the reused or newly generated embedding
-            documents=[combined_text],
-            metadatas=[metadata]
-        )
+        # Use the reused or newly generated embedding
+        _write_case(collection, student_id, stage, case_embedding,
+                    combined_text, {**metadata, "embedder": embedder_version()})
         
-        print(f"✅ Added student case to RAG: {student_id} (AI: {ai_decision}, Admin: {admin_decision})")
+        print(f"✅ Upserted student case to RAG: {student_id} (AI: {ai_decision}, Admin: {admin_decision})")
         
     except Exception as e:
         print(f"❌ Failed to add student case to RAG: {e}")
+    finally:
+        refresh_document_count()
+
+def _write_case(store, student_id: str, stage: str, embedding: List[float], document: str, metadata: Dict):
+    """Upsert one case under its stable per-stage ID and persist it."""
+    # Re-runs replace the case instead of adding near-duplicate vectors
+    store.upsert(
+        ids=[case_id(student_id, stage)],
+        embeddings=[embedding],
+        documents=[document],
+        metadatas=[metadata]
+    )
+    # The admin-reviewed case supersedes the PV-stage one
+    if stage == "admin":
+        store.delete(ids=[case_id(student_id, "pv")])
+    store.flush()
 
 # ==========================================
 # SIMILARITY SEARCH
 # ==========================================
+def _build_where(district: Optional[str] = None, admin_decision: Optional[str] = None) -> Optional[Dict]:
+    """Metadata pre-filter in Chroma's where syntax (understood by both backends)."""
+    clauses = []
+    if district:
+        clauses.append({"district": district})
+    if admin_decision:
+        clauses.append({"admin_decision": admin_decision})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def _query_store(store, query_embedding, top_k, where_filter, include_embeddings=False) -> List[Dict]:
+    """Nearest-neighbour query formatted as a list of cases."""
+    include = ["documents", "metadatas", "distances"]
+    if include_embeddings:
+        include.append("embeddings")
+    results = store.query(
+        query_embeddings=[query_embedding],
+        n_results=top_k or RAG_TOP_K,
+        where=where_filter,
+        include=include
+    )
+    
+    # Format results
+    similar_cases = []
+    if results['documents'] and len(results['documents'][0]) > 0:
+        for i in range(len(results['documents'][0])):
+            case = {
+                'document': results['documents'][0][i],
+                'metadata': results['metadatas'][0][i],
+                'distance': results['distances'][0][i] if 'distances' in results else None
+            }
+            if include_embeddings:
+                case['embedding'] = results['embeddings'][0][i]
+            similar_cases.append(case)
+    return similar_cases
+
+def _search(query_text, district, top_k, admin_decision, include_embeddings):
+    """Shared body of the search functions; returns (similar_cases, query_embedding)."""
+    if not RAG_ENABLED:
+        return [], None
+    
+    collection = get_collection()
+    if collection is None:
+        print(f"⚠️ RAG not available ({_status['state']})")
+        return [], None
+    if _doc_count == 0:
+        # Only an empty store re-checks (e.g. a backfill ran in another process)
+        refresh_document_count()
+    if _doc_count == 0:
+        print("⚠️ RAG collection is empty")
+        return [], None
+    
+    # Prepare filters
+    where_filter = _build_where(district, admin_decision)
+    
+    try:
+        # Generate query embedding (ONLY ONCE)
+        query_embedding = generate_embedding(query_text)
+    except Exception as e:
+        if _fallback is None or _fallback_count == 0:
+            print(f"❌ RAG search failed: {e}")
+            return [], None
+        # Embedding API down: search the local-embedder collection instead
+        try:
+            similar_cases = _query_store(
+                _fallback, local_embedder.embed_one(query_text), top_k, where_filter, include_embeddings
+            )
+        except Exception as fallback_error:
+            print(f"❌ RAG fallback search failed: {fallback_error}")
+            return [], None
+        print(f"🛟 Found {len(similar_cases)} similar cases in the local fallback collection")
+        # The local query vector must never be reused for the primary collection
+        return similar_cases, None
+    
+    try:
+        # Search using the same embedding
+        similar_cases = _query_store(collection, query_embedding, top_k, where_filter, include_embeddings)
+        print(f"🔍 Found {len(similar_cases)} similar cases")
+        return similar_cases, query_embedding
+        
+    except Exception as e:
+        print(f"❌ RAG search failed: {e}")
+        return [], None
+
 def search_similar_cases(
     query_text: str,
     district: Optional[str] = None,
-    top_k: Optional[int] = None
+    top_k: Optional[int] = None,
+    admin_decision: Optional[str] = None
 ) -> List[Dict]:
     """
     Search for similar student cases based on query text.
@@ -205,55 +481,20 @@ def search_similar_cases(
         query_text: Text to search for (volunteer comments, summary, etc.)
         district: Optional filter by district
         top_k: Number of results to return (default: RAG_TOP_K)
+        admin_decision: Optional filter by admin decision (e.g. APPROVED)
     
     Returns:
         List of similar cases with metadata and similarity scores
     """
-    if not RAG_ENABLED:
-        return []
-    
-    collection = get_collection()
-    if collection is None or collection.count() == 0:
-        print("⚠️ RAG collection is empty")
-        return []
-    
-    try:
-        # Generate query embedding
-        query_embedding = generate_embedding(query_text)
-        
-        # Prepare filters
-        where_filter = None
-        if district:
-            where_filter = {"district": district}
-        
-        # Search
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k or RAG_TOP_K,
-            where=where_filter
-        )
-        
-        # Format results
-        similar_cases = []
-        if results['documents'] and len(results['documents'][0]) > 0:
-            for i in range(len(results['documents'][0])):
-                similar_cases.append({
-                    'document': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else None
-                })
-        
-        print(f"🔍 Found {len(similar_cases)} similar cases")
-        return similar_cases
-        
-    except Exception as e:
-        print(f"❌ RAG search failed: {e}")
-        return []
+    similar_cases, _ = _search(query_text, district, top_k, admin_decision, False)
+    return similar_cases
 
 def search_similar_cases_with_embedding(
     query_text: str,
     district: Optional[str] = None,
-    top_k: Optional[int] = None
+    top_k: Optional[int] = None,
+    admin_decision: Optional[str] = None,
+    include_embeddings: bool = False
 ) -> tuple[List[Dict], List[float]]:
     """
     Search for similar cases AND return the query embedding for reuse.
@@ -263,52 +504,14 @@ def search_similar_cases_with_embedding(
         query_text: Text to search for
         district: Optional filter by district
         top_k: Number of results to return
+        admin_decision: Optional filter by admin decision
+        include_embeddings: Attach each case's stored vector (for MMR re-ranking)
     
     Returns:
-        Tuple of (similar_cases, query_embedding)
+        Tuple of (similar_cases, query_embedding); the embedding is None when
+        results came from the local fallback collection
     """
-    if not RAG_ENABLED:
-        return [], None
-    
-    collection = get_collection()
-    if collection is None or collection.count() == 0:
-        print("⚠️ RAG collection is empty")
-        return [], None
-    
-    try:
-        # Generate query embedding (ONLY ONCE)
-        query_embedding = generate_embedding(query_text)
-        
-        # Prepare filters
-        where_filter = None
-        if district:
-            where_filter = {"district": district}
-        
-        # Search using the same embedding
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k or RAG_TOP_K,
-            where=where_filter
-        )
-        
-        # Format results
-        similar_cases = []
-        if results['documents'] and len(results['documents'][0]) > 0:
-            for i in range(len(results['documents'][0])):
-                similar_cases.append({
-                    'document': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else None
-                })
-        
-        print(f"🔍 Found {len(similar_cases)} similar cases")
-        
-        # Return both results AND the embedding for reuse
-        return similar_cases, query_embedding
-        
-    except Exception as e:
-        print(f"❌ RAG search failed: {e}")
-        return [], None
+    return _search(query_text, district, top_k, admin_decision, include_embeddings)
 
 # ==========================================
 # CONTEXT FORMATTING
@@ -347,6 +550,125 @@ Case {i}:
     
     return "\n".join(context_parts)
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompt budgeting (~4 characters per token)."""
+    return (len(text) + 3) // 4 if text else 0
+
+def mmr_rerank(
+    query_embedding: List[float],
+    cases: List[Dict],
+    k: int,
+    lambda_mult: float = RAG_MMR_LAMBDA
+) -> List[Dict]:
+    """
+    Order cases by maximal marginal relevance.
+    
+    Each pick maximises lambda * sim(query, case) - (1 - lambda) * max sim(case, picked),
+    so near-duplicate neighbours are pushed down. Cases without an 'embedding'
+    keep their retrieval order.
+    """
+    if query_embedding is None or not cases or any(c.get('embedding') is None for c in cases):
+        return cases[:k]
+    
+    vectors = np.array([c['embedding'] for c in cases], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+    query = np.array(query_embedding, dtype=np.float32)
+    query /= max(float(np.linalg.norm(query)), 1e-12)
+    
+    relevance = vectors @ query
+    redundancy = np.zeros(len(cases), dtype=np.float32)
+    remaining = list(range(len(cases)))
+    picked = []
+    while remaining and len(picked) < k:
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy[remaining]
+        best = remaining.pop(int(np.argmax(scores)))
+        picked.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return [cases[i] for i in picked]
+
+def _case_details(doc: str) -> str:
+    """Case document without the District/Score lines already shown in the entry header."""
+    lines = [line.strip() for line in doc.splitlines()]
+    return " ".join(l for l in lines if l and not l.startswith(("District:", "Score:")))
+
+def build_rag_context(
+    similar_cases: List[Dict],
+    query_embedding: Optional[List[float]] = None,
+    top_k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    lambda_mult: float = RAG_MMR_LAMBDA
+) -> tuple[str, List[Dict], Dict]:
+    """
+    Token-budgeted replacement for format_rag_context().
+    
+    Deduplicates by student_id, re-ranks with MMR and packs cases into the
+    token budget. Each case gets a fair share of what is left (at most
+    CASE_DETAIL_TOKENS of details), so the first case cannot crowd out the rest.
+    
+    Args:
+        similar_cases: Candidates from search_similar_cases_with_embedding(include_embeddings=True)
+        query_embedding: Query vector (enables MMR)
+        top_k: Maximum cases in the context (default: RAG_TOP_K)
+        token_budget: Maximum estimated tokens (default: RAG_CONTEXT_TOKEN_BUDGET)
+        lambda_mult: MMR relevance/diversity trade-off
+    
+    Returns:
+        Tuple of (context, selected cases without embeddings, stats)
+    """
+    top_k = top_k or RAG_TOP_K
+    token_budget = token_budget or RAG_CONTEXT_TOKEN_BUDGET
+    
+    # Candidates arrive nearest-first, so the first entry per student is the best one
+    seen = set()
+    unique = []
+    for case in similar_cases:
+        student_id = (case.get('metadata') or {}).get('student_id')
+        if student_id is not None and student_id in seen:
+            continue
+        seen.add(student_id)
+        unique.append(case)
+    
+    ranked = mmr_rerank(query_embedding, unique, top_k, lambda_mult)
+    
+    header = "HISTORICAL CONTEXT - Similar Verified Cases:\n"
+    parts = [header]
+    used = estimate_tokens(header)
+    selected = []
+    for position, case in enumerate(ranked):
+        metadata = case['metadata']
+        entry = (
+            f"\nCase {len(selected) + 1}:\n"
+            f"- District: {metadata.get('district', 'Unknown')}\n"
+            f"- Decision: {metadata.get('decision', 'UNKNOWN')}\n"
+            f"- Score: {metadata.get('score', 0)}\n"
+            f"- Details: "
+        )
+        details = _case_details(case['document'])
+        share = (token_budget - used) // (len(ranked) - position)
+        room = min(share - estimate_tokens(entry) - 1, CASE_DETAIL_TOKENS)
+        if room < 20:  # not enough left for a useful entry
+            break
+        if estimate_tokens(details) > room:
+            details = details[:room * 4 - 3].rstrip() + "..."
+        entry += details + "\n"
+        parts.append(entry)
+        used += estimate_tokens(entry)
+        selected.append({key: value for key, value in case.items() if key != 'embedding'})
+    
+    context = "\n".join(parts) if selected else "No similar historical cases found."
+    baseline = estimate_tokens(format_rag_context(similar_cases[:top_k]))
+    tokens = estimate_tokens(context)
+    stats = {
+        "candidates": len(similar_cases),
+        "duplicates_removed": len(similar_cases) - len(unique),
+        "selected": len(selected),
+        "tokens": tokens,
+        "baseline_tokens": baseline,
+        "tokens_saved": baseline - tokens,
+        "token_budget": token_budget,
+    }
+    return context, selected, stats
+
 # ==========================================
 # UTILITY FUNCTIONS
 # ==========================================
@@ -357,35 +679,136 @@ def get_collection_stats() -> Dict:
     
     collection = get_collection()
     if collection is None:
-        return {"enabled": True, "initialized": False}
+        return {"enabled": True, "initialized": False, "health": get_rag_health()}
     
     return {
         "enabled": True,
         "initialized": True,
-        "document_count": collection.count(),
-        "collection_name": RAG_COLLECTION_NAME,
-        "db_path": CHROMA_DB_PATH
+        "health": get_rag_health(),
+        "document_count": _doc_count,
+        "collection_name": collection_name_for(RAG_EMBEDDER),
+        "backend": RAG_BACKEND,
+        "db_path": _store_path(),
+        "embedding_cache": embedding_cache.get_stats()
     }
 
-def reset_collection():
-    """Reset the RAG collection (use with caution!)"""
-    global _chroma_client, _collection
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _entry_rank(entry_id: str, metadata: Dict):
+    """Sort key for picking which duplicate of a student's case to keep."""
+    has_admin = bool((metadata or {}).get("admin_decision"))
+    suffix = entry_id.rsplit("_", 1)[-1]
+    timestamp = int(suffix) if suffix.isdigit() else 0
+    return (has_admin, (metadata or {}).get("verification_date", ""), timestamp)
+
+def compact_collection(dry_run: bool = False) -> Dict:
+    """
+    Collapse duplicate vectors per student into one entry under its stable ID.
+    
+    Keeps the admin-reviewed (else newest) entry for each student, re-keys it
+    to case_id(student_id, stage) and deletes the rest.
+    
+    Returns:
+        Before/after counts and the reclaimed size
+    """
+    collection = get_collection()
+    if collection is None:
+        return {"error": "RAG collection unavailable"}
     
-    if _chroma_client and _collection:
-        _chroma_client.delete_collection(RAG_COLLECTION_NAME)
-        print(f"⚠️ Deleted collection: {RAG_COLLECTION_NAME}")
-        _collection = None
-        initialize_rag()
+    disk_before = _dir_size(_store_path())
+    data = collection.get(include=["metadatas"])
+    ids = data.get("ids") or []
+    metadatas = data.get("metadatas") or []
+    
+    by_student = {}
+    for entry_id, metadata in zip(ids, metadatas):
+        student_id = (metadata or {}).get("student_id") or entry_id
+        by_student.setdefault(student_id, []).append((entry_id, metadata))
+    
+    to_delete = []
+    to_rekey = []  # (old_id, new_id)
+    for student_id, entries in by_student.items():
+        entries.sort(key=lambda e: _entry_rank(*e), reverse=True)
+        keep_id, keep_meta = entries[0]
+        stage = "admin" if (keep_meta or {}).get("admin_decision") else "pv"
+        stable_id = case_id(student_id, stage)
+        if keep_id != stable_id:
+            to_rekey.append((keep_id, stable_id))
+        to_delete.extend(e[0] for e in entries[1:] if e[0] != stable_id)
+    
+    # Estimate reclaimed bytes from the removed documents and vectors
+    reclaimed_estimate = 0
+    if to_delete:
+        removed = collection.get(ids=to_delete, include=["documents", "embeddings"])
+        for doc, emb in zip(removed.get("documents") or [], removed.get("embeddings") or []):
+            reclaimed_estimate += len((doc or "").encode("utf-8")) + 4 * len(emb if emb is not None else [])
+    
+    if not dry_run:
+        if to_rekey:
+            old_ids = [old for old, _ in to_rekey]
+            keep = collection.get(ids=old_ids, include=["documents", "embeddings", "metadatas"])
+            new_id_for = dict(to_rekey)
+            collection.upsert(
+                ids=[new_id_for[i] for i in keep["ids"]],
+                embeddings=list(keep["embeddings"]),
+                documents=keep["documents"],
+                metadatas=keep["metadatas"]
+            )
+            to_delete.extend(old_ids)
+        if to_delete:
+            collection.delete(ids=to_delete)
+        collection.flush()
+        refresh_document_count()
+    
+    result = {
+        "dry_run": dry_run,
+        "students": len(by_student),
+        "entries_before": len(ids),
+        "entries_after": len(ids) if dry_run else collection.count(),
+        "duplicates_removed": len(to_delete) - (0 if dry_run else len(to_rekey)),
+        "rekeyed": len(to_rekey),
+        "reclaimed_bytes_estimate": reclaimed_estimate,
+        "disk_bytes_before": disk_before,
+        "disk_bytes_after": _dir_size(_store_path()),
+    }
+    print(f"🗜️ RAG compaction: {json.dumps(result)}")
+    return result
+
+def reset_collection():
+    """Reset the RAG collections (use with caution!)"""
+    for store in (_collection, _fallback):
+        if store is not None:
+            store.reset()
+            print(f"⚠️ Deleted collection: {store.collection_name}")
+    refresh_document_count()
 
 # ==========================================
 # MAIN (for testing)
 # ==========================================
 if __name__ == "__main__":
+    import sys
+    
     print("Testing RAG Service...")
     
     # Initialize
     initialize_rag()
     
+    # python -m backend.services.rag_service --warm-cache
+    if "--warm-cache" in sys.argv:
+        print(f"\nWarm-up: {json.dumps(warm_embedding_cache(), indent=2)}")
+    
+    # python -m backend.services.rag_service --compact [--dry-run]
+    if "--compact" in sys.argv:
+        compact_collection(dry_run="--dry-run" in sys.argv)
+    
     # Get stats
     stats = get_collection_stats()
     print(f"\nCollection Stats: {json.dumps(stats, indent=2)}")
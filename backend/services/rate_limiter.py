@@ -0,0 +1,300 @@
+"""
+Rate Limiter & Circuit Breaker
+Shared request budget per (provider, model, API key) for Gemini and Groq
+
+- Token bucket (GCRA): callers reserve the next free slot in arrival order
+  and sleep outside the lock, so concurrent PV pipelines, uploads and OCR
+  share the quota fairly instead of each hammering it on its own. With
+  RATE_LIMIT_BACKEND=sqlite the bucket state lives in a SQLite file and is
+  shared by every process on the host.
+- A 429 pushes the whole bucket back (penalize) rather than only the caller.
+- Retries use exponential backoff with full jitter.
+- Circuit breaker: after CIRCUIT_FAILURE_THRESHOLD consecutive transient
+  failures the provider is skipped for CIRCUIT_RESET_SECONDS, then a single
+  trial call decides whether it closes again.
+"""
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from backend.config import Config
+
+
+class RateLimitTimeout(Exception):
+    """The next free slot is further away than the caller is willing to wait."""
+
+
+class CircuitOpenError(Exception):
+    """The provider is failing; calls are rejected until the reset timeout."""
+
+
+# ==========================================
+# TOKEN BUCKETS
+# ==========================================
+class TokenBucket:
+    """In-process GCRA bucket: `rate` calls per minute, bursts of up to `burst`."""
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.interval = 60.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self._tat = 0.0  # theoretical arrival time of the next call
+        self._lock = threading.Lock()
+
+    def _reserve(self, tat, now, max_wait):
+        """Returns (wait, new_tat) or raises RateLimitTimeout"""
+        start = max(now, tat - self.tolerance)
+        wait = start - now
+        if wait > max_wait:
+            raise RateLimitTimeout(f"{self.name}: next slot in {wait:.1f}s")
+        return wait, max(tat, now) + self.interval
+
+    def acquire(self, max_wait):
+        with self._lock:
+            wait, self._tat = self._reserve(self._tat, time.time(), max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, seconds):
+        """Delay every caller (e.g. after a 429)"""
+        with self._lock:
+            self._tat = max(self._tat, time.time() + seconds)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """GCRA bucket whose state is shared across processes through SQLite."""
+
+    def __init__(self, name, rate, burst, path):
+        super().__init__(name, rate, burst)
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tat REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, compute):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # serializes writers across processes
+        try:
+            row = conn.execute("SELECT tat FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            result, tat = compute(row[0] if row else 0.0)
+            conn.execute("INSERT OR REPLACE INTO buckets (name, tat) VALUES (?, ?)", (self.name, tat))
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, max_wait):
+        wait = self._update(lambda tat: self._reserve(tat, time.time(), max_wait))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, seconds):
+        self._update(lambda tat: (None, max(tat, time.time() + seconds)))
+
+
+# ==========================================
+# CIRCUIT BREAKER
+# ==========================================
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open trial -> closed/open"""
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.time() - self.opened_at))
+            raise CircuitOpenError(f"{self.name} circuit open (retry in {retry_in:.0f}s)")
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def release_trial(self):
+        """Free the half-open trial slot when the trial call never reached the provider"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"🔌 Circuit opened for {self.name} after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.time()
+                self._trial_running = False
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures}
+
+
+# ==========================================
+# REGISTRY
+# ==========================================
+_registry_lock = threading.Lock()
+_buckets = {}
+_breakers = {}
+_stats = {}
+
+
+def _limit_name(provider, model, api_key):
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:8]
+    return f"{provider}:{model}:{key_hash}"
+
+
+def _rate_for(provider):
+    if provider == "groq":
+        return Config.GROQ_RPM, Config.GROQ_BURST
+    return Config.GEMINI_RPM, Config.GEMINI_BURST
+
+
+def get_bucket(provider, model, api_key):
+    name = _limit_name(provider, model, api_key)
+    with _registry_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            rate, burst = _rate_for(provider)
+            if Config.RATE_LIMIT_BACKEND == "sqlite":
+                bucket = SQLiteTokenBucket(name, rate, burst, Config.RATE_LIMIT_DB_PATH)
+            else:
+                bucket = TokenBucket(name, rate, burst)
+            _buckets[name] = bucket
+        return bucket
+
+
+def get_breaker(provider, model, api_key):
+    name = _limit_name(provider, model, api_key)
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_RESET_SECONDS)
+            _breakers[name] = breaker
+        return breaker
+
+
+def _count(name, field, amount=1):
+    with _registry_lock:
+        entry = _stats.setdefault(name, {"calls": 0, "retries": 0, "throttled": 0,
+                                         "rejected_open": 0, "wait_s": 0.0})
+        entry[field] += amount
+
+
+def is_quota_error(error):
+    msg = str(error).lower()
+    return "429" in msg or "exhausted" in msg or "quota" in msg or "rate limit" in msg
+
+
+def is_transient_error(error):
+    """Quota, server-side and network errors (worth retrying / count towards the breaker)"""
+    if is_quota_error(error):
+        return True
+    msg = str(error).lower()
+    markers = ("500", "502", "503", "504", "unavailable", "deadline", "timed out",
+               "timeout", "connection", "internal error")
+    return any(m in msg for m in markers)
+
+
+def backoff_delay(attempt, base=None, cap=30.0):
+    """Exponential backoff with full jitter"""
+    base = Config.RATE_LIMIT_BACKOFF_BASE if base is None else base
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_limits(provider, model, api_key, func, *args, max_attempts=3, **kwargs):
+    """
+    Run func(*args, **kwargs) under the shared bucket and circuit breaker
+
+    Raises:
+        CircuitOpenError: Provider is failing; no call was made
+        RateLimitTimeout: Quota is booked further out than RATE_LIMIT_MAX_WAIT
+        Exception: The last error from func
+    """
+    bucket = get_bucket(provider, model, api_key)
+    breaker = get_breaker(provider, model, api_key)
+    name = bucket.name
+
+    for attempt in range(max_attempts):
+        try:
+            breaker.allow()
+        except CircuitOpenError:
+            _count(name, "rejected_open")
+            raise
+
+        # Until the outcome is recorded, a half-open breaker's trial slot is taken:
+        # release it if we bail out before (RateLimitTimeout) or past (BaseException) the call
+        recorded = False
+        try:
+            waited = bucket.acquire(Config.RATE_LIMIT_MAX_WAIT)
+            _count(name, "calls")
+            if waited:
+                _count(name, "wait_s", waited)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                recorded = True
+                if not is_transient_error(e):
+                    breaker.record_success()  # the provider answered; the request itself was bad
+                    raise
+                breaker.record_failure()
+                if is_quota_error(e):
+                    _count(name, "throttled")
+                    bucket.penalize(backoff_delay(attempt))
+                if attempt == max_attempts - 1:
+                    raise
+                delay = backoff_delay(attempt)
+                _count(name, "retries")
+                print(f"⚠️ {provider} call failed ({e}); retry {attempt + 1}/{max_attempts - 1} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            recorded = True
+            breaker.record_success()
+            return result
+        finally:
+            if not recorded:
+                breaker.release_trial()
+
+
+def get_limiter_stats():
+    """Per-bucket counters and circuit state for this process"""
+    with _registry_lock:
+        stats = {name: dict(entry) for name, entry in _stats.items()}
+        breakers = dict(_breakers)
+    for name, breaker in breakers.items():
+        stats.setdefault(name, {})["circuit"] = breaker.snapshot()
+    for entry in stats.values():
+        if "wait_s" in entry:
+            entry["wait_s"] = round(entry["wait_s"], 2)
+    return {"backend": Config.RATE_LIMIT_BACKEND, "buckets": stats}
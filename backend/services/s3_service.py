@@ -108,6 +108,38 @@ def upload_image_batch(image_data_list):
     return uploaded_keys
 
 
+def upload_stream_batch(jobs, max_workers=None):
+    """
+    Stream multiple files to S3 in parallel
+    
+    Args:
+        jobs (list): List of dicts with 'key' and 'open' (callable returning
+            a readable file object; opened inside the worker so only
+            max_workers files are held open at once)
+        max_workers (int): Concurrent uploads (default: Config.S3_UPLOAD_WORKERS)
+        
+    Returns:
+        list: One dict per job, in input order: {'key', 'success', 'error'}
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    def upload_single(job):
+        try:
+            with job['open']() as fileobj:
+                s3_client.upload_fileobj(fileobj, Config.AWS_BUCKET, job['key'])
+            return {'key': job['key'], 'success': True, 'error': None}
+        except Exception as e:
+            print(f"❌ S3 upload failed for {job['key']}: {e}")
+            return {'key': job['key'], 'success': False, 'error': str(e)}
+    
+    if not jobs:
+        return []
+    
+    workers = max(1, min(max_workers or Config.S3_UPLOAD_WORKERS, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(upload_single, jobs))
+
+
 def get_s3_client():
     """
     Get the S3 client instance
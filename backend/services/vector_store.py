@@ -0,0 +1,404 @@
+"""
+Vector Store Backends for RAG
+Pluggable stores behind rag_service (selected with RAG_BACKEND)
+
+Both backends expose the subset of the Chroma collection API that
+rag_service uses - count(), get(), upsert(), delete(), query() - plus
+flush() and reset(), so callers never branch on the backend.
+
+- ChromaVectorStore: thin wrapper over a Chroma persistent collection
+- NumpyVectorStore: normalized float32 matrix in memory with vectorized
+  cosine top-k (argpartition), metadata pre-filtering and .npy snapshots
+  that are memory-mapped on load. Several processes (app workers, the
+  backfill CLI) may share a snapshot: flush() holds an exclusive file lock
+  and, if another process saved since this one loaded, merges its own
+  pending upserts/deletes onto the newer snapshot instead of overwriting it;
+  reads (count/get/query) reload a snapshot that is newer than the loaded one.
+"""
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class ChromaVectorStore:
+    """Chroma persistent collection behind the common store API."""
+
+    backend = "chroma"
+
+    def __init__(self, path: str, collection_name: str):
+        import chromadb
+        from chromadb.config import Settings
+
+        self.path = path
+        self.collection_name = collection_name
+        self._client = chromadb.PersistentClient(
+            path=path,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+        self._collection = self._client.get_or_create_collection(
+            name=collection_name,
+            metadata={"description": "Verified student cases for RAG"}
+        )
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def get(self, ids=None, where=None, include=None):
+        return self._collection.get(ids=ids, where=where, include=include or ["metadatas", "documents"])
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids):
+        if ids:
+            self._collection.delete(ids=ids)
+
+    def query(self, query_embeddings, n_results=5, where=None, include=None):
+        return self._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=include or ["documents", "metadatas", "distances"]
+        )
+
+    def flush(self):
+        """Chroma persists on every write."""
+
+    def reset(self):
+        self._client.delete_collection(self.collection_name)
+        self._collection = self._client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"description": "Verified student cases for RAG"}
+        )
+
+
+def _matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """Evaluate the equality subset of Chroma's where syntax ($and/$or/$eq/$ne/$in)."""
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            for op, operand in cond.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != cond:
+            return False
+    return True
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive inter-process lock on `path` (created if missing)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class NumpyVectorStore:
+    """
+    In-memory NumPy vector index with disk snapshots.
+
+    Vectors are L2-normalized on insert, so cosine similarity is a single
+    matrix-vector product. Distances are reported as squared L2 between unit
+    vectors (2 - 2·cos), the same scale as Chroma's default "l2" space.
+    """
+
+    backend = "numpy"
+
+    def __init__(self, path: str, collection_name: str):
+        self.path = os.path.join(path, collection_name)
+        self.collection_name = collection_name
+        self._lock = threading.RLock()
+        self._matrix = None        # (capacity, dim) float32, rows [0, _size) valid
+        self._size = 0
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._dirty = False
+        self._candidates = {}      # where-filter JSON -> matching rows (cleared on write)
+        self._version = 0          # snapshot generation this process last loaded/saved
+        self._upserted = set()     # ids written since then (replayed if another process saved)
+        self._deleted = set()
+        self._lock_path = self.path + ".lock"
+        with _file_lock(self._lock_path):
+            self._load()
+
+    # ---------------- persistence ----------------
+
+    def _disk_version(self) -> int:
+        try:
+            with open(os.path.join(self.path, "version.json")) as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _clear(self):
+        self._matrix = None
+        self._size = 0
+        self._ids, self._documents, self._metadatas = [], [], []
+        self._row_of = {}
+        self._candidates.clear()
+
+    def _load(self):
+        """Replace the in-memory state with the snapshot on disk (caller holds the file lock)."""
+        self._clear()
+        self._version = self._disk_version()
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        records_path = os.path.join(self.path, "records.json")
+        if not (os.path.exists(vectors_path) and os.path.exists(records_path)):
+            return
+        with open(records_path) as f:
+            records = json.load(f)
+        if not records["ids"]:
+            return  # empty snapshot: the dimension is set by the next upsert
+        # Memory-mapped: pages are read lazily; first write copies into RAM
+        self._matrix = np.load(vectors_path, mmap_mode="r")
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._size = len(self._ids)
+        self._row_of = {id_: i for i, id_ in enumerate(self._ids)}
+
+    def _merge_onto_disk(self):
+        """Reload the newer snapshot and replay this process's pending writes on top of it."""
+        rows = [self._row_of[id_] for id_ in self._upserted]
+        upserts = (
+            [self._ids[r] for r in rows],
+            np.array(self._matrix[rows]) if rows else None,
+            [self._documents[r] for r in rows],
+            [self._metadatas[r] for r in rows],
+        )
+        deleted = list(self._deleted)
+        self._load()
+        self.delete(deleted)
+        if rows:
+            self.upsert(*upserts)
+
+    def _refresh(self):
+        """Pick up a snapshot another process saved since this one loaded (caller holds _lock)."""
+        if self._disk_version() == self._version:
+            return
+        with _file_lock(self._lock_path):
+            if self._disk_version() == self._version:
+                return
+            if self._dirty:
+                self._merge_onto_disk()  # keeps this process's pending writes
+            else:
+                self._load()
+
+    def flush(self):
+        """Snapshot to disk if anything changed (atomic file swaps under the file lock)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            with _file_lock(self._lock_path):
+                if self._disk_version() != self._version:
+                    self._merge_onto_disk()
+                os.makedirs(self.path, exist_ok=True)
+                vectors_tmp = os.path.join(self.path, "vectors.tmp.npy")
+                records_tmp = os.path.join(self.path, "records.tmp.json")
+                version_tmp = os.path.join(self.path, "version.tmp.json")
+                matrix = self._matrix[:self._size] if self._matrix is not None else np.zeros((0, 0), np.float32)
+                np.save(vectors_tmp, matrix)
+                with open(records_tmp, "w") as f:
+                    json.dump({"ids": self._ids, "documents": self._documents, "metadatas": self._metadatas}, f)
+                with open(version_tmp, "w") as f:
+                    json.dump({"version": self._version + 1}, f)
+                os.replace(vectors_tmp, os.path.join(self.path, "vectors.npy"))
+                os.replace(records_tmp, os.path.join(self.path, "records.json"))
+                os.replace(version_tmp, os.path.join(self.path, "version.json"))
+                self._version += 1
+            self._upserted.clear()
+            self._deleted.clear()
+            self._dirty = False
+
+    def reset(self):
+        with self._lock, _file_lock(self._lock_path):
+            self._clear()
+            self._version = 0
+            self._upserted.clear()
+            self._deleted.clear()
+            self._dirty = False
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    # ---------------- writes ----------------
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        if self._matrix is None:
+            self._matrix = np.zeros((max(rows, 64), dim), dtype=np.float32)
+            return
+        if self._matrix.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {dim} does not match store dimension {self._matrix.shape[1]}")
+        writable = isinstance(self._matrix, np.ndarray) and not isinstance(self._matrix, np.memmap)
+        if self._size + rows > self._matrix.shape[0] or not writable:
+            capacity = max(self._size + rows, self._matrix.shape[0] * 2 if writable else self._size + rows + 64)
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings must be a list of vectors, one per id")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        with self._lock:
+            new_rows = sum(1 for id_ in dict.fromkeys(ids) if id_ not in self._row_of)
+            self._ensure_capacity(new_rows, vectors.shape[1])
+            for id_, vec, doc, meta in zip(ids, vectors, documents, metadatas):
+                row = self._row_of.get(id_)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_of[id_] = row
+                    self._ids.append(id_)
+                    self._documents.append(doc)
+                    self._metadatas.append(dict(meta or {}))
+                else:
+                    self._documents[row] = doc
+                    self._metadatas[row] = dict(meta or {})
+                self._matrix[row] = vec
+                self._upserted.add(id_)
+                self._deleted.discard(id_)
+            self._dirty = True
+            self._candidates.clear()
+
+    def delete(self, ids):
+        with self._lock:
+            if ids:
+                # Recorded even if absent here: another process may have added them
+                self._upserted.difference_update(ids)
+                self._deleted.update(ids)
+                self._dirty = True
+            doomed = {self._row_of[i] for i in ids or [] if i in self._row_of}
+            if not doomed:
+                return
+            keep = np.array([r for r in range(self._size) if r not in doomed], dtype=np.int64)
+            self._matrix = np.array(self._matrix[keep]) if len(keep) else None
+            self._ids = [self._ids[r] for r in keep]
+            self._documents = [self._documents[r] for r in keep]
+            self._metadatas = [self._metadatas[r] for r in keep]
+            self._size = len(self._ids)
+            self._row_of = {id_: i for i, id_ in enumerate(self._ids)}
+            self._candidates.clear()
+
+    # ---------------- reads ----------------
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._size
+
+    def get(self, ids=None, where=None, include=None):
+        include = include or ["metadatas", "documents"]
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+            else:
+                rows = range(self._size)
+            rows = [r for r in rows if _matches(self._metadatas[r], where)]
+            result = {"ids": [self._ids[r] for r in rows]}
+            if "documents" in include:
+                result["documents"] = [self._documents[r] for r in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[r] for r in rows]
+            if "embeddings" in include:
+                result["embeddings"] = [self._matrix[r].tolist() for r in rows]
+            return result
+
+    def query(self, query_embeddings, n_results=5, where=None, include=None):
+        include = include or ["documents", "metadatas", "distances"]
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+
+        with self._lock:
+            self._refresh()
+            if self._size == 0:
+                candidates = np.zeros(0, dtype=np.int64)
+            elif where:
+                # Metadata pre-filter, then score only the surviving rows
+                key = json.dumps(where, sort_keys=True)
+                candidates = self._candidates.get(key)
+                if candidates is None:
+                    candidates = np.array(
+                        [r for r in range(self._size) if _matches(self._metadatas[r], where)],
+                        dtype=np.int64
+                    )
+                    self._candidates[key] = candidates
+            else:
+                candidates = None
+            matrix = self._matrix[:self._size] if self._size else None
+
+            for q in query_embeddings:
+                q = np.asarray(q, dtype=np.float32)
+                q = q / (np.linalg.norm(q) or 1.0)
+                if matrix is None or (candidates is not None and len(candidates) == 0):
+                    rows = np.zeros(0, dtype=np.int64)
+                    sims = np.zeros(0, dtype=np.float32)
+                else:
+                    block = matrix if candidates is None else matrix[candidates]
+                    scores = block @ q
+                    k = min(n_results, len(scores))
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top])]
+                    sims = scores[top]
+                    rows = top if candidates is None else candidates[top]
+
+                result["ids"].append([self._ids[r] for r in rows])
+                result["documents"].append([self._documents[r] for r in rows])
+                result["metadatas"].append([self._metadatas[r] for r in rows])
+                result["distances"].append([float(2.0 - 2.0 * s) for s in sims])
+                result["embeddings"].append([matrix[r].tolist() for r in rows] if "embeddings" in include else None)
+
+        return {key: value for key, value in result.items() if key == "ids" or key in include}
+
+
+def create_vector_store(backend: str, path: str, collection_name: str):
+    """Factory used by rag_service.initialize_rag()."""
+    if backend == "numpy":
+        return NumpyVectorStore(path, collection_name)
+    if backend == "chroma":
+        return ChromaVectorStore(path, collection_name)
+    raise ValueError(f"Unknown RAG backend: {backend}")
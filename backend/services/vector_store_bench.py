@@ -0,0 +1,120 @@
+"""
+Vector Store Benchmark
+Compares the NumPy index with Chroma on synthetic cases (no API calls)
+
+Random unit vectors with district/admin_decision metadata are loaded into a
+scratch copy of each backend; both are then queried with the same vectors,
+with and without metadata filters. Reports load time, query latency
+percentiles and Chroma's recall@k against the exact NumPy results.
+
+Usage:
+    python -m backend.services.vector_store_bench [--sizes 1000 10000]
+                                                  [--queries 200] [--top-k 5]
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from backend.services.vector_store import create_vector_store
+
+DISTRICTS = ["Chennai", "Madurai", "Coimbatore", "Salem", "Tiruchirappalli", "Vellore", "Erode", "Tirunelveli"]
+DECISIONS = ["APPROVED", "REJECTED", ""]
+
+
+def _percentile(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3) if samples else 0.0
+
+
+def _synthetic_cases(n, dim, rng):
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    ids = [f"student_bench{i}_pv" for i in range(n)]
+    documents = [f"Synthetic case {i}" for i in range(n)]
+    metadatas = [
+        {
+            "student_id": f"bench{i}",
+            "district": DISTRICTS[i % len(DISTRICTS)],
+            "admin_decision": DECISIONS[i % len(DECISIONS)],
+        }
+        for i in range(n)
+    ]
+    return ids, vectors, documents, metadatas
+
+
+def bench_backend(backend, cases, queries, top_k, where=None, batch_size=500):
+    """Load cases into a scratch store and time single-vector queries"""
+    ids, vectors, documents, metadatas = cases
+    path = tempfile.mkdtemp(prefix=f"rag_bench_{backend}_")
+    try:
+        store = create_vector_store(backend, path, "bench")
+        started = time.perf_counter()
+        for i in range(0, len(ids), batch_size):
+            store.upsert(
+                ids=ids[i:i + batch_size],
+                embeddings=vectors[i:i + batch_size].tolist(),
+                documents=documents[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size]
+            )
+        store.flush()
+        load_s = time.perf_counter() - started
+
+        latencies = []
+        results = []
+        for q in queries:
+            t0 = time.perf_counter()
+            res = store.query(query_embeddings=[q.tolist()], n_results=top_k, where=where)
+            latencies.append(time.perf_counter() - t0)
+            results.append(res["ids"][0])
+
+        return {
+            "load_s": round(load_s, 3),
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+        }, results
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def run(sizes, num_queries=200, top_k=5, dim=768, seed=42):
+    rng = np.random.default_rng(seed)
+    report = []
+    for n in sizes:
+        cases = _synthetic_cases(n, dim, rng)
+        queries = rng.standard_normal((num_queries, dim)).astype(np.float32)
+        for label, where in (("unfiltered", None),
+                             ("district", {"district": DISTRICTS[0]}),
+                             ("district+decision", {"$and": [{"district": DISTRICTS[0]},
+                                                             {"admin_decision": "APPROVED"}]})):
+            row = {"size": n, "filter": label}
+            exact = None
+            for backend in ("numpy", "chroma"):
+                try:
+                    stats, results = bench_backend(backend, cases, queries, top_k, where)
+                except Exception as e:
+                    row[backend] = {"error": str(e)}
+                    continue
+                if backend == "numpy":
+                    exact = results
+                elif exact is not None:
+                    hits = sum(len(set(a) & set(b)) for a, b in zip(results, exact))
+                    total = sum(len(b) for b in exact)
+                    stats["recall_at_k"] = round(hits / total, 4) if total else 1.0
+                row[backend] = stats
+            print(json.dumps(row))
+            report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark RAG vector store backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    run(args.sizes, num_queries=args.queries, top_k=args.top_k, dim=args.dim)
@@ -0,0 +1,12 @@
+-- Stage temp PV images on local disk instead of LONGBLOBs
+-- StudentImages keeps only metadata; bytes live under IMAGE_SPOOL_DIR
+ALTER TABLE StudentImages
+ADD COLUMN spoolPath VARCHAR(500) DEFAULT NULL,
+ADD COLUMN sizeBytes INT DEFAULT NULL,
+ADD INDEX idx_studentimages_student (studentId),
+ADD INDEX idx_studentimages_uploaded (uploadedAt);
+
+-- Legacy rows with tempImage are still finalized by /api/final-upload.
+-- Once SELECT COUNT(*) FROM StudentImages WHERE tempImage IS NOT NULL returns 0,
+-- the column can be dropped to reclaim the space:
+-- ALTER TABLE StudentImages DROP COLUMN tempImage;
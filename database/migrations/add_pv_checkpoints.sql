@@ -0,0 +1,11 @@
+-- Per-node outputs of the latest PV pipeline (pv_graph) run per student
+-- Lets a retried job resume after the last successful node, and an admin
+-- re-run a single node; written by backend/services/pv_checkpoints.py
+CREATE TABLE IF NOT EXISTS PVCheckpoints (
+    studentId VARCHAR(50) NOT NULL,
+    node VARCHAR(50) NOT NULL,
+    runId VARCHAR(32) NOT NULL,
+    output LONGTEXT NOT NULL,
+    updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (studentId, node)
+);
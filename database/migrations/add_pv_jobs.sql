@@ -0,0 +1,20 @@
+-- Durable job queue for the PV AI pipeline
+-- Replaces the fire-and-forget daemon thread in /api/submit-pv
+CREATE TABLE IF NOT EXISTS PVJobs (
+    jobId INT AUTO_INCREMENT PRIMARY KEY,
+    studentId VARCHAR(50) NOT NULL,
+    volunteerId VARCHAR(50),
+    payload LONGTEXT NOT NULL,
+    status ENUM('QUEUED', 'RUNNING', 'DONE', 'FAILED', 'CANCELLED') NOT NULL DEFAULT 'QUEUED',
+    attempts INT NOT NULL DEFAULT 0,
+    maxAttempts INT NOT NULL DEFAULT 3,
+    runAfter DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    lockedBy VARCHAR(128),
+    lockedUntil DATETIME,
+    lastError TEXT,
+    createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_pvjobs_claim (status, runAfter),
+    INDEX idx_pvjobs_lock (lockedBy),
+    INDEX idx_pvjobs_student (studentId)
+);
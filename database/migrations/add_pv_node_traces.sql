@@ -0,0 +1,19 @@
+-- Per-node timing for PV pipeline (pv_graph) runs
+-- One row per node execution; written by backend/services/pv_tracing.py
+CREATE TABLE IF NOT EXISTS PVNodeTraces (
+    traceId BIGINT AUTO_INCREMENT PRIMARY KEY,
+    runId VARCHAR(32) NOT NULL,
+    studentId VARCHAR(50),
+    node VARCHAR(50) NOT NULL,
+    startedAt DATETIME(3) NOT NULL,
+    durationMs INT NOT NULL,
+    inputBytes INT,
+    outputBytes INT,
+    tokens INT NOT NULL DEFAULT 0,
+    cacheHits INT NOT NULL DEFAULT 0,
+    cacheMisses INT NOT NULL DEFAULT 0,
+    error TEXT,
+    INDEX idx_pvnodetraces_started (startedAt, node),
+    INDEX idx_pvnodetraces_run (runId),
+    INDEX idx_pvnodetraces_student (studentId)
+);
@@ -0,0 +1,25 @@
+-- Shadow results of bulk PV re-analysis (backend/services/pv_reanalysis.py)
+-- One row per (batch, student); current* columns are the decision/score
+-- stored in PhysicalVerification when the batch ran, for diffing
+CREATE TABLE IF NOT EXISTS PVReanalysis (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    batchId VARCHAR(32) NOT NULL,
+    studentId VARCHAR(50) NOT NULL,
+    verificationId INT NOT NULL,
+    runId VARCHAR(32),
+    currentDecision VARCHAR(50),
+    currentScore FLOAT,
+    newDecision VARCHAR(50),
+    newScore FLOAT,
+    newSummary TEXT,
+    textTranslation TEXT,
+    audioTranslation TEXT,
+    houseAnalysis TEXT,
+    tokens INT NOT NULL DEFAULT 0,
+    cacheHits INT NOT NULL DEFAULT 0,
+    durationMs INT,
+    error TEXT,
+    createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_pvreanalysis_batch_student (batchId, studentId),
+    INDEX idx_pvreanalysis_student (studentId)
+);
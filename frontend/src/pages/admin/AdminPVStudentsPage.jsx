@@ -2,6 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { Home, Users, FileText, CheckCircle, Clock } from 'lucide-react';
 import adminService from '../../services/adminService';
+import { subscribePVEvents } from '../../services/pvEvents';
 import authService from '../../services/authService';
 import logo from '../../assets/logo_icon.jpg';
 import './AdminPVStudentsPage.css';
@@ -14,8 +15,15 @@ const AdminPVStudentsPage = () => {
 
     useEffect(() => {
         loadStudents();
-        const interval = setInterval(loadStudents, 10000); // Auto-refresh every 10s
-        return () => clearInterval(interval);
+        // Refresh when a PV analysis finishes (pushed by the server), after reconnects
+        // and on the fallback poll
+        return subscribePVEvents('/admin/api/pv-events', {
+            onOpen: loadStudents,
+            onPoll: loadStudents,
+            onEvent: (evt) => {
+                if (evt.event === 'completed') loadStudents();
+            },
+        });
     }, []);
 
     const loadStudents = async () => {
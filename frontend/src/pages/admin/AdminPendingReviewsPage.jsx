@@ -2,6 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { Home, Users, FileText, CheckCircle, Clock } from 'lucide-react';
 import adminService from '../../services/adminService';
+import { subscribePVEvents } from '../../services/pvEvents';
 import authService from '../../services/authService';
 import logo from '../../assets/logo_icon.jpg';
 import './AdminPendingReviewsPage.css';
@@ -10,12 +11,21 @@ const AdminPendingReviewsPage = () => {
     const [students, setStudents] = useState([]);
     const [loading, setLoading] = useState(true);
     const [expandedRow, setExpandedRow] = useState(null);
+    const [rerunNode, setRerunNode] = useState('MasterAnalysis');
+    const [rerunMessage, setRerunMessage] = useState({});
     const navigate = useNavigate();
 
     useEffect(() => {
         loadStudents();
-        const interval = setInterval(loadStudents, 10000); // Auto-refresh every 10s
-        return () => clearInterval(interval);
+        // Refresh when a PV analysis finishes (pushed by the server), after reconnects
+        // and on the fallback poll
+        return subscribePVEvents('/admin/api/pv-events', {
+            onOpen: loadStudents,
+            onPoll: loadStudents,
+            onEvent: (evt) => {
+                if (evt.event === 'completed') loadStudents();
+            },
+        });
     }, []);
 
     const loadStudents = async () => {
@@ -45,6 +55,14 @@ const AdminPendingReviewsPage = () => {
         setExpandedRow(expandedRow === studentId ? null : studentId);
     };
 
+    const handleRerun = async (studentId) => {
+        const result = await adminService.rerunPVNode(studentId, rerunNode);
+        setRerunMessage((prev) => ({
+            ...prev,
+            [studentId]: result.success ? `${rerunNode} re-run queued` : (result.error || 'Re-run failed'),
+        }));
+    };
+
     return (
         <div className="admin-layout animate-fadeIn">
             {/* Sidebar Navigation */}
@@ -188,6 +206,22 @@ const AdminPendingReviewsPage = () => {
                                                                         <div className="detail-label">Sentiment Score</div>
                                                                         <div className="detail-value">{s.sentiment_text}%</div>
                                                                     </div>
+                                                                    <div className="detail-item">
+                                                                        <div className="detail-label">Re-run AI Stage</div>
+                                                                        <div className="detail-value">
+                                                                            <select value={rerunNode} onChange={(e) => setRerunNode(e.target.value)}>
+                                                                                <option value="MasterAnalysis">Analysis (summary & decision)</option>
+                                                                                <option value="RAGRetrieval">Similar cases + analysis</option>
+                                                                                <option value="HouseAnalysis">House image analysis</option>
+                                                                                <option value="Tanglish">Comment translation</option>
+                                                                                <option value="Audio">Audio transcription</option>
+                                                                            </select>
+                                                                            <button className="btn btn-sm" onClick={() => handleRerun(s.studentId)}>
+                                                                                Re-run
+                                                                            </button>
+                                                                            {rerunMessage[s.studentId] && <div>{rerunMessage[s.studentId]}</div>}
+                                                                        </div>
+                                                                    </div>
                                                                     <div className="detail-item">
                                                                         <Link
                                                                             to={`/admin/view/${s.studentId}`}
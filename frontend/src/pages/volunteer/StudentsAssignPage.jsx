@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { Home, ClipboardList, FileCheck } from 'lucide-react';
 import volunteerService from '../../services/volunteerService';
+import { subscribePVEvents } from '../../services/pvEvents';
 import authService from '../../services/authService';
 import './StudentsAssignPage.css';
 import logo from '../../assets/logo_icon.jpg';
@@ -13,13 +14,49 @@ const StudentsAssignPage = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [activeTab, setActiveTab] = useState('overview');
+    const [progress, setProgress] = useState({});
 
     useEffect(() => {
         loadStudents();
-        const interval = setInterval(loadStudents, 5000);
-        return () => clearInterval(interval);
+        // Pipeline progress is pushed by the server; reload only when a PV finishes
+        // (or after a reconnect, in case events were missed), with a slow fallback poll
+        return subscribePVEvents('/api/pv-events', {
+            onOpen: loadStudents,
+            onPoll: loadStudents,
+            onEvent: (evt) => {
+                setProgress((prev) => {
+                    const next = { ...prev };
+                    if (evt.event === 'completed') {
+                        delete next[evt.student_id];
+                    } else {
+                        next[evt.student_id] = progressLabel(evt);
+                    }
+                    return next;
+                });
+                if (evt.event === 'completed' || evt.event === 'failed') {
+                    loadStudents();
+                }
+            },
+        });
     }, []);
 
+    const progressLabel = (evt) => {
+        switch (evt.event) {
+            case 'queued':
+                return 'Queued';
+            case 'started':
+                return 'Analyzing...';
+            case 'node':
+                return `${evt.node} done`;
+            case 'retrying':
+                return `Retrying in ${evt.retry_in}s`;
+            case 'failed':
+                return 'Analysis failed';
+            default:
+                return '';
+        }
+    };
+
     const loadStudents = async () => {
         const result = await volunteerService.getAssignedStudents();
         if (result.success) {
@@ -74,6 +111,9 @@ const StudentsAssignPage = () => {
                                                     >
                                                         {student.studentId}
                                                     </Link>
+                                                    {progress[String(student.studentId)] && (
+                                                        <span className="pv-progress">{progress[String(student.studentId)]}</span>
+                                                    )}
                                                 </td>
                                                 <td>{student.studentName || ''}</td>
                                                 <td>{student.phoneNumber || ''}</td>
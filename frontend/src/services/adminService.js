@@ -95,6 +95,11 @@ const adminService = {
     // Admin decision on PV review (approve to VI or reject)
     async reviewPVSubmission(studentId, decision, remarks = '') {
         return api.post('/admin/api/review-pv-submission', { studentId, decision, remarks });
+    },
+
+    // Re-run one AI pipeline stage (and the stages after it) for a student
+    async rerunPVNode(studentId, node) {
+        return api.post(`/admin/api/pv-rerun/${studentId}`, { node });
     }
 };
 
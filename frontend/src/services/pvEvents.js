@@ -0,0 +1,60 @@
+const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
+
+const PV_EVENTS = ['queued', 'started', 'node', 'retrying', 'completed', 'failed'];
+
+// Events only reach clients connected to the process that ran the job (pv_events
+// is in-process), so pages still poll: slowly while the stream is up, at the old
+// 10s rate while it is down
+const POLL_CONNECTED_MS = 60000;
+const POLL_DISCONNECTED_MS = 10000;
+
+/**
+ * Subscribe to PV pipeline progress (Server-Sent Events)
+ * @param {string} path - '/api/pv-events', '/api/pv-events/<studentId>' or '/admin/api/pv-events'
+ * @param {Object} handlers - { onEvent(event), onOpen(), onPoll() }; onOpen also fires after a
+ *     reconnect, onPoll is the fallback refresh
+ * @returns {Function} Closes the stream and stops polling
+ */
+export function subscribePVEvents(path, { onEvent, onOpen, onPoll } = {}) {
+    const source = new EventSource(`${API_BASE_URL}${path}`, { withCredentials: true });
+    let connected = false;
+    let timer = null;
+
+    const schedulePoll = () => {
+        if (!onPoll) return;
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+            onPoll();
+            schedulePoll();
+        }, connected ? POLL_CONNECTED_MS : POLL_DISCONNECTED_MS);
+    };
+
+    source.onopen = () => {
+        connected = true;
+        schedulePoll();
+        if (onOpen) onOpen();
+    };
+    source.onerror = () => {
+        if (connected) {
+            connected = false;
+            schedulePoll();
+        }
+    };
+    schedulePoll();
+    PV_EVENTS.forEach((name) => {
+        source.addEventListener(name, (e) => {
+            try {
+                if (onEvent) onEvent(JSON.parse(e.data));
+            } catch (err) {
+                console.error('Invalid PV event:', err);
+            }
+        });
+    });
+
+    return () => {
+        clearTimeout(timer);
+        source.close();
+    };
+}
+
+export default subscribePVEvents;
@@ -0,0 +1,35 @@
+"""pv_events replay buffers must not grow with every student ever seen"""
+from collections import OrderedDict
+
+import pytest
+
+from backend.services import pv_events
+
+
+@pytest.fixture(autouse=True)
+def fresh_bus(monkeypatch):
+    monkeypatch.setattr(pv_events, "_recent", OrderedDict())
+    monkeypatch.setattr(pv_events, "_finished", {})
+    monkeypatch.setattr(pv_events, "_owners", {})
+    monkeypatch.setattr(pv_events, "_subscribers", {})
+
+
+def test_finished_run_is_dropped_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(pv_events.time, "time", lambda: clock[0])
+    pv_events.publish("s1", "started", volunteer_id="v1")
+    pv_events.publish("s1", "completed")
+    assert [m["event"] for m in pv_events.recent_events("s1")] == ["started", "completed"]
+
+    clock[0] += pv_events.REPLAY_TTL_SECONDS
+    pv_events.publish("s2", "started")
+    assert pv_events.recent_events("s1") == []
+    assert pv_events.recent_events("s2")
+
+
+def test_tracked_students_are_capped(monkeypatch):
+    monkeypatch.setattr(pv_events, "MAX_TRACKED_STUDENTS", 3)
+    for student_id in range(5):
+        pv_events.publish(student_id, "started")
+
+    assert list(pv_events._recent) == ["2", "3", "4"]
@@ -0,0 +1,55 @@
+"""pv_graph wiring: fan-out from Prepare, Merge waits for both text branches"""
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("flask")
+pytest.importorskip("mysql.connector")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace the AI/RAG services the nodes import with recorders"""
+    calls = []
+
+    ai = types.ModuleType("backend.services.ai_service")
+    ai.tanglish_to_english = lambda text: calls.append("Tanglish") or "text"
+    ai.audio_to_english = lambda path: calls.append("Audio") or "audio"
+    ai.ai_house_analysis = lambda paths: calls.append("HouseAnalysis") or {"points": [], "condition": "OK"}
+
+    def deduplicate_and_label(text, audio):
+        calls.append(("Merge", text, audio))
+        return f"{text}|{audio}"
+    ai.deduplicate_and_label = deduplicate_and_label
+
+    def generate_combined_analysis(merged, rag_context=""):
+        calls.append("MasterAnalysis")
+        return {"summary": [merged], "decision": "RECOMMENDED", "score": 0.9}
+    ai.generate_combined_analysis = generate_combined_analysis
+
+    rag = types.ModuleType("backend.services.rag_service")
+    rag.RAG_ENABLED = False
+    monkeypatch.setitem(sys.modules, "backend.services.ai_service", ai)
+    monkeypatch.setitem(sys.modules, "backend.services.rag_service", rag)
+    return calls
+
+
+def test_merge_runs_once_after_both_text_branches(calls):
+    from backend.services.pv_graph import pv_graph
+
+    result = pv_graph.invoke({
+        "text_comment": "veedu nalla irukku",
+        "audio_path": "/tmp/voice.ogg",
+        "image_paths": ["/tmp/house.jpg"],
+        "is_tanglish": True,
+    })
+
+    merges = [c for c in calls if isinstance(c, tuple)]
+    assert merges == [("Merge", "text", "audio")]
+    assert calls.index(merges[0]) > max(calls.index("Tanglish"), calls.index("Audio"))
+    assert calls.count("MasterAnalysis") == 1
+    assert calls.count("HouseAnalysis") == 1
+    assert result["merged_text"] == "text|audio"
+    assert result["decision"] == "RECOMMENDED"
@@ -0,0 +1,36 @@
+"""pv_reanalysis must replay PVs against the same RAG collection as the app"""
+import os
+
+import pytest
+
+for _module in ("langgraph", "flask", "mysql.connector", "boto3", "google.generativeai"):
+    pytest.importorskip(_module)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")  # rag_service configures the SDK on import
+
+from backend.services import pv_reanalysis, rag_service  # noqa: E402
+
+
+@pytest.fixture
+def no_pvs(monkeypatch):
+    monkeypatch.setattr(pv_reanalysis, "select_pvs", lambda **filters: [])
+    monkeypatch.setattr(pv_reanalysis, "_completed_students", lambda batch_id: set())
+    monkeypatch.setattr(pv_reanalysis, "diff_report", lambda batch_id: {})
+    monkeypatch.setattr(rag_service, "RAG_ENABLED", True)
+    monkeypatch.setattr(rag_service, "get_collection", lambda: None)
+
+
+def test_reanalyze_initializes_rag_collection(no_pvs, monkeypatch):
+    initialized = []
+    monkeypatch.setattr(rag_service, "initialize_rag", lambda: initialized.append(True) or object())
+
+    result = pv_reanalysis.reanalyze(batch_id="test", with_audio=False, with_images=False)
+
+    assert initialized == [True]
+    assert result["processed"] == 0
+
+
+def test_reanalyze_refuses_to_run_without_rag(no_pvs, monkeypatch):
+    monkeypatch.setattr(rag_service, "initialize_rag", lambda: None)
+
+    with pytest.raises(RuntimeError):
+        pv_reanalysis.reanalyze(batch_id="test", with_audio=False, with_images=False)
@@ -0,0 +1,52 @@
+"""Circuit breaker / token bucket interplay in call_with_limits"""
+import pytest
+
+from backend.services import rate_limiter
+from backend.services.rate_limiter import CircuitOpenError, RateLimitTimeout
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(rate_limiter.Config, "RATE_LIMIT_BACKEND", "memory")
+    monkeypatch.setattr(rate_limiter.Config, "RATE_LIMIT_MAX_WAIT", 0.0)
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+    monkeypatch.setattr(rate_limiter, "_breakers", {})
+    monkeypatch.setattr(rate_limiter, "_stats", {})
+    bucket = rate_limiter.get_bucket("gemini", "test-model", "key")
+    breaker = rate_limiter.get_breaker("gemini", "test-model", "key")
+    breaker.state = "half_open"
+    return bucket, breaker
+
+
+def test_rate_limit_timeout_releases_half_open_trial(limits):
+    bucket, breaker = limits
+    bucket.penalize(60)
+
+    with pytest.raises(RateLimitTimeout):
+        rate_limiter.call_with_limits("gemini", "test-model", "key", lambda: "ok")
+
+    assert breaker.state == "half_open"
+    breaker.allow()  # the trial slot is free again
+
+
+def test_base_exception_releases_half_open_trial(limits):
+    _, breaker = limits
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        rate_limiter.call_with_limits("gemini", "test-model", "key", interrupted)
+
+    breaker.allow()
+
+
+def test_trial_success_closes_and_concurrent_trial_is_rejected(limits):
+    _, breaker = limits
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.release_trial()
+    assert rate_limiter.call_with_limits("gemini", "test-model", "key", lambda: "ok") == "ok"
+    assert breaker.state == "closed"
@@ -0,0 +1,48 @@
+"""NumpyVectorStore snapshots shared by several processes (one instance each)"""
+from backend.services.vector_store import NumpyVectorStore
+
+
+def _store(tmp_path):
+    return NumpyVectorStore(str(tmp_path), "cases")
+
+
+def test_reader_sees_snapshot_written_by_another_instance(tmp_path):
+    reader = _store(tmp_path)
+    assert reader.count() == 0
+
+    writer = _store(tmp_path)
+    writer.upsert(["a", "b"], [[1, 0, 0], [0, 1, 0]], ["doc a", "doc b"], [{"district": "X"}, {}])
+    writer.flush()
+
+    assert reader.count() == 2
+    assert reader.get(ids=["a"])["documents"] == ["doc a"]
+    assert reader.query([[0, 1, 0]], n_results=1)["ids"] == [["b"]]
+
+    writer.delete(["a"])
+    writer.flush()
+    assert reader.count() == 1
+
+
+def test_pending_writes_survive_a_refresh(tmp_path):
+    first, second = _store(tmp_path), _store(tmp_path)
+    first.upsert(["a"], [[1, 0]], ["doc a"], [{}])
+
+    second.upsert(["b"], [[0, 1]], ["doc b"], [{}])
+    second.flush()
+
+    assert sorted(first.get()["ids"]) == ["a", "b"]
+    first.flush()
+    assert sorted(_store(tmp_path).get()["ids"]) == ["a", "b"]
+
+
+def test_empty_snapshot_reloads(tmp_path):
+    store = _store(tmp_path)
+    store.upsert(["a"], [[1, 0, 0]], ["doc a"], [{}])
+    store.flush()
+    store.delete(["a"])
+    store.flush()
+
+    reloaded = _store(tmp_path)
+    assert reloaded.count() == 0
+    reloaded.upsert(["b"], [[0, 1, 0, 0]], ["doc b"], [{}])
+    assert reloaded.count() == 1